@@ -0,0 +1,240 @@
+import asyncio
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+from unittest.mock import Mock
+
+import wordbook
+from wordbook.server import DictServer
+
+
+class BytesReader:
+
+    def __init__(self, data, chunk_size=wordbook.DictBase.READ_SIZE):
+        self.data = data
+        self.chunk_size = chunk_size
+        self.pos = 0
+
+    async def read(self, size):
+        size = min(size, self.chunk_size)
+        chunk = self.data[self.pos:self.pos + size]
+        self.pos += len(chunk)
+        return chunk
+
+
+def definition_reply(count, lines):
+    ret = [b'150 %d definitions retrieved\r\n' % count]
+    for num in range(count):
+        ret.append(b'151 "mock" db%d "Mock database %d"\r\n' % (num, num))
+        for line in range(lines):
+            ret.append(b'    %d: mock definition text, an imitation of something {mock} [syn: mockery]\r\n' % line)
+        ret.append(b'.\r\n')
+    ret.append(b'250 ok [d/m/c = 1/0/1; 0.000r 0.000u 0.000s]\r\n')
+    return b''.join(ret)
+
+
+def match_reply(count):
+    ret = [b'152 %d matches found\r\n' % count]
+    for num in range(count):
+        ret.append(b'db "mock%d"\r\n' % num)
+    ret.append(b'.\r\n250 ok\r\n')
+    return b''.join(ret)
+
+
+def recv_response(payload):
+    async def bench():
+        conn = wordbook.DictBase()
+        conn.reader = BytesReader(payload)
+        await conn.recv_response()
+    return bench
+
+
+class BannerTransport(wordbook.Transport):
+
+    BANNER = b'220 dictd 1.12.1/rf on Linux 4.10.0 <auth.mime> <100.2000.1500000000@host>\r\n'
+
+    async def open(self, host, port):
+        return BytesReader(self.BANNER), Mock()
+
+
+def connect_banner():
+    transport = BannerTransport()
+
+    async def bench():
+        await wordbook.DictBase(transport=transport).connect()
+    return bench
+
+
+def wordbook_objects(method, count):
+    conn = Mock()
+    lines = ['db{} "Mock database {}"'.format(num, num) for num in range(count)]
+
+    async def reply():
+        return lines
+    conn.show_db = conn.show_strat = reply
+    wb = wordbook.WordBook(conn=conn)
+
+    async def bench():
+        await getattr(wb, method)()
+    return bench
+
+
+def get_backend(words):
+    entries = {}
+    for num in range(words):
+        entries['mock{}'.format(num)] = 'mock{}\n  n 1: an imitation of something {{mock}}\n'.format(num)
+    return wordbook.MemoryDict([wordbook.MemoryDatabase('db', entries, description='Mock database')])
+
+
+async def loopback(words):
+    server = DictServer(get_backend(words))
+    await server.start()
+    conn = wordbook.DictBase()
+    await conn.connect('127.0.0.1', server.port)
+    await conn.client('wordbook/bench')
+    return server, conn
+
+
+async def run(bench, number, repeat):
+    # returns the seconds per call of each repeat
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            await bench()
+        timings.append((time.perf_counter() - start) / number)
+    return timings
+
+
+async def run_loopback(number, repeat):
+    ret = {}
+    server, conn = await loopback(1000)
+    try:
+        async def define():
+            await conn.define('db', 'mock500')
+
+        async def match():
+            await conn.match('db', 'prefix', 'mock5')
+
+        async def define_concurrent():
+            await asyncio.gather(*[conn.define('db', 'mock{}'.format(num)) for num in range(100)])
+
+        async def define_many():
+            await conn.define_many('db', ['mock{}'.format(num) for num in range(100)])
+
+        ret['loopback_define_latency'] = await run(define, number, repeat)
+        ret['loopback_match_latency'] = await run(match, number, repeat)
+        ret['loopback_define_100_concurrent'] = await run(define_concurrent, max(1, number // 10), repeat)
+        ret['loopback_define_100_pipelined'] = await run(define_many, max(1, number // 10), repeat)
+    finally:
+        await conn.quit()
+        await server.close()
+    return ret
+
+
+async def run_all(number, repeat, selected):
+    benches = [
+        ('recv_response_small', recv_response(b'552 no match\r\n')),
+        ('recv_response_definition', recv_response(definition_reply(1, 20))),
+        ('recv_response_large', recv_response(definition_reply(1, 20000))),
+        ('recv_response_many_definitions', recv_response(definition_reply(200, 10))),
+        ('recv_response_many_matches', recv_response(match_reply(20000))),
+        ('connect_banner', connect_banner()),
+        ('wordbook_get_databases', wordbook_objects('get_databases', 100)),
+        ('wordbook_get_strategies', wordbook_objects('get_strategies', 100)),
+    ]
+
+    def wanted(name):
+        return not selected or any(name.startswith(prefix) for prefix in selected)
+
+    ret = {}
+    for name, bench in benches:
+        if wanted(name):
+            ret[name] = await run(bench, number, repeat)
+    if wanted('loopback') or any(prefix.startswith('loopback') for prefix in selected):
+        for name, timings in (await run_loopback(number, repeat)).items():
+            if wanted(name):
+                ret[name] = timings
+    return ret
+
+
+def summarize(timings):
+    return {
+        'min': min(timings),
+        'median': statistics.median(timings),
+        'mean': statistics.mean(timings),
+        'stdev': statistics.stdev(timings) if len(timings) > 1 else 0.0,
+        'ops_per_sec': 1.0 / statistics.median(timings),
+        'repeat': len(timings),
+    }
+
+
+def compare(results, baseline, threshold):
+    # a benchmark regresses when its median got slower than the threshold allows
+    regressions = []
+    for name, result in sorted(results.items()):
+        old = baseline.get(name)
+        if old is None:
+            continue
+        ratio = result['median'] / old['median']
+        flag = 'SLOWER' if ratio > 1 + threshold else ('faster' if ratio < 1 - threshold else '')
+        print('{:40} {:12.3f}us {:12.3f}us {:8.2f}x {}'.format(
+            name, old['median'] * 1e6, result['median'] * 1e6, ratio, flag))
+        if flag == 'SLOWER':
+            regressions.append(name)
+    return regressions
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmarks of the DICT protocol hot paths')
+    parser.add_argument('-n', '--number', type=int, default=200, help='calls per repeat')
+    parser.add_argument('-r', '--repeat', type=int, default=5)
+    parser.add_argument('-o', '--output', help='write results as JSON to this file')
+    parser.add_argument('-c', '--compare', help='JSON results of an earlier run to compare with')
+    parser.add_argument('-t', '--threshold', type=float, default=0.10,
+                        help='relative slowdown of the median reported as a regression')
+    parser.add_argument('benchmarks', nargs='*', help='run only benchmarks with these name prefixes')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    loop = asyncio.get_event_loop()
+    timings = loop.run_until_complete(run_all(args.number, args.repeat, args.benchmarks))
+    loop.close()
+
+    results = {name: summarize(values) for name, values in timings.items()}
+    report = {
+        'meta': {
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'number': args.number,
+            'repeat': args.repeat,
+        },
+        'results': results,
+    }
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print('Regressions: {}'.format(', '.join(regressions)))
+            sys.exit(1)
+    else:
+        for name, result in sorted(results.items()):
+            print('{:40} {:12.3f}us {:12.1f} ops/s'.format(name, result['median'] * 1e6, result['ops_per_sec']))
+
+
+if __name__ == "__main__":
+    main()
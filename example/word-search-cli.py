@@ -1,7 +1,11 @@
 import asyncio
 import argparse
+import json
 import re
 import logging
+import statistics
+import sys
+import time
 
 import wordbook
 
@@ -18,21 +22,164 @@ def parse_args():
     group.add_argument('-d', '--define')
     group.add_argument('--list-databases', action='store_true')
     group.add_argument('--list-strategies', action='store_true')
+    group.add_argument('--bulk', metavar='FILE', help='look up every word (one per line) from FILE, "-" is stdin')
+    bulk = parser.add_argument_group('bulk mode')
+    bulk.add_argument('--command', choices=('define', 'match'), default='define')
+    bulk.add_argument('--concurrency', type=int, default=16, help='lookups in flight')
+    bulk.add_argument('--connections', type=int, default=4, help='size of the connection pool')
+    bulk.add_argument('--batch', type=int, default=1, help='words pipelined in a single request')
+    bulk.add_argument('--format', choices=('jsonl', 'tsv'), default='jsonl')
+    bulk.add_argument('--order', choices=('input', 'completion'), default='input')
     return parser.parse_args()
 
 
 def print_line(line):
 
-    line, numr = re.subn(r'^\[(.*)\]\s*$', '\n\x1b[1;33m\\1\x1b[0m\n', line)
-    if numr > 0:
-        print(line)
-        return
-
     line = re.sub(r'(\[[^\]]+\])', '\x1b[0;33m\\1\x1b[0m', line)
     line = re.sub(r'({[^}]+})', '\x1b[0;36m\\1\x1b[0m', line)
     print(line)
 
 
+def print_definition(define):
+
+    print('\n\x1b[1;33m"{}" {} "{}"\x1b[0m\n'.format(define.word, define.database, define.description))
+    for line in define.lines:
+        print_line(line)
+
+
+def result_json(word, results, error):
+    if error is not None:
+        return json.dumps({'word': word, 'error': str(error)})
+    ret = []
+    for result in results:
+        if isinstance(result, wordbook.Definition):
+            ret.append({'word': result.word, 'database': result.database,
+                        'description': result.description, 'text': result.text})
+        else:
+            ret.append({'word': result.word, 'database': result.database})
+    return json.dumps({'word': word, 'results': ret})
+
+
+def result_tsv(word, results, error):
+    # one row per result: word, database, matched word or definition text
+    # with its line breaks escaped
+    if error is not None:
+        return '{}\tERROR\t{}'.format(word, error)
+    if not results:
+        return '{}\t\t'.format(word)
+    rows = []
+    for result in results:
+        if isinstance(result, wordbook.Definition):
+            value = result.text.replace('\\', '\\\\').replace('\n', '\\n').replace('\t', '\\t')
+        else:
+            value = result.word
+        rows.append('{}\t{}\t{}'.format(word, result.database, value))
+    return '\n'.join(rows)
+
+
+async def read_words(path, queue, batch, workers):
+    # blocking reads run in a thread, so a slow stdin does not stall the lookups
+    loop = asyncio.get_event_loop()
+    f = sys.stdin if path == '-' else open(path)
+    index = 0
+    try:
+        pending = []
+        while True:
+            lines = await loop.run_in_executor(None, f.readlines, 65536)
+            if not lines:
+                break
+            for line in lines:
+                word = line.strip()
+                if not word:
+                    continue
+                pending.append((index, word))
+                index += 1
+                if len(pending) >= batch:
+                    await queue.put(pending)
+                    pending = []
+        if pending:
+            await queue.put(pending)
+    finally:
+        if f is not sys.stdin:
+            f.close()
+        for _ in range(workers):
+            await queue.put(None)
+
+
+async def lookup_words(wb, args, queue, results):
+    database = wb.get_database()[0]
+    strategy = wb.get_strategy()[0]
+    while True:
+        items = await queue.get()
+        if items is None:
+            return
+        words = [word for _, word in items]
+        start = time.perf_counter()
+        try:
+            if args.command == 'define':
+                replies = await wb.conn.define_many(database, words, return_exceptions=True)
+            else:
+                replies = await wb.conn.match_many(database, strategy, words, return_exceptions=True)
+        except (wordbook.exceptions.DictError, OSError) as exc:
+            replies = [exc] * len(words)
+        latency = time.perf_counter() - start
+        for (index, word), reply in zip(items, replies):
+            if isinstance(reply, Exception):
+                results.put_nowait((index, word, None, reply, latency))
+            else:
+                results.put_nowait((index, word, reply, None, latency))
+
+
+async def write_results(args, results):
+    # in input order, results which finished early wait for the earlier ones
+    fmt = result_json if args.format == 'jsonl' else result_tsv
+    waiting = {}
+    next_index = 0
+    latencies = []
+    errors = 0
+    while True:
+        item = await results.get()
+        if item is None:
+            break
+        index, word, reply, error, latency = item
+        latencies.append(latency)
+        if error is not None:
+            errors += 1
+        if args.order == 'completion':
+            print(fmt(word, reply, error))
+            continue
+        waiting[index] = item
+        while next_index in waiting:
+            _, word, reply, error, _ = waiting.pop(next_index)
+            print(fmt(word, reply, error))
+            next_index += 1
+    return latencies, errors
+
+
+def print_summary(latencies, errors, elapsed):
+    count = len(latencies)
+    print('words: {}, errors: {}, time: {:.2f}s, {:.1f} words/s'.format(
+        count, errors, elapsed, count / elapsed if elapsed else 0.0), file=sys.stderr)
+    if count:
+        latencies.sort()
+        print('latency ms: p50 {:.2f}, p95 {:.2f}, p99 {:.2f}, max {:.2f}'.format(
+            statistics.median(latencies) * 1e3, latencies[int(count * 0.95)] * 1e3,
+            latencies[int(count * 0.99)] * 1e3, latencies[-1] * 1e3), file=sys.stderr)
+
+
+async def bulk(wb, args):
+    queue = asyncio.Queue(maxsize=args.concurrency)
+    results = asyncio.Queue()
+    start = time.perf_counter()
+    writer = asyncio.ensure_future(write_results(args, results))
+    workers = [asyncio.ensure_future(lookup_words(wb, args, queue, results)) for _ in range(args.concurrency)]
+    await read_words(args.bulk, queue, args.batch, args.concurrency)
+    await asyncio.gather(*workers)
+    results.put_nowait(None)
+    latencies, errors = await writer
+    print_summary(latencies, errors, time.perf_counter() - start)
+
+
 async def main():
     args = parse_args()
 
@@ -42,10 +189,14 @@ async def main():
     wb = wordbook.WordBook(host=args.host,
                            port=args.port,
                            database=args.database,
-                           strategy=args.strategy)
+                           strategy=args.strategy,
+                           conn=wordbook.DictPool(max_size=args.connections) if args.bulk else None)
     await wb.connect()
 
-    if args.list_databases:
+    if args.bulk is not None:
+        await bulk(wb, args)
+
+    elif args.list_databases:
         dbs = await wb.get_databases()
         for db in dbs:
             print("{:30} {}".format(*db.get_database()))
@@ -60,7 +211,7 @@ async def main():
 
         if matches:
             for match in matches:
-                print("{:30} {}".format(*match.split(' ', 1)))
+                print("{:30} {}".format(match.database, match.word))
         else:
             print('No match found')
 
@@ -69,7 +220,7 @@ async def main():
 
         if defines:
             for define in defines:
-                print_line(define)
+                print_definition(define)
             print()
         else:
             print('No definition found')
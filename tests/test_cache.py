@@ -0,0 +1,310 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest.mock import patch, Mock
+
+from tests.common import async_test, get_mock_coro, get_mock_coro_pop_list
+import wordbook
+
+
+class MockClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestResultCache(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = MockClock()
+        self.cache = wordbook.ResultCache(max_size=2, ttl=100, negative_ttl=10, clock=self.clock)
+
+    def test_make_key(self):
+        self.assertEqual(self.cache.make_key('db', None, '  Mock   Rock '), ('db', None, 'mock rock'))
+        self.assertEqual(self.cache.make_key('db', 'prefix', '  Mock   Rock '), ('db', 'prefix', 'mock rock'))
+        # patterns and unknown strategies are not normalized
+        self.assertEqual(self.cache.make_key('db', 're', r'^\D  x'), ('db', 're', r'^\D  x'))
+        self.assertNotEqual(self.cache.make_key('db', 're', r'^\D'), self.cache.make_key('db', 're', r'^\d'))
+        self.assertEqual(self.cache.make_key('db', '.', ' Mock'), ('db', '.', ' Mock'))
+
+    def test_hit_miss(self):
+        self.assertIsNone(self.cache.get(('db', None, 'mock')))
+        self.cache.set(('db', None, 'mock'), ['mock result'])
+        self.assertEqual(self.cache.get(('db', None, 'mock')), ['mock result'])
+        self.assertEqual(self.cache.hits, 1)
+        self.assertEqual(self.cache.misses, 1)
+
+    def test_ttl(self):
+        self.cache.set(('db', None, 'mock'), ['mock result'])
+        self.cache.set(('db', None, 'rock'), [])
+        self.clock.now = 50
+        self.assertEqual(self.cache.get(('db', None, 'mock')), ['mock result'])
+        self.assertIsNone(self.cache.get(('db', None, 'rock')))
+        self.clock.now = 100
+        self.assertIsNone(self.cache.get(('db', None, 'mock')))
+        self.assertEqual(self.cache.expirations, 2)
+        self.assertEqual(len(self.cache), 0)
+
+    def test_lru_eviction(self):
+        self.cache.set('a', ['a'])
+        self.cache.set('b', ['b'])
+        self.cache.get('a')
+        self.cache.set('c', ['c'])
+        self.assertIn('a', self.cache)
+        self.assertNotIn('b', self.cache)
+        self.assertEqual(self.cache.stats()['evictions'], 1)
+
+
+class TestWordBookCache(unittest.TestCase):
+
+    def setUp(self):
+        self.mock_dictbase = patch('wordbook.wordbook.DictBase').start()
+
+    def tearDown(self):
+        patch.stopall()
+
+    @async_test
+    def test_define(self):
+        wb = wordbook.WordBookDatabase('db', wordbook.WordBook(cache=wordbook.ResultCache()))
+        self.mock_dictbase.return_value.define = get_mock_coro(['mock result'])
+        yield from wb.define('Mock')
+        ret = yield from wb.define('mock')
+        self.assertEqual(ret, ['mock result'])
+        self.mock_dictbase.return_value.define.assert_called_once_with('db', 'Mock')
+
+    @async_test
+    def test_match_no_match(self):
+        wb = wordbook.WordBook(cache=wordbook.ResultCache())
+        self.mock_dictbase.return_value.match = get_mock_coro([])
+        yield from wb.match('mock')
+        ret = yield from wb.match('mock')
+        self.assertEqual(ret, [])
+        self.mock_dictbase.return_value.match.assert_called_once_with('*', '.', 'mock')
+        self.assertEqual(wb.cache.hits, 1)
+
+    @async_test
+    def test_match_pattern(self):
+        wb = wordbook.WordBookStrategy('re', wordbook.WordBook(cache=wordbook.ResultCache()))
+        self.mock_dictbase.return_value.match = get_mock_coro_pop_list([['non-digit'], ['digit']])
+        yield from wb.match(r'^\D')
+        ret = yield from wb.match(r'^\d')
+        self.assertEqual(ret, ['digit'])
+        self.assertEqual(self.mock_dictbase.return_value.match.call_count, 2)
+        self.assertEqual(wb.cache.hits, 0)
+
+
+class TestMetadataCache(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = MockClock()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'metadata.json')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_ttl(self):
+        cache = wordbook.MetadataCache(ttl=100, clock=self.clock)
+        cache.set('host:1', 'databases', ['db "Mock"'])
+        self.assertEqual(cache.get('host:1', 'databases'), ['db "Mock"'])
+        self.assertIsNone(cache.get('host:2', 'databases'))
+        self.clock.now = 100
+        self.assertIsNone(cache.get('host:1', 'databases'))
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+
+    def test_banner_changed(self):
+        cache = wordbook.MetadataCache(clock=self.clock)
+        cache.check_banner('host:1', 'dictd 1.0', '<mime>')
+        cache.set('host:1', 'strategies', ['exact "Exact"'])
+        cache.check_banner('host:1', 'dictd 1.0', '<mime>')
+        self.assertEqual(cache.get('host:1', 'strategies'), ['exact "Exact"'])
+        self.assertEqual(cache.get_banner('host:1'), ('dictd 1.0', '<mime>'))
+
+        cache.check_banner('host:1', 'dictd 1.1', '<mime>')
+        self.assertIsNone(cache.get('host:1', 'strategies'))
+
+    def test_databases_changed(self):
+        cache = wordbook.MetadataCache(clock=self.clock)
+        cache.set('host:1', 'databases', ['db1 "Mock"'])
+        cache.set('host:1', 'info:db1', ['Mock database'])
+        cache.set('host:1', 'databases', ['db1 "Mock"'])
+        self.assertEqual(cache.get('host:1', 'info:db1'), ['Mock database'])
+
+        cache.set('host:1', 'databases', ['db1 "Mock"', 'db2 "Mock"'])
+        self.assertIsNone(cache.get('host:1', 'info:db1'))
+        self.assertEqual(len(cache.get('host:1', 'databases')), 2)
+
+    def test_persistence(self):
+        cache = wordbook.MetadataCache(path=self.path, clock=self.clock)
+        cache.check_banner('host:1', 'dictd 1.0', '<mime>')
+        cache.set('host:1', 'databases', ['db "Mock"'])
+
+        cache = wordbook.MetadataCache(path=self.path, clock=self.clock)
+        self.assertEqual(cache.get('host:1', 'databases'), ['db "Mock"'])
+        cache.invalidate('host:1')
+        self.assertIsNone(wordbook.MetadataCache(path=self.path).get('host:1', 'databases'))
+
+    def test_corrupted_file(self):
+        with open(self.path, 'w') as f:
+            f.write('{not json')
+        cache = wordbook.MetadataCache(path=self.path)
+        self.assertIsNone(cache.get('host:1', 'databases'))
+
+    @async_test
+    def test_wordbook(self):
+        conn = Mock(banner='dictd 1.0', capabilities='<mime>', endpoint='host:1')
+        conn.connect = get_mock_coro(None)
+        conn.client = get_mock_coro(None)
+        conn.show_db = get_mock_coro(['db "Mock"'])
+        conn.show_info = get_mock_coro(['Mock database'])
+        wb = wordbook.WordBook('host', 1, conn=conn, metadata=wordbook.MetadataCache(path=self.path))
+        yield from wb.connect()
+        yield from wb.get_databases()
+        dbs = yield from wb.get_databases()
+        info = yield from dbs[0].get_info()
+        yield from dbs[0].get_info()
+
+        self.assertEqual(dbs[0].database, 'db "Mock"')
+        self.assertEqual(info, ['Mock database'])
+        conn.show_db.assert_called_once_with()
+        conn.show_info.assert_called_once_with('db')
+
+        # a new process with the same file
+        wb = wordbook.WordBook('host', 1, conn=conn, metadata=wordbook.MetadataCache(path=self.path))
+        yield from wb.connect()
+        yield from wb.get_databases()
+        conn.show_db.assert_called_once_with()
+
+        # another server with the same host and port arguments
+        conn.endpoint = 'unix:/run/dict.sock'
+        wb = wordbook.WordBook('host', 1, conn=conn, metadata=wordbook.MetadataCache(path=self.path))
+        yield from wb.connect()
+        yield from wb.get_databases()
+        self.assertEqual(conn.show_db.call_count, 2)
+
+
+class TestDiskCache(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = MockClock()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'cache.sqlite')
+        self.cache = wordbook.DiskCache(self.path, ttl=100, negative_ttl=10, clock=self.clock)
+
+    def tearDown(self):
+        self.cache.close()
+        self.tmpdir.cleanup()
+
+    def test_roundtrip(self):
+        definitions = [wordbook.Definition('"mock" db "Mock db"', b'mock\n  \xc5\x82 an imitation\n')]
+        matches = [wordbook.Match(b'db "mock"'), wordbook.Match(b'db "mockery"')]
+        self.cache.set(('db', None, 'mock'), definitions)
+        self.cache.set(('db', 'prefix', 'mock'), matches)
+
+        self.assertEqual(self.cache.get(('db', None, 'mock')), definitions)
+        self.assertEqual(self.cache.get(('db', 'prefix', 'mock')), matches)
+        self.assertIsNone(self.cache.get(('db', 'exact', 'mock')))
+        self.assertEqual((self.cache.hits, self.cache.misses), (2, 1))
+
+    def test_ttl(self):
+        self.cache.set(('db', None, 'mock'), [wordbook.Match(b'db "mock"')])
+        self.cache.set(('db', None, 'rock'), [])
+        self.clock.now = 10
+        self.assertNotIn(('db', None, 'rock'), self.cache)
+        self.assertIn(('db', None, 'mock'), self.cache)
+        self.assertIsNone(self.cache.get(('db', None, 'rock')))
+        self.assertEqual(self.cache.expirations, 1)
+        self.assertEqual(len(self.cache), 1)
+
+    def test_lru_eviction(self):
+        self.cache.close()
+        self.cache = wordbook.DiskCache(self.path, max_bytes=200, clock=self.clock)
+        value = [wordbook.Match(b'db "mock"')]
+        size = len(self.cache.encode(value))
+        count = 200 // size
+        for num in range(count):
+            self.clock.now = num
+            self.cache.set(('db', None, str(num)), value)
+        self.clock.now = count
+        self.cache.get(('db', None, '0'))
+        self.cache.set(('db', None, 'new'), value)
+
+        self.assertLessEqual(self.cache.size_bytes(), 200)
+        self.assertIn(('db', None, '0'), self.cache)
+        self.assertNotIn(('db', None, '1'), self.cache)
+        self.assertIn(('db', None, 'new'), self.cache)
+        self.assertGreater(self.cache.evictions, 0)
+
+    def test_size_bytes(self):
+        total = 'SELECT COALESCE(SUM(size), 0) FROM entries'
+        self.cache.set(('db', None, 'mock'), [wordbook.Match(b'db "mock"')])
+        self.cache.set(('db', None, 'rock'), [wordbook.Match(b'db "rock"')])
+        self.cache.set(('db', None, 'mock'), [wordbook.Match(b'db "mock"'), wordbook.Match(b'db "mockery"')])
+        self.assertEqual(self.cache.size_bytes(), self.cache._db.execute(total).fetchone()[0])
+        self.cache.invalidate(('db', None, 'rock'))
+        self.assertEqual(self.cache.size_bytes(), self.cache._db.execute(total).fetchone()[0])
+
+        # a file written without the running total
+        self.cache._db.execute('DROP TABLE total')
+        other = wordbook.DiskCache(self.path, clock=self.clock)
+        self.assertEqual(other.size_bytes(), len(other.encode([wordbook.Match(b'db "mock"'),
+                                                               wordbook.Match(b'db "mockery"')])))
+        other.clear()
+        self.assertEqual(self.cache.size_bytes(), 0)
+        other.close()
+
+    def test_shared(self):
+        other = wordbook.DiskCache(self.path, clock=self.clock)
+        self.cache.set(('db', None, 'mock'), [wordbook.Match(b'db "mock"')])
+        self.assertEqual(other.get(('db', None, 'mock')), [wordbook.Match(b'db "mock"')])
+        other.invalidate(('db', None, 'mock'))
+        self.assertIsNone(self.cache.get(('db', None, 'mock')))
+        other.close()
+
+    def test_locked(self):
+        self.cache.set(('db', None, 'mock'), [wordbook.Match(b'db "mock"')])
+        self.cache.set(('db', None, 'rock'), [])
+        writer = sqlite3.connect(self.path, timeout=0, isolation_level=None)
+        writer.execute('BEGIN IMMEDIATE')
+        self.clock.now = 10
+
+        self.cache.set(('db', None, 'new'), [wordbook.Match(b'db "new"')])
+        self.assertIsNone(self.cache.get(('db', None, 'rock')))
+        self.assertEqual(self.cache.get(('db', None, 'mock')), [wordbook.Match(b'db "mock"')])
+        self.assertEqual(self.cache.locked, 2)
+        writer.execute('COMMIT')
+        writer.close()
+        self.assertNotIn(('db', None, 'new'), self.cache)
+
+    def test_used_batch(self):
+        self.cache.close()
+        self.cache = wordbook.DiskCache(self.path, used_batch=2, clock=self.clock)
+        self.cache.set(('db', None, 'mock'), [wordbook.Match(b'db "mock"')])
+        self.cache.set(('db', None, 'rock'), [wordbook.Match(b'db "rock"')])
+        used = 'SELECT used FROM entries ORDER BY key'
+        self.clock.now = 5
+        self.cache.get(('db', None, 'mock'))
+        self.assertEqual(self.cache._db.execute(used).fetchall(), [(0,), (0,)])
+        self.cache.get(('db', None, 'rock'))
+        self.assertEqual(self.cache._db.execute(used).fetchall(), [(5,), (5,)])
+
+    @async_test
+    def test_wordbook(self):
+        conn = Mock()
+        conn.define = get_mock_coro([wordbook.Definition('"mock" db "Mock db"', b'mock\n')])
+        wb = wordbook.WordBookDatabase('db', wordbook.WordBook(conn=conn, cache=self.cache))
+        yield from wb.define('mock')
+        cold = wordbook.WordBookDatabase('db', wordbook.WordBook(conn=conn, cache=wordbook.DiskCache(self.path, clock=self.clock)))
+        ret = yield from cold.define('Mock')
+
+        self.assertEqual(ret[0].word, 'mock')
+        conn.define.assert_called_once_with('db', 'mock')
+        cold.cache.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
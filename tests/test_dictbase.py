@@ -3,6 +3,7 @@ import asyncio
 from unittest.mock import patch, Mock
 
 from tests.common import async_test, get_mock_coro, get_mock_coro_pop_list
+from wordbook.results import Definition, Match
 import wordbook
 
 
@@ -11,9 +12,9 @@ class TestDictBaseConnect(unittest.TestCase):
     def setUp(self):
         self.dictbase = wordbook.dictbase.DictBase()
         mock_reader = Mock()
-        mock_reader.readline = get_mock_coro(b"220 my mock-dictd <mock.capabilities> <mock-msg-id>\r\n")
+        mock_reader.read = get_mock_coro(b"220 my mock-dictd <mock.capabilities> <mock-msg-id>\r\n")
         self.mock_open_connection = get_mock_coro((mock_reader, Mock()))
-        patch('wordbook.dictbase.asyncio.open_connection', self.mock_open_connection).start()
+        patch('wordbook.transport.asyncio.open_connection', self.mock_open_connection).start()
 
     def tearDown(self):
         patch.stopall()
@@ -24,7 +25,7 @@ class TestDictBaseConnect(unittest.TestCase):
 
         self.assertTrue(self.dictbase.connected)
         self.assertEqual(self.dictbase.msg_id, '<mock-msg-id>')
-        self.mock_open_connection.assert_called_once_with('10.11.12.13', 9999)
+        self.mock_open_connection.assert_called_once_with('10.11.12.13', 9999, limit=2 ** 16)
 
     @async_test
     def test_connect_default(self):
@@ -32,7 +33,7 @@ class TestDictBaseConnect(unittest.TestCase):
 
         self.assertTrue(self.dictbase.connected)
         self.assertEqual(self.dictbase.msg_id, '<mock-msg-id>')
-        self.mock_open_connection.assert_called_once_with('127.0.0.1', 2628)
+        self.mock_open_connection.assert_called_once_with('127.0.0.1', 2628, limit=2 ** 16)
 
 
 class TestDictBaseCommands(unittest.TestCase):
@@ -46,25 +47,36 @@ class TestDictBaseCommands(unittest.TestCase):
     def tearDown(self):
         patch.stopall()
 
+    @async_test
+    def test_parse_error(self):
+        self.dictbase.reader.read = get_mock_coro(b"no status line\r\n")
+        self.dictbase.connected = True
+
+        with self.assertRaises(wordbook.exceptions.ParseError):
+            yield from self.dictbase.status()
+
+        self.assertFalse(self.dictbase.connected)
+        self.dictbase.writer.close.assert_called_once_with()
+
     @async_test
     def test_client(self):
-        self.dictbase.reader.readline = get_mock_coro(b"250 ok\r\n")
+        self.dictbase.reader.read = get_mock_coro(b"250 ok\r\n")
 
         ret = yield from self.dictbase.client('mock-client')
 
         self.assertIsNone(ret)
         self.dictbase.writer.write.assert_called_once_with(b'CLIENT mock-client\r\n') 
-        self.dictbase.reader.readline.assert_called_once_with()
+        self.dictbase.reader.read.assert_called_once_with(wordbook.dictbase.DictBase.READ_SIZE)
 
     @async_test
     def test_show_db_empty(self):
-        self.dictbase.reader.readline = get_mock_coro(b"554 No databases\r\n")
+        self.dictbase.reader.read = get_mock_coro(b"554 No databases\r\n")
 
         ret = yield from self.dictbase.show_db()
 
         self.assertEqual(ret, [])
         self.dictbase.writer.write.assert_called_once_with(b'SHOW DB\r\n') 
-        self.dictbase.reader.readline.assert_called_once_with()
+        self.dictbase.reader.read.assert_called_once_with(wordbook.dictbase.DictBase.READ_SIZE)
 
     @async_test
     def test_show_db_present(self):
@@ -73,7 +85,7 @@ class TestDictBaseCommands(unittest.TestCase):
                 b'db2 "Database 2"\r\n',
                 b'.\r\n',
                 b'250 ok\r\n']
-        self.dictbase.reader.readline = get_mock_coro_pop_list(resp)
+        self.dictbase.reader.read = get_mock_coro_pop_list(resp)
 
         ret = yield from self.dictbase.show_db()
         self.assertEqual(ret, ['db1 "Database 1"', 'db2 "Database 2"'])
@@ -86,7 +98,7 @@ class TestDictBaseCommands(unittest.TestCase):
                 b'=============================\r\n',
                 b'.\r\n',
                 b'250 ok\r\n']
-        self.dictbase.reader.readline = get_mock_coro_pop_list(resp)
+        self.dictbase.reader.read = get_mock_coro_pop_list(resp)
 
         ret = yield from self.dictbase.show_info('db1')
 
@@ -103,7 +115,7 @@ class TestDictBaseCommands(unittest.TestCase):
                 b'prefix "Match prefixes"\r\n',
                 b'.\r\n',
                 b'250 ok\r\n']
-        self.dictbase.reader.readline = get_mock_coro_pop_list(resp)
+        self.dictbase.reader.read = get_mock_coro_pop_list(resp)
 
         ret = yield from self.dictbase.show_strat()
 
@@ -116,7 +128,7 @@ class TestDictBaseCommands(unittest.TestCase):
                 b'dictd 1.12.1/rf on Linux 4.10.0-27-generic\r\n',
                 b'.\r\n',
                 b'250 ok\r\n']
-        self.dictbase.reader.readline = get_mock_coro_pop_list(resp)
+        self.dictbase.reader.read = get_mock_coro_pop_list(resp)
 
         ret = yield from self.dictbase.show_server()
 
@@ -125,13 +137,13 @@ class TestDictBaseCommands(unittest.TestCase):
 
     @async_test
     def test_status(self):
-        self.dictbase.reader.readline = get_mock_coro(b"210 status mock/mock/mock\r\n")
+        self.dictbase.reader.read = get_mock_coro(b"210 status mock/mock/mock\r\n")
 
         ret = yield from self.dictbase.status()
 
         self.assertEqual(ret, 'status mock/mock/mock')
         self.dictbase.writer.write.assert_called_once_with(b'STATUS\r\n') 
-        self.dictbase.reader.readline.assert_called_once_with()
+        self.dictbase.reader.read.assert_called_once_with(wordbook.dictbase.DictBase.READ_SIZE)
 
     @async_test
     def test_help(self):
@@ -140,7 +152,7 @@ class TestDictBaseCommands(unittest.TestCase):
                 b'line 2\r\n',
                 b'.\r\n',
                 b'250 ok\r\n']
-        self.dictbase.reader.readline = get_mock_coro_pop_list(resp)
+        self.dictbase.reader.read = get_mock_coro_pop_list(resp)
 
         ret = yield from self.dictbase.help()
 
@@ -149,39 +161,39 @@ class TestDictBaseCommands(unittest.TestCase):
 
     @async_test
     def test_quit(self):
-        self.dictbase.reader.readline = get_mock_coro(b"221 bye [d/m/c = 0/0/0; 3.000r 0.000u 0.000s]")
+        self.dictbase.reader.read = get_mock_coro(b"221 bye [d/m/c = 0/0/0; 3.000r 0.000u 0.000s]\r\n")
 
         ret = yield from self.dictbase.quit()
 
         self.assertIsNone(ret)
         self.dictbase.writer.write.assert_called_once_with(b'QUIT\r\n') 
-        self.dictbase.reader.readline.assert_called_once_with()
+        self.dictbase.reader.read.assert_called_once_with(wordbook.dictbase.DictBase.READ_SIZE)
 
     @async_test
     def test_option_mime(self):
-        self.dictbase.reader.readline = get_mock_coro(b"250 mock - using MIME headers")
+        self.dictbase.reader.read = get_mock_coro(b"250 mock - using MIME headers\r\n")
 
         ret = yield from self.dictbase.option_mime()
 
         self.assertEqual(ret, 'mock - using MIME headers')
         self.dictbase.writer.write.assert_called_once_with(b'OPTION MIME\r\n') 
-        self.dictbase.reader.readline.assert_called_once_with()
+        self.dictbase.reader.read.assert_called_once_with(wordbook.dictbase.DictBase.READ_SIZE)
 
     @async_test
     def test_define_no_match(self):
-        self.dictbase.reader.readline = get_mock_coro(b"552 no match [d/m/c = 0/0/52; 0.000r 0.000u 0.000s]")
+        self.dictbase.reader.read = get_mock_coro(b"552 no match [d/m/c = 0/0/52; 0.000r 0.000u 0.000s]\r\n")
 
         ret = yield from self.dictbase.define('db1', 'mock rock')
 
         self.assertEqual(ret, [])
         self.dictbase.writer.write.assert_called_once_with(b'DEFINE db1 "mock rock"\r\n') 
-        self.dictbase.reader.readline.assert_called_once_with()
+        self.dictbase.reader.read.assert_called_once_with(wordbook.dictbase.DictBase.READ_SIZE)
 
     @async_test
     def test_define_return(self):
 
         resp = [b'150 2 definitions retrieved\r\n',
-				b'151 "The" db1 "The db1 mock\r\n"',
+				b'151 "The" db1 "The db1 mock"\r\n',
 				b'mock from db1 line 1\r\n',
 				b'mock from db1 line 2\r\n',
 				b'.\r\n',
@@ -190,27 +202,32 @@ class TestDictBaseCommands(unittest.TestCase):
 				b'.\r\n',
 				b'250 ok\r\n']
 
-        self.dictbase.reader.readline = get_mock_coro_pop_list(resp)
+        self.dictbase.reader.read = get_mock_coro_pop_list(resp)
 
         ret = yield from self.dictbase.define('*', 'mock')
 
-        self.assertEqual(ret, ['["The" db1 "The db1 mock\r]',
-                               'mock from db1 line 1',
-                               'mock from db1 line 2',
-                               '["The" db9 "The mock db9"]',
-                               'mock from db2'])
+        self.assertEqual([(d.word, d.database, d.description, d.lines) for d in ret],
+                         [('The', 'db1', 'The db1 mock', ['mock from db1 line 1', 'mock from db1 line 2']),
+                          ('The', 'db9', 'The mock db9', ['mock from db2'])])
 
         self.dictbase.writer.write.assert_called_once_with(b'DEFINE * "mock"\r\n') 
 
+    @async_test
+    def test_connection_closed(self):
+        self.dictbase.reader.read = get_mock_coro(b'')
+
+        with self.assertRaises(wordbook.exceptions.DictConnectionError):
+            yield from self.dictbase.status()
+
     @async_test
     def test_match_no_match(self):
-        self.dictbase.reader.readline = get_mock_coro(b"552 no match [d/m/c = 0/0/52; 0.000r 0.000u 0.000s]")
+        self.dictbase.reader.read = get_mock_coro(b"552 no match [d/m/c = 0/0/52; 0.000r 0.000u 0.000s]\r\n")
 
         ret = yield from self.dictbase.match('db1', 'strategy1', 'mock rock')
 
         self.assertEqual(ret, [])
         self.dictbase.writer.write.assert_called_once_with(b'MATCH db1 strategy1 "mock rock"\r\n') 
-        self.dictbase.reader.readline.assert_called_once_with()
+        self.dictbase.reader.read.assert_called_once_with(wordbook.dictbase.DictBase.READ_SIZE)
 
     @async_test
     def test_match_return(self):
@@ -222,14 +239,200 @@ class TestDictBaseCommands(unittest.TestCase):
 				b'.\r\n',
 				b'250 ok\r\n']
 
-        self.dictbase.reader.readline = get_mock_coro_pop_list(resp)
+        self.dictbase.reader.read = get_mock_coro_pop_list(resp)
 
         ret = yield from self.dictbase.match('*', '.', 'mock')
 
-        self.assertEqual(ret, ['db1 "Abode', 'db1 "Abide', 'db2 "abide'])
+        self.assertEqual([(m.database, m.word) for m in ret], [('db1', 'Abode'), ('db1', 'Abide'), ('db2', 'abide')])
         self.dictbase.writer.write.assert_called_once_with(b'MATCH * . "mock"\r\n') 
 
 
+class TestDictBasePipeline(unittest.TestCase):
+
+    def setUp(self):
+        self.dictbase = wordbook.dictbase.DictBase()
+        self.dictbase.writer = Mock()
+        self.dictbase.writer.drain = get_mock_coro(None)
+        self.dictbase.reader = Mock()
+
+    @async_test
+    def test_define_many(self):
+        resp = [b'150 1 definitions retrieved\r\n',
+                b'151 "mock" db1 "Mock db1"\r\n',
+                b'mock definition\r\n',
+                b'.\r\n',
+                b'250 ok\r\n',
+                b'552 no match\r\n']
+        self.dictbase.reader.read = get_mock_coro_pop_list(resp)
+
+        ret = yield from self.dictbase.define_many('db1', ['mock', 'rock'])
+
+        self.assertEqual(ret, [[Definition('"mock" db1 "Mock db1"', b'mock definition\r\n')], []])
+        self.dictbase.writer.write.assert_called_once_with(b'DEFINE db1 "mock"\r\nDEFINE db1 "rock"\r\n')
+
+    @async_test
+    def test_match_many_errors(self):
+        resp = [b'551 invalid strategy\r\n',
+                b'152 1 matches found\r\n',
+                b'db1 "mock"\r\n',
+                b'.\r\n',
+                b'250 ok\r\n']
+        self.dictbase.reader.read = get_mock_coro_pop_list(list(resp))
+
+        ret = yield from self.dictbase.match_many('db1', 'st', ['mock', 'rock'], return_exceptions=True)
+
+        self.assertIsInstance(ret[0], wordbook.exceptions.InvalidStrategy)
+        self.assertEqual(ret[1], [Match(b'db1 "mock"')])
+
+        self.dictbase.reader.read = get_mock_coro_pop_list(list(resp))
+        with self.assertRaises(wordbook.exceptions.InvalidStrategy):
+            yield from self.dictbase.match_many('db1', 'st', ['mock', 'rock'])
+        self.assertEqual(self.dictbase.reader.read.call_count, len(resp))
+
+    @async_test
+    def test_shared_connection(self):
+        resp = [b'552 no match\r\n',
+                b'152 1 matches found\r\n',
+                b'db1 "mock"\r\n',
+                b'.\r\n',
+                b'250 ok\r\n']
+        self.dictbase.reader.read = get_mock_coro_pop_list(resp)
+
+        # started in this order; gather() does not keep it on Python 3.6
+        define = asyncio.ensure_future(self.dictbase.define('db1', 'rock'))
+        yield from asyncio.sleep(0)
+        match = asyncio.ensure_future(self.dictbase.match('db1', '.', 'mock'))
+        ret = yield from asyncio.gather(define, match)
+
+        self.assertEqual(ret, [[], [Match(b'db1 "mock"')]])
+
+    @async_test
+    def test_timeout(self):
+        @asyncio.coroutine
+        def never(size):
+            yield from asyncio.sleep(10)
+        self.dictbase.reader.read = never
+        self.dictbase.connected = True
+
+        with self.assertRaises(wordbook.exceptions.DictTimeoutError):
+            yield from self.dictbase.define('db1', 'mock', timeout=0.01)
+        self.assertFalse(self.dictbase.connected)
+        self.dictbase.writer.close.assert_called_once_with()
+
+
+class TestDictBaseStream(unittest.TestCase):
+
+    def setUp(self):
+        self.dictbase = wordbook.dictbase.DictBase()
+        self.dictbase.writer = Mock()
+        self.dictbase.writer.drain = get_mock_coro(None)
+        self.dictbase.reader = Mock()
+
+    @asyncio.coroutine
+    def collect(self, stream):
+        ret = []
+        while True:
+            try:
+                item = yield from stream.__anext__()
+            except StopAsyncIteration:
+                return ret
+            ret.append(item)
+
+    @async_test
+    def test_iter_define(self):
+        resp = [b'150 2 definitions retrieved\r\n',
+                b'151 "mock" db1 "Mock db1"\r\n',
+                b'mock from db1\r\n',
+                b'.\r\n',
+                b'151 "mock" db2 "Mock db2"\r\n',
+                b'mock from db2\r\n',
+                b'.\r\n',
+                b'250 ok\r\n']
+        self.dictbase.reader.read = get_mock_coro_pop_list(resp)
+
+        ret = yield from self.collect(self.dictbase.iter_define('*', 'mock'))
+
+        self.assertEqual([(d.database, d.text) for d in ret], [('db1', 'mock from db1'), ('db2', 'mock from db2')])
+        self.dictbase.writer.write.assert_called_once_with(b'DEFINE * "mock"\r\n')
+
+    @async_test
+    def test_iter_match(self):
+        resp = [b'152 2 matches found\r\n',
+                b'db1 "mock"\r\n',
+                b'db2 "mock"\r\n',
+                b'.\r\n',
+                b'250 ok\r\n']
+        self.dictbase.reader.read = get_mock_coro_pop_list(resp)
+
+        ret = yield from self.collect(self.dictbase.iter_match('*', 'exact', 'mock'))
+
+        self.assertEqual(ret, [Match(b'db1 "mock"'), Match(b'db2 "mock"')])
+
+    @async_test
+    def test_iter_no_match(self):
+        self.dictbase.reader.read = get_mock_coro(b'552 no match\r\n')
+
+        ret = yield from self.collect(self.dictbase.iter_match('*', 'exact', 'mock'))
+
+        self.assertEqual(ret, [])
+
+    @async_test
+    def test_iter_invalid_database(self):
+        self.dictbase.reader.read = get_mock_coro(b'550 invalid database\r\n')
+
+        with self.assertRaises(wordbook.exceptions.InvalidDatabase):
+            yield from self.collect(self.dictbase.iter_define('db9', 'mock'))
+
+    @async_test
+    def test_iter_aclose(self):
+        resp = [b'152 2 matches found\r\n',
+                b'db1 "mock"\r\n',
+                b'db2 "mock"\r\n',
+                b'.\r\n',
+                b'250 ok\r\n',
+                b'210 status mock\r\n']
+        self.dictbase.reader.read = get_mock_coro_pop_list(resp)
+
+        stream = self.dictbase.iter_match('*', 'exact', 'mock')
+        ret = yield from stream.__anext__()
+        yield from stream.aclose()
+        status = yield from self.dictbase.status()
+
+        self.assertEqual(ret, Match(b'db1 "mock"'))
+        self.assertEqual(status, 'status mock')
+
+    @async_test
+    def test_iter_cancel_waiting(self):
+        resp = [b'552 no match\r\n',
+                b'150 1 definitions retrieved\r\n',
+                b'151 "rock" db1 "Mock db1"\r\n',
+                b'rock definition\r\n',
+                b'.\r\n',
+                b'250 ok\r\n',
+                b'552 no match\r\n']
+
+        @asyncio.coroutine
+        def slow_read(size):
+            # the reply of the first define comes late
+            if len(resp) == 7:
+                yield from asyncio.sleep(0.02)
+            return resp.pop(0)
+        self.dictbase.reader.read = slow_read
+
+        first = asyncio.ensure_future(self.dictbase.define('db1', 'mock'))
+        yield from asyncio.sleep(0)
+        waiting = asyncio.ensure_future(self.dictbase.iter_define('db1', 'rock').__anext__())
+        yield from asyncio.sleep(0)
+        # cancelled while the stream waits for its turn behind the define
+        waiting.cancel()
+        last = yield from self.dictbase.define('db1', 'sock')
+
+        self.assertEqual((yield from first), [])
+        self.assertTrue(waiting.cancelled())
+        self.assertEqual(last, [])
+        self.assertEqual(resp, [])
+
+
 if __name__ == '__main__':
     import logging
     logging.basicConfig(level=logging.DEBUG)
@@ -0,0 +1,37 @@
+import unittest
+
+from wordbook.hedging import HedgingPolicy
+
+
+class TestHedgingPolicy(unittest.TestCase):
+
+    def test_initial_delay(self):
+        policy = HedgingPolicy(initial_delay=0.5, min_samples=3)
+        policy.record(0.1)
+        policy.record(0.2)
+        self.assertEqual(policy.delay(), 0.5)
+
+    def test_percentile(self):
+        policy = HedgingPolicy(percentile=90, min_delay=0, min_samples=1)
+        for num in range(100):
+            policy.record(num / 1000.0)
+        self.assertEqual(policy.delay(), 0.09)
+
+    def test_clamped(self):
+        policy = HedgingPolicy(min_delay=0.01, max_delay=1.0, min_samples=1)
+        policy.record(0.001)
+        self.assertEqual(policy.delay(), 0.01)
+        policy = HedgingPolicy(min_delay=0.01, max_delay=1.0, min_samples=1)
+        policy.record(5.0)
+        self.assertEqual(policy.delay(), 1.0)
+
+    def test_window(self):
+        policy = HedgingPolicy(min_delay=0, min_samples=1, window=2)
+        for latency in (3.0, 0.1, 0.2):
+            policy.record(latency)
+        self.assertEqual(policy.delay(), 0.2)
+        self.assertEqual(len(policy._sorted), 2)
+
+    def test_invalid_percentile(self):
+        with self.assertRaises(ValueError):
+            HedgingPolicy(percentile=0)
@@ -0,0 +1,139 @@
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+import zlib
+
+from tests.common import async_test
+from wordbook.local import LocalDict, b64_decode, b64_encode, sort_key
+import wordbook
+
+
+ENTRIES = [
+    ('00-database-short', '00-database-short\n     Mock Dictionary\n'),
+    ('00-database-info', '00-database-info\n     Mock dictionary for tests\n'),
+    ('abide', 'abide\n   to remain\n'),
+    ('abode', 'abode\n   a home\n'),
+    ('Mock', 'Mock\n   an imitation\n'),
+    ('mock', 'mock\n   to ridicule\n'),
+    ('mock-up', 'mock-up\n   a model\n'),
+    ('rock', 'rock\n   a stone ' + 'x' * 200 + '\n'),
+]
+
+
+def write_database(path, name, compress, chunk_length=64):
+    data = b''
+    index = []
+    for headword, text in ENTRIES:
+        raw = text.encode('utf8')
+        index.append((sort_key(headword), '{}\t{}\t{}\n'.format(headword, b64_encode(len(data)), b64_encode(len(raw)))))
+        data += raw
+    with open(os.path.join(path, name + '.index'), 'w') as f:
+        f.write(''.join(line for _, line in sorted(index)))
+
+    if not compress:
+        with open(os.path.join(path, name + '.dict'), 'wb') as f:
+            f.write(data)
+        return
+
+    chunks = []
+    for pos in range(0, len(data), chunk_length):
+        compressor = zlib.compressobj(9, zlib.DEFLATED, -zlib.MAX_WBITS)
+        chunks.append(compressor.compress(data[pos:pos + chunk_length]) + compressor.flush(zlib.Z_FULL_FLUSH))
+    extra = b'RA' + struct.pack('<HHHH', 6 + 2 * len(chunks), 1, chunk_length, len(chunks))
+    extra += struct.pack('<{}H'.format(len(chunks)), *[len(chunk) for chunk in chunks])
+    with open(os.path.join(path, name + '.dict.dz'), 'wb') as f:
+        f.write(b'\x1f\x8b\x08\x04\x00\x00\x00\x00\x00\x03')
+        f.write(struct.pack('<H', len(extra)) + extra)
+        f.write(b''.join(chunks))
+        f.write(struct.pack('<II', zlib.crc32(data), len(data)))
+
+
+class TestBase64(unittest.TestCase):
+
+    def test_roundtrip(self):
+        for value in (0, 1, 63, 64, 4095, 123456789):
+            self.assertEqual(b64_decode(b64_encode(value)), value)
+        self.assertEqual(b64_decode('BA'), 64)
+
+
+class TestLocalDict(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        write_database(self.path, 'db1', compress=False)
+        write_database(self.path, 'db2', compress=True)
+        self.local = LocalDict.from_directory(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    @async_test
+    def test_show_db(self):
+        yield from self.local.connect()
+
+        ret = yield from self.local.show_db()
+
+        self.assertEqual(ret, ['db1 "Mock Dictionary"', 'db2 "Mock Dictionary"'])
+        info = yield from self.local.show_info('db2')
+        self.assertEqual(info, ['Mock dictionary for tests'])
+        yield from self.local.quit()
+
+    @async_test
+    def test_define(self):
+        yield from self.local.connect()
+
+        ret = yield from self.local.define('*', 'MOCK')
+
+        self.assertEqual([(d.word, d.database, d.description) for d in ret],
+                         [('Mock', 'db1', 'Mock Dictionary'), ('mock', 'db1', 'Mock Dictionary'),
+                          ('Mock', 'db2', 'Mock Dictionary'), ('mock', 'db2', 'Mock Dictionary')])
+        self.assertEqual(ret[3].lines, ['mock', '   to ridicule'])
+        yield from self.local.quit()
+
+    @async_test
+    def test_define_dictzip_chunks(self):
+        yield from self.local.connect()
+
+        ret = yield from self.local.define('db2', 'rock')
+        expected = yield from self.local.define('db1', 'rock')
+
+        self.assertEqual(ret[0].text, expected[0].text)
+        self.assertEqual(ret[0].text, 'rock\n   a stone ' + 'x' * 200)
+        yield from self.local.quit()
+
+    @async_test
+    def test_match(self):
+        yield from self.local.connect()
+
+        ret = yield from self.local.match('!', 'prefix', 'mock')
+        no_match = yield from self.local.match('db1', 'exact', 'mockery')
+
+        self.assertEqual([(m.database, m.word) for m in ret], [('db1', 'Mock'), ('db1', 'mock'), ('db1', 'mock-up')])
+        self.assertEqual(no_match, [])
+        yield from self.local.quit()
+
+    @async_test
+    def test_errors(self):
+        yield from self.local.connect()
+
+        with self.assertRaises(wordbook.exceptions.InvalidDatabase):
+            yield from self.local.define('db9', 'mock')
+        with self.assertRaises(wordbook.exceptions.InvalidStrategy):
+            yield from self.local.match('db1', 'soundex', 'mock')
+        yield from self.local.quit()
+
+    @async_test
+    def test_wordbook(self):
+        wb = wordbook.WordBookDatabase('db2', wordbook.WordBook(conn=self.local))
+        yield from wb.connect()
+
+        ret = yield from wb.define('abode')
+
+        self.assertEqual(ret[0].lines, ['abode', '   a home'])
+        yield from self.local.quit()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import unittest
+
+from tests.common import async_test
+from tests.test_server import get_backend
+from wordbook.metrics import Histogram, command_name
+from wordbook.server import DictServer
+import wordbook
+
+
+class TestCommandName(unittest.TestCase):
+
+    def test_command_name(self):
+        self.assertEqual(command_name('DEFINE db "mock rock"\r\n'), 'DEFINE')
+        self.assertEqual(command_name('SHOW db\r\n'), 'SHOW DB')
+        self.assertEqual(command_name('show info db\r\n'), 'SHOW INFO')
+
+
+class TestHistogram(unittest.TestCase):
+
+    def test_cumulative(self):
+        histogram = Histogram((0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 3.0):
+            histogram.observe(value)
+        self.assertEqual(histogram.cumulative(), [(0.1, 2), (1.0, 3), (float('inf'), 4)])
+        self.assertEqual(histogram.count, 4)
+        self.assertAlmostEqual(histogram.sum, 3.65)
+
+
+class TestMetricsCollector(unittest.TestCase):
+
+    @async_test
+    def test_collect(self):
+        server = DictServer(get_backend())
+        yield from server.start()
+        metrics = wordbook.MetricsCollector()
+        conn = wordbook.DictBase(collector=metrics)
+        yield from conn.connect('127.0.0.1', server.port)
+        yield from conn.define_many('db1', ['mock', 'rock'])
+        yield from conn.show_db()
+        stream = conn.iter_match('db1', 'prefix', 'mock')
+        while True:
+            try:
+                yield from stream.__anext__()
+            except StopAsyncIteration:
+                break
+        yield from conn.quit()
+        yield from server.close()
+
+        snapshot = metrics.snapshot()
+        self.assertEqual(snapshot['codes'], {'DEFINE 150': 1, 'DEFINE 552': 1, 'MATCH 152': 1, 'QUIT 221': 1,
+                                             'SHOW DB 110': 1})
+        self.assertEqual(snapshot['commands']['DEFINE']['count'], 2)
+        self.assertEqual(snapshot['lines']['SHOW DB'], {'count': 1, 'sum': 2})
+        self.assertEqual(snapshot['lines']['MATCH'], {'count': 1, 'sum': 2})
+        self.assertEqual(snapshot['lines']['DEFINE'], {'count': 2, 'sum': 2})
+        self.assertEqual(snapshot['connect']['count'], 1)
+        self.assertGreater(snapshot['bytes_sent'], 0)
+        self.assertGreater(snapshot['bytes_received'], snapshot['bytes_sent'])
+
+        text = metrics.prometheus()
+        self.assertIn('# TYPE wordbook_command_seconds histogram\n', text)
+        self.assertIn('wordbook_command_seconds_bucket{command="DEFINE",le="+Inf"} 2\n', text)
+        self.assertIn('wordbook_command_seconds_count{command="DEFINE"} 2\n', text)
+        self.assertIn('wordbook_responses_total{command="DEFINE",code="552"} 1\n', text)
+        self.assertIn('wordbook_connect_seconds_count 1\n', text)
+
+    @async_test
+    def test_define_lines(self):
+        server = DictServer(get_backend())
+        yield from server.start()
+        metrics = wordbook.MetricsCollector()
+        conn = wordbook.DictBase(collector=metrics)
+        yield from conn.connect('127.0.0.1', server.port)
+        yield from conn.define('*', 'mock')
+        stream = conn.iter_define('*', 'mock')
+        while True:
+            try:
+                yield from stream.__anext__()
+            except StopAsyncIteration:
+                break
+        yield from conn.quit()
+        yield from server.close()
+
+        # the same reply counted in text lines by define() and by the stream
+        lines = metrics.snapshot()['lines']['DEFINE']
+        self.assertEqual(lines['count'], 2)
+        self.assertEqual(lines['sum'], 8)
+
+    @async_test
+    def test_connect_error(self):
+        metrics = wordbook.MetricsCollector()
+        server = DictServer(get_backend())
+        yield from server.start()
+        port = server.port
+        yield from server.close()
+
+        with self.assertRaises(OSError):
+            yield from wordbook.DictBase(collector=metrics).connect('127.0.0.1', port)
+        self.assertEqual(metrics.connect_errors, 1)
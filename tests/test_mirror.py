@@ -0,0 +1,112 @@
+import unittest
+import asyncio
+import tempfile
+
+from tests.common import async_test
+from wordbook.mirror import Mirror
+from wordbook.server import DictServer
+import wordbook
+
+
+def get_backend(words, info='Mock database'):
+    entries = {word: '{}\n  definition of {}'.format(word, word) for word in words}
+    return wordbook.MemoryDict([wordbook.MemoryDatabase('db', entries, description='Mock db', info=info)])
+
+
+WORDS = ['mock{}'.format(num) for num in range(60)] + ['apple', 'Apple', 'rock', 'm']
+
+
+class TestMirror(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = self.tmpdir.name
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    @asyncio.coroutine
+    def start(self, backend):
+        self.server = DictServer(backend)
+        yield from self.server.start()
+        self.conn = wordbook.DictPool(max_size=3)
+        yield from self.conn.connect('127.0.0.1', self.server.port)
+
+    @asyncio.coroutine
+    def stop(self):
+        yield from self.conn.quit()
+        yield from self.server.close()
+
+    def mirror(self):
+        return Mirror(self.conn, 'db', self.path, alphabet='abcdefghijklmnopqrstuvwxyz0123456789',
+                      split_threshold=20, batch=7, workers=3)
+
+    @asyncio.coroutine
+    def read_mirror(self):
+        local = wordbook.LocalDict.from_directory(self.path)
+        yield from local.connect()
+        dbs = yield from local.show_db()
+        info = yield from local.show_info('db')
+        matches = yield from local.match('db', 'prefix', '')
+        definitions = yield from local.define('db', 'apple')
+        yield from local.quit()
+        return dbs, info, sorted(match.word for match in matches), definitions
+
+    @async_test
+    def test_mirror(self):
+        yield from self.start(get_backend(WORDS))
+        mirror = self.mirror()
+        yield from mirror.run()
+        mirror.close()
+        yield from self.stop()
+
+        dbs, info, words, definitions = yield from self.read_mirror()
+        self.assertEqual(dbs, ['db "Mock db"'])
+        self.assertEqual(info, ['Mock database'])
+        self.assertEqual(words, sorted(WORDS))
+        self.assertEqual(sorted(d.text for d in definitions),
+                         ['Apple\n  definition of Apple', 'apple\n  definition of apple'])
+        self.assertEqual(mirror.fetched, len(WORDS) - 1)
+
+    @async_test
+    def test_resume(self):
+        yield from self.start(get_backend(WORDS))
+        mirror = self.mirror()
+        yield from mirror.start()
+        yield from mirror.list_headwords()
+        mirror.close()
+
+        mirror = self.mirror()
+        yield from mirror.run()
+        mirror.close()
+        yield from self.stop()
+
+        self.assertEqual(mirror.listed, 0)
+        self.assertEqual(mirror.fetched, len(WORDS) - 1)
+        _, _, words, _ = yield from self.read_mirror()
+        self.assertEqual(words, sorted(WORDS))
+
+    @async_test
+    def test_resync(self):
+        yield from self.start(get_backend(WORDS))
+        mirror = self.mirror()
+        yield from mirror.run()
+        mirror.close()
+        self.server.backend = backend = get_backend(WORDS[1:] + ['rocky'])
+        yield from backend.connect()
+
+        mirror = self.mirror()
+        yield from mirror.run()
+        mirror.close()
+        _, _, words, _ = yield from self.read_mirror()
+        self.assertEqual(words, sorted(WORDS[1:] + ['rocky']))
+        # only the changed ranges are fetched again: "m" itself, "rock" and "rocky"
+        self.assertEqual(mirror.fetched, 3)
+
+        self.server.backend = backend = get_backend(WORDS[1:] + ['rocky'], info='Mock database 2')
+        yield from backend.connect()
+        mirror = self.mirror()
+        yield from mirror.run()
+        mirror.close()
+        yield from self.stop()
+        self.assertEqual(mirror.fetched, len(WORDS) - 1)
@@ -0,0 +1,80 @@
+import unittest
+
+from wordbook.parser import ResponseParser, Status, Header, Text, End
+from wordbook.exceptions import ParseError
+
+
+DEFINE_RESPONSE = (b'150 2 definitions retrieved\r\n'
+                   b'151 "mock" db1 "Mock db1"\r\n'
+                   b'mock line 1\r\n'
+                   b'..mock line 2\r\n'
+                   b'.\r\n'
+                   b'151 "mock" db2 "Mock db2"\r\n'
+                   b'.\r\n'
+                   b'250 ok\r\n')
+
+
+def merge_text(events):
+    ret = []
+    for event in events:
+        if ret and type(event) is Text and type(ret[-1]) is Text and not ret[-1].last:
+            ret[-1] = Text(ret[-1].data + event.data, event.last)
+        else:
+            ret.append(event)
+    return ret
+
+
+class TestResponseParser(unittest.TestCase):
+
+    def test_define(self):
+        parser = ResponseParser()
+
+        events = parser.feed(DEFINE_RESPONSE)
+
+        self.assertEqual(events, [Status(150, '2 definitions retrieved'),
+                                  Header(151, '"mock" db1 "Mock db1"'),
+                                  Text(b'mock line 1\r\n.mock line 2\r\n', True),
+                                  Header(151, '"mock" db2 "Mock db2"'),
+                                  Text(b'', True),
+                                  End(250, 'ok')])
+        self.assertTrue(parser.idle)
+
+    def test_chunks(self):
+        expected = ResponseParser().feed(DEFINE_RESPONSE)
+        for size in (1, 2, 3, 5, 8, 13):
+            parser = ResponseParser()
+            events = []
+            for pos in range(0, len(DEFINE_RESPONSE), size):
+                events.extend(parser.feed(DEFINE_RESPONSE[pos:pos + size]))
+            self.assertEqual(merge_text(events), expected)
+
+    def test_partial_text(self):
+        parser = ResponseParser()
+
+        events = parser.feed(b'152 2 matches found\r\ndb1 "mock"\r\ndb2 "mo')
+
+        self.assertEqual(events, [Status(152, '2 matches found'), Text(b'db1 "mock"\r\n', False)])
+        self.assertFalse(parser.idle)
+        self.assertEqual(parser.feed(b'ck"\r\n.\r\n250 ok\r\n'), [Text(b'db2 "mock"\r\n', True), End(250, 'ok')])
+
+    def test_pipelined(self):
+        parser = ResponseParser()
+
+        events = parser.feed(b'552 no match\r\n552 no match\r\n210 status\r\n')
+
+        self.assertEqual(events, [Status(552, 'no match'), Status(552, 'no match'), Status(210, 'status')])
+
+    def test_utf8(self):
+        parser = ResponseParser()
+
+        events = parser.feed('112 info\r\nzażółć\r\n.\r\n250 ok\r\n'.encode('utf8'))
+
+        self.assertEqual(events[1].lines, ['zażółć'])
+
+    def test_invalid_status(self):
+        with self.assertRaises(ParseError):
+            ResponseParser().feed(b'mock\r\n')
+
+
+if __name__ == '__main__':
+    unittest.main()
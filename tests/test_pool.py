@@ -0,0 +1,181 @@
+import unittest
+import asyncio
+from unittest.mock import patch, Mock
+
+from tests.common import async_test, get_mock_coro
+import wordbook
+
+
+class MockConn:
+
+    def __init__(self):
+        self.connected = True
+        self.banner = 'mock'
+        self.capabilities = '<mock>'
+        self.writer = Mock()
+        self.connect = get_mock_coro(None)
+        self.client = get_mock_coro(None)
+        self.status = get_mock_coro('status mock')
+        self.quit = get_mock_coro(None)
+        self.define = get_mock_coro(['mock result'])
+
+
+class TestDictPool(unittest.TestCase):
+
+    def setUp(self):
+        self.conns = []
+
+    def factory(self):
+        conn = MockConn()
+        self.conns.append(conn)
+        return conn
+
+    @async_test
+    def test_connect(self):
+        pool = wordbook.DictPool(min_size=2, max_size=4, factory=self.factory)
+        yield from pool.connect('1.2.3.4', 5)
+        yield from pool.client('mock-client')
+
+        self.assertTrue(pool.connected)
+        self.assertEqual(pool.size, 2)
+        for conn in self.conns:
+            conn.connect.assert_called_once_with('1.2.3.4', 5)
+            conn.client.assert_called_once_with('mock-client')
+
+    @async_test
+    def test_lazy_open(self):
+        pool = wordbook.DictPool(min_size=0, max_size=2, factory=self.factory)
+        yield from pool.connect()
+        yield from pool.client('mock-client')
+        self.assertEqual(pool.size, 0)
+
+        ret = yield from pool.define('db', 'mock')
+
+        self.assertEqual(ret, ['mock result'])
+        self.assertEqual(pool.size, 1)
+        self.conns[0].client.assert_called_once_with('mock-client')
+
+    @async_test
+    def test_max_size(self):
+        pool = wordbook.DictPool(min_size=0, max_size=2, factory=self.factory)
+        yield from pool.connect()
+        conn1 = yield from pool.acquire()
+        conn2 = yield from pool.acquire()
+        waiter = asyncio.ensure_future(pool.acquire())
+        yield from asyncio.sleep(0)
+        self.assertFalse(waiter.done())
+
+        pool.release(conn1)
+        conn3 = yield from waiter
+        self.assertIs(conn3, conn1)
+        self.assertEqual(pool.size, 2)
+        pool.release(conn2)
+        pool.release(conn3)
+
+    @async_test
+    def test_health_check(self):
+        pool = wordbook.DictPool(min_size=1, max_size=2, health_check_interval=0, factory=self.factory)
+        yield from pool.connect()
+        self.conns[0].status = Mock(side_effect=ConnectionResetError())
+
+        conn = yield from pool.acquire()
+
+        self.assertIs(conn, self.conns[1])
+        self.assertFalse(self.conns[0].connected)
+        self.assertEqual(pool.size, 1)
+
+    @async_test
+    def test_idle_eviction(self):
+        pool = wordbook.DictPool(min_size=1, max_size=3, idle_timeout=10, factory=self.factory)
+        yield from pool.connect()
+        conn1 = yield from pool.acquire()
+        conn2 = yield from pool.acquire()
+        pool.release(conn1)
+        pool.release(conn2)
+        self.assertEqual(pool.size, 2)
+
+        now = pool._now()
+        with patch.object(pool, '_now', return_value=now + 20):
+            conn = yield from pool.acquire()
+
+        self.assertEqual(pool.size, 1)
+        self.assertFalse(conn1.connected)
+        conn1.writer.close.assert_called_once_with()
+        self.assertFalse(conn1.quit.called)
+        self.assertIs(conn, conn2)
+        pool.release(conn)
+        yield from pool.quit()
+
+    @async_test
+    def test_idle_eviction_periodic(self):
+        pool = wordbook.DictPool(min_size=0, max_size=2, idle_timeout=0.02, factory=self.factory)
+        yield from pool.connect()
+        conn = yield from pool.acquire()
+        pool.release(conn)
+        self.assertEqual(pool.size, 1)
+
+        # without any acquire()
+        yield from asyncio.sleep(0.05)
+        self.assertEqual(pool.size, 0)
+        self.assertFalse(conn.connected)
+        yield from pool.quit()
+
+    @async_test
+    def test_transport_error_discards(self):
+        pool = wordbook.DictPool(min_size=1, max_size=1, factory=self.factory)
+        yield from pool.connect()
+        self.conns[0].define = Mock(side_effect=ConnectionResetError())
+
+        with self.assertRaises(ConnectionResetError):
+            yield from pool.define('db', 'mock')
+
+        self.assertEqual(pool.size, 0)
+        ret = yield from pool.define('db', 'mock')
+        self.assertEqual(ret, ['mock result'])
+
+
+if __name__ == '__main__':
+    import logging
+    logging.basicConfig(level=logging.DEBUG)
+    unittest.main()
+
+
+class TestDictPoolHedging(unittest.TestCase):
+
+    def setUp(self):
+        self.conns = []
+
+    def factory(self):
+        conn = MockConn()
+        if not self.conns:
+            @asyncio.coroutine
+            def slow(*args, **kwargs):
+                yield from asyncio.sleep(10)
+            conn.define = slow
+        self.conns.append(conn)
+        return conn
+
+    @async_test
+    def test_hedged_define(self):
+        policy = wordbook.HedgingPolicy(initial_delay=0.01)
+        pool = wordbook.DictPool(min_size=1, max_size=2, factory=self.factory, hedging=policy)
+        yield from pool.connect()
+
+        ret = yield from pool.define('db', 'mock')
+
+        self.assertEqual(ret, ['mock result'])
+        self.assertEqual((policy.hedged, policy.hedge_wins), (1, 1))
+        # the slow call was cancelled and its connection discarded
+        self.assertEqual(pool.size, 1)
+        self.conns[0].writer.close.assert_called_once_with()
+
+    @async_test
+    def test_not_hedged(self):
+        policy = wordbook.HedgingPolicy(initial_delay=0.01)
+        pool = wordbook.DictPool(min_size=1, max_size=2, factory=self.factory, hedging=policy)
+        yield from pool.connect()
+
+        ret = yield from pool.status()
+
+        self.assertEqual(ret, 'status mock')
+        self.assertEqual(policy.hedged, 0)
@@ -0,0 +1,145 @@
+import asyncio
+import unittest
+from unittest.mock import Mock
+
+from tests.common import async_test
+from tests.test_server import get_backend
+from wordbook.exceptions import DictError
+from wordbook.prefetch import references
+from wordbook.server import DictServer
+import wordbook
+
+
+def definition(word, text):
+    return wordbook.Definition('"{}" gcide "GCIDE"'.format(word), text.encode('utf8'))
+
+
+TEXTS = {
+    'mock': 'Mock \\Mock\\, a. Imitating; see {mockery} and {Mimic}.\n  Syn: {sham}, {false\n  show}.\n',
+    'mockery': 'Mockery \\Mock"er*y\\, n. See {mock} and {derision}.\n',
+    'mimic': 'Mimic, n. One who {mocks}.\n',
+}
+
+
+class TestReferences(unittest.TestCase):
+
+    def test_references(self):
+        ret = references([definition('mock', TEXTS['mock']), definition('mockery', TEXTS['mockery'])])
+        self.assertEqual(ret, ['mockery', 'Mimic', 'sham', 'false show', 'mock', 'derision'])
+        self.assertEqual(references([definition('mock', TEXTS['mock'])], limit=2), ['mockery', 'Mimic'])
+        self.assertEqual(references([definition('x', 'a { b {c} d} {unclosed\n')]), ['c'])
+
+
+class TestPrefetcher(unittest.TestCase):
+
+    def get_wordbook(self, prefetcher):
+        self.calls = []
+
+        @asyncio.coroutine
+        def define(database, word):
+            self.calls.append(word)
+            text = TEXTS.get(word.lower())
+            if word == 'derision':
+                raise DictError(550, 'Invalid database')
+            return [definition(word, text)] if text else []
+
+        conn = Mock()
+        conn.define = define
+        return wordbook.WordBook(conn=conn, database='gcide', cache=wordbook.ResultCache(), prefetcher=prefetcher)
+
+    @async_test
+    def test_prefetch(self):
+        # one word at a time, so the calls are made in the order of the queue
+        prefetcher = wordbook.Prefetcher(max_bytes_per_second=None, batch=1)
+        wb = self.get_wordbook(prefetcher)
+
+        yield from wb.define('mock')
+        yield from prefetcher.join()
+        self.assertEqual(self.calls, ['mock', 'mockery', 'Mimic', 'sham', 'false show'])
+        self.assertEqual(prefetcher.fetched, 4)
+        self.assertGreater(prefetcher.bytes, 0)
+
+        # served from the cache, only its own reference is fetched
+        yield from wb.define('mimic')
+        yield from prefetcher.join()
+        self.assertEqual(self.calls[5:], ['mocks'])
+
+    @async_test
+    def test_depth(self):
+        prefetcher = wordbook.Prefetcher(max_depth=2, max_fanout=1, max_bytes_per_second=None)
+        wb = self.get_wordbook(prefetcher)
+
+        yield from wb.define('mimic')
+        yield from prefetcher.join()
+        # mimic -> mocks (nothing found); mock itself is not a reference
+        self.assertEqual(self.calls, ['mimic', 'mocks'])
+
+        yield from wb.define('mockery')
+        yield from prefetcher.join()
+        # mockery -> mock -> mockery, which is cached already
+        self.assertEqual(self.calls[2:], ['mockery', 'mock'])
+
+    @async_test
+    def test_errors(self):
+        prefetcher = wordbook.Prefetcher(max_bytes_per_second=None)
+        wb = self.get_wordbook(prefetcher)
+
+        yield from wb.define('mockery')
+        yield from prefetcher.join()
+        self.assertEqual(prefetcher.failed, 1)
+        self.assertEqual(prefetcher.fetched, 1)
+
+    @async_test
+    def test_limits(self):
+        prefetcher = wordbook.Prefetcher(max_queue=2, max_bytes_per_second=None)
+        wb = self.get_wordbook(prefetcher)
+        yield from wb.define('mock')
+        self.assertEqual(len(prefetcher), 2)
+        self.assertEqual(prefetcher.dropped, 2)
+        yield from prefetcher.close()
+        self.assertEqual(len(prefetcher), 0)
+
+        # without a cache there is nowhere to prefetch into
+        wb.cache = None
+        yield from wb.define('mock')
+        self.assertEqual(len(prefetcher), 0)
+
+    @async_test
+    def test_busy(self):
+        prefetcher = wordbook.Prefetcher(max_bytes_per_second=None, idle_interval=0.001)
+        wb = self.get_wordbook(prefetcher)
+        wb.conn.idle = Mock(return_value=False)
+
+        yield from wb.define('mimic')
+        yield from asyncio.sleep(0.01)
+        # the connection is busy with commands of the application
+        self.assertEqual(self.calls, ['mimic'])
+        self.assertEqual(len(prefetcher), 1)
+
+        wb.conn.idle.return_value = True
+        yield from prefetcher.join()
+        self.assertEqual(self.calls, ['mimic', 'mocks'])
+
+    @async_test
+    def test_idle(self):
+        server = DictServer(get_backend())
+        yield from server.start()
+        conn = wordbook.DictBase()
+        yield from conn.connect('127.0.0.1', server.port)
+        self.assertTrue(conn.idle())
+        stream = conn.iter_define('db1', 'mock')
+        yield from stream.__anext__()
+        self.assertFalse(conn.idle())
+        yield from stream.aclose()
+        self.assertTrue(conn.idle())
+
+        pool = wordbook.DictPool(min_size=1, max_size=1)
+        yield from pool.connect('127.0.0.1', server.port)
+        self.assertTrue(pool.idle())
+        pooled = yield from pool.acquire()
+        self.assertFalse(pool.idle())
+        pool.release(pooled)
+        self.assertTrue(pool.idle())
+        yield from pool.quit()
+        yield from conn.quit()
+        yield from server.close()
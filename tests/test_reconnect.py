@@ -0,0 +1,142 @@
+import unittest
+import asyncio
+import itertools
+from unittest.mock import Mock
+
+from tests.common import async_test
+from tests.test_server import get_backend
+from wordbook.server import DictServer
+import wordbook
+
+
+class TestReconnectPolicy(unittest.TestCase):
+
+    def test_delay(self):
+        policy = wordbook.ReconnectPolicy(base_delay=0.1, max_delay=1.0, random=lambda: 1.0)
+        self.assertEqual([policy.delay(attempt) for attempt in range(6)], [0.0, 0.1, 0.2, 0.4, 0.8, 1.0])
+
+    def test_jitter(self):
+        policy = wordbook.ReconnectPolicy(base_delay=0.1, random=lambda: 0.5)
+        self.assertEqual(policy.delay(2), 0.1)
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            wordbook.ReconnectPolicy(max_attempts=0)
+
+
+class TestDictBaseReconnect(unittest.TestCase):
+
+    @asyncio.coroutine
+    def start(self, reconnect):
+        server = DictServer(get_backend())
+        yield from server.start()
+        conn = wordbook.DictBase(reconnect=reconnect)
+        yield from conn.connect('127.0.0.1', server.port)
+        yield from conn.client('mock-client')
+        # the next command drops the connection, all later ones are answered
+        server.drop_rate = 0.5
+        server.random = Mock(random=Mock(side_effect=itertools.chain([0.0], itertools.repeat(1.0))))
+        return server, conn
+
+    @async_test
+    def test_replay(self):
+        server, conn = yield from self.start(wordbook.ReconnectPolicy())
+
+        ret = yield from asyncio.gather(conn.define_many('db1', ['mock', 'mockery', 'rock']),
+                                        conn.match('db2', 'exact', 'mock'))
+
+        self.assertEqual([[d.word for d in result] for result in ret[0]], [['mock'], ['mockery'], []])
+        self.assertEqual([m.word for m in ret[1]], ['mock'])
+        self.assertTrue(conn.connected)
+        self.assertEqual(conn.reconnects, 1)
+        self.assertEqual(server.connections, 2)
+        # CLIENT, the three DEFINEs and MATCH were sent again
+        self.assertEqual(server.commands, 1 + 1 + 5)
+
+        yield from conn.quit()
+        yield from server.close()
+
+    @async_test
+    def test_stream_replay(self):
+        server, conn = yield from self.start(wordbook.ReconnectPolicy())
+
+        ret = []
+        stream = conn.iter_match('db1', 'prefix', 'mock')
+        while True:
+            try:
+                match = yield from stream.__anext__()
+            except StopAsyncIteration:
+                break
+            ret.append(match.word)
+
+        self.assertEqual(ret, ['mock', 'mockery'])
+        self.assertEqual(conn.reconnects, 1)
+
+        yield from conn.quit()
+        yield from server.close()
+
+    @async_test
+    def test_no_reconnect(self):
+        server, conn = yield from self.start(None)
+
+        with self.assertRaises(wordbook.exceptions.DictConnectionError):
+            yield from conn.define('db1', 'mock')
+        self.assertFalse(conn.connected)
+
+        yield from server.close()
+
+    @async_test
+    def test_reconnect_failed(self):
+        server, conn = yield from self.start(wordbook.ReconnectPolicy(max_attempts=2, base_delay=0.001))
+        server.server.close()
+        yield from server.server.wait_closed()
+
+        with self.assertRaises(wordbook.exceptions.DictConnectionError):
+            yield from conn.define('db1', 'mock')
+        self.assertFalse(conn.connected)
+
+    @async_test
+    def test_reconnect_after_timeout(self):
+        server, conn = yield from self.start(wordbook.ReconnectPolicy(base_delay=0.001))
+        server.drop_rate = 0.0
+        server.latency = 0.1
+
+        with self.assertRaises(wordbook.exceptions.DictTimeoutError):
+            yield from conn.define('db1', 'mock', timeout=0.05)
+        server.latency = 0.0
+        ret = yield from conn.define('db1', 'mockery')
+        self.assertEqual([d.word for d in ret], ['mockery'])
+        self.assertEqual(conn.reconnects, 1)
+
+        yield from conn.quit()
+        yield from server.close()
+
+    @async_test
+    def test_handshake_dropped(self):
+        server, conn = yield from self.start(wordbook.ReconnectPolicy(base_delay=0.001))
+        # the DEFINE and then the CLIENT sent on the new connection are dropped
+        server.random = Mock(random=Mock(side_effect=itertools.chain([0.0, 0.0], itertools.repeat(1.0))))
+
+        ret = yield from conn.define('db1', 'mock')
+        self.assertEqual([d.word for d in ret], ['mock'])
+        self.assertEqual(conn.reconnects, 1)
+        self.assertEqual(server.connections, 3)
+
+        yield from conn.quit()
+        yield from server.close()
+
+    @async_test
+    def test_random_drops(self):
+        server = DictServer(get_backend(), drop_rate=0.03, seed=1)
+        yield from server.start()
+        conn = wordbook.DictBase(reconnect=wordbook.ReconnectPolicy(max_attempts=20, base_delay=0.001))
+        yield from conn.connect('127.0.0.1', server.port)
+        yield from conn.client('mock-client')
+
+        ret = yield from asyncio.gather(*[conn.define('db1', 'mock') for _ in range(400)])
+        self.assertEqual({len(result) for result in ret}, {1})
+        self.assertGreater(conn.reconnects, 0)
+
+        server.drop_rate = 0.0
+        yield from conn.quit()
+        yield from server.close()
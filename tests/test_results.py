@@ -0,0 +1,40 @@
+import unittest
+
+from wordbook.results import Definition, Match, split_matches
+
+
+class TestDefinition(unittest.TestCase):
+
+    def test_fields(self):
+        definition = Definition('"mock rock" wn "WordNet (r) 3.0 (2006)"', b'mock rock\r\n  n 1: mock  \r\n')
+
+        self.assertEqual(definition.word, 'mock rock')
+        self.assertEqual(definition.database, 'wn')
+        self.assertEqual(definition.description, 'WordNet (r) 3.0 (2006)')
+        self.assertEqual(definition.lines, ['mock rock', '  n 1: mock'])
+        self.assertEqual(definition.text, 'mock rock\n  n 1: mock')
+
+    def test_unquoted_header(self):
+        definition = Definition('mock db1', b'')
+
+        self.assertEqual((definition.word, definition.database, definition.description), ('mock', 'db1', ''))
+        self.assertEqual(definition.lines, [])
+
+
+class TestMatch(unittest.TestCase):
+
+    def test_fields(self):
+        match = Match(b'gcide "mock rock"\r')
+
+        self.assertEqual(match.database, 'gcide')
+        self.assertEqual(match.word, 'mock rock')
+        self.assertEqual(match, Match(b'gcide "mock rock"'))
+
+    def test_split_matches(self):
+        matches = split_matches(b'db1 "abide"\r\ndb2 "abode"\r\n')
+
+        self.assertEqual([(m.database, m.word) for m in matches], [('db1', 'abide'), ('db2', 'abode')])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import unittest
+import asyncio
+
+from tests.common import async_test
+from wordbook.server import DictServer
+import wordbook
+
+
+class TestDictRouter(unittest.TestCase):
+
+    @asyncio.coroutine
+    def start(self):
+        self.servers = [
+            DictServer(wordbook.MemoryDict([
+                wordbook.MemoryDatabase('db2', {'mock': 'mock from db2'}),
+                wordbook.MemoryDatabase('db3', {'rock': 'rock from db3'}),
+            ])),
+            DictServer(wordbook.MemoryDict([
+                wordbook.MemoryDatabase('db1', {'mock': 'mock from db1', 'mockery': 'mockery from db1'}),
+                wordbook.MemoryDatabase('db2', {'mock': 'mock from second db2'}),
+            ])),
+        ]
+        for server in self.servers:
+            yield from server.start()
+        self.router = wordbook.DictRouter([('127.0.0.1', server.port) for server in self.servers])
+        self.wb = wordbook.WordBook(conn=self.router)
+        yield from self.wb.connect()
+
+    @asyncio.coroutine
+    def stop(self):
+        yield from self.router.quit()
+        for server in self.servers:
+            yield from server.close()
+
+    @async_test
+    def test_databases(self):
+        yield from self.start()
+
+        dbs = yield from self.wb.get_databases()
+
+        self.assertEqual([db.get_database()[0] for db in dbs], ['db2', 'db3', 'db1'])
+        self.assertIs(self.router.routes['db1'][0], self.router.conns[1])
+        yield from self.stop()
+
+    @async_test
+    def test_define_routed(self):
+        yield from self.start()
+
+        ret = yield from wordbook.WordBookDatabase('db1', self.wb).define('mock')
+
+        self.assertEqual([d.text for d in ret], ['mock from db1'])
+        self.assertEqual(self.servers[0].commands, 2)
+        with self.assertRaises(wordbook.exceptions.InvalidDatabase):
+            yield from wordbook.WordBookDatabase('db9', self.wb).define('mock')
+        yield from self.stop()
+
+    @async_test
+    def test_define_all(self):
+        yield from self.start()
+
+        ret = yield from self.wb.define('mock')
+        first = yield from wordbook.WordBookDatabase('!', self.wb).define('mock')
+
+        self.assertEqual([(d.database, d.text) for d in ret],
+                         [('db2', 'mock from db2'), ('db1', 'mock from db1')])
+        self.assertEqual([d.text for d in first], ['mock from db2'])
+        yield from self.stop()
+
+    @async_test
+    def test_server_down(self):
+        yield from self.start()
+        self.router.conns[0].abort()
+
+        ret = yield from self.wb.define('mock')
+        many = yield from self.router.match_many('*', 'prefix', ['mock', 'rock'], return_exceptions=True)
+
+        # the databases of the other server are still answered
+        self.assertEqual([(d.database, d.text) for d in ret], [('db1', 'mock from db1')])
+        self.assertEqual([[m.word for m in result] for result in many], [['mock', 'mockery'], []])
+        self.router.conns[1].abort()
+        with self.assertRaises(wordbook.exceptions.DictConnectionError):
+            yield from self.router.match('*', 'exact', 'rock')
+        for server in self.servers:
+            yield from server.close()
+
+    @async_test
+    def test_match_many(self):
+        yield from self.start()
+
+        ret = yield from self.router.match_many('*', 'prefix', ['mock', 'rock'])
+
+        self.assertEqual([[(m.database, m.word) for m in result] for result in ret],
+                         [[('db2', 'mock'), ('db1', 'mock'), ('db1', 'mockery')],
+                          [('db3', 'rock')]])
+        yield from self.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import unittest
+import asyncio
+
+from tests.common import async_test
+from wordbook.server import DictServer, split_command
+import wordbook
+
+
+def get_backend():
+    return wordbook.MemoryDict([
+        wordbook.MemoryDatabase('db1', {'mock': 'mock\n  an imitation', 'mockery': 'mockery\n.dotted line'},
+                                description='Mock db1', info='Mock database 1'),
+        wordbook.MemoryDatabase('db2', {'mock': 'mock\n  to ridicule'}, description='Mock db2'),
+    ])
+
+
+class TestSplitCommand(unittest.TestCase):
+
+    def test_split(self):
+        self.assertEqual(split_command('DEFINE db1 "mock rock"\r\n'), ['DEFINE', 'db1', 'mock rock'])
+        self.assertEqual(split_command("MATCH * . 'x'"), ['MATCH', '*', '.', 'x'])
+
+
+class TestDictServer(unittest.TestCase):
+
+    @asyncio.coroutine
+    def start(self, **kwargs):
+        server = DictServer(get_backend(), **kwargs)
+        yield from server.start()
+        conn = wordbook.DictBase()
+        yield from conn.connect('127.0.0.1', server.port)
+        return server, conn
+
+    @async_test
+    def test_commands(self):
+        server, conn = yield from self.start()
+
+        yield from conn.client('mock-client')
+        dbs = yield from conn.show_db()
+        info = yield from conn.show_info('db1')
+        strats = yield from conn.show_strat()
+        definitions = yield from conn.define('*', 'mock')
+        matches = yield from conn.match('db1', 'prefix', 'mock')
+        no_match = yield from conn.define('db2', 'rock')
+        mime = yield from conn.option_mime()
+
+        self.assertEqual(dbs, ['db1 "Mock db1"', 'db2 "Mock db2"'])
+        self.assertEqual(info, ['Mock database 1'])
+        self.assertEqual(len(strats), 2)
+        self.assertEqual([(d.word, d.database, d.text) for d in definitions],
+                         [('mock', 'db1', 'mock\n  an imitation'), ('mock', 'db2', 'mock\n  to ridicule')])
+        self.assertEqual([m.word for m in matches], ['mock', 'mockery'])
+        self.assertEqual(no_match, [])
+        self.assertTrue(mime.startswith('ok'))
+
+        yield from conn.quit()
+        yield from server.close()
+
+    @async_test
+    def test_dot_stuffing(self):
+        server, conn = yield from self.start()
+
+        ret = yield from conn.define('db1', 'mockery')
+
+        self.assertEqual(ret[0].lines, ['mockery', '.dotted line'])
+        yield from conn.quit()
+        yield from server.close()
+
+    @async_test
+    def test_pipeline(self):
+        server, conn = yield from self.start(latency=0.001)
+
+        ret = yield from conn.define_many('db1', ['mock', 'rock', 'mockery'])
+
+        self.assertEqual([len(r) for r in ret], [1, 0, 1])
+        with self.assertRaises(wordbook.exceptions.InvalidDatabase):
+            yield from conn.define('db9', 'mock')
+        yield from conn.quit()
+        yield from server.close()
+
+    @async_test
+    def test_busy(self):
+        server, conn = yield from self.start(busy_rate=1.0)
+
+        with self.assertRaises(wordbook.exceptions.DictError) as cm:
+            yield from conn.define('db1', 'mock')
+
+        self.assertEqual(cm.exception.code, 420)
+        conn.writer.close()
+        yield from server.close()
+
+    @async_test
+    def test_drop(self):
+        server, conn = yield from self.start(drop_rate=1.0)
+
+        with self.assertRaises(wordbook.exceptions.DictConnectionError):
+            yield from conn.define('db1', 'mock')
+
+        conn.writer.close()
+        yield from server.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
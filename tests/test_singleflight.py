@@ -0,0 +1,72 @@
+import unittest
+import asyncio
+from unittest.mock import Mock
+
+from tests.common import async_test
+import wordbook
+
+
+class TestSingleflight(unittest.TestCase):
+
+    def setUp(self):
+        self.conn = Mock()
+        self.calls = 0
+        self.error = None
+
+        @asyncio.coroutine
+        def define(database, word):
+            self.calls += 1
+            yield from asyncio.sleep(0.01)
+            if self.error is not None:
+                raise self.error
+            return [word]
+        self.conn.define = define
+        self.wb = wordbook.WordBook(conn=self.conn, singleflight=wordbook.Singleflight())
+
+    @async_test
+    def test_coalesce(self):
+        ret = yield from asyncio.gather(*[self.wb.define('mock') for _ in range(5)] + [self.wb.define('rock')])
+
+        self.assertEqual(ret, [['mock']] * 5 + [['rock']])
+        self.assertIsNot(ret[0], ret[1])
+        self.assertEqual(self.calls, 2)
+        self.assertEqual(self.wb.singleflight.stats(), {'calls': 6, 'deduplicated': 4, 'inflight': 0})
+
+        yield from self.wb.define('mock')
+        self.assertEqual(self.calls, 3)
+
+    @async_test
+    def test_shared_between_views(self):
+        ret = yield from asyncio.gather(self.wb.define('mock'),
+                                        wordbook.WordBookDatabase('*', self.wb).define('mock'),
+                                        wordbook.WordBookDatabase('db', self.wb).define('mock'))
+        self.assertEqual(ret, [['mock']] * 3)
+        self.assertEqual(self.calls, 2)
+
+    @async_test
+    def test_exception(self):
+        self.error = wordbook.exceptions.InvalidDatabase(550, 'invalid database')
+        ret = yield from asyncio.gather(self.wb.define('mock'), self.wb.define('mock'), return_exceptions=True)
+        self.assertIs(ret[0], self.error)
+        self.assertIs(ret[1], self.error)
+        self.assertEqual(self.calls, 1)
+
+    @async_test
+    def test_cancelled_waiter(self):
+        first = asyncio.ensure_future(self.wb.define('mock'))
+        second = asyncio.ensure_future(self.wb.define('mock'))
+        yield from asyncio.sleep(0)
+        first.cancel()
+
+        ret = yield from second
+        self.assertEqual(ret, ['mock'])
+        self.assertTrue(first.cancelled())
+        self.assertEqual(self.calls, 1)
+
+    @async_test
+    def test_with_cache(self):
+        self.wb.cache = wordbook.ResultCache()
+        yield from asyncio.gather(self.wb.define('mock'), self.wb.define('mock'))
+        yield from self.wb.define('mock')
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(self.wb.cache.hits, 1)
@@ -0,0 +1,141 @@
+import unittest
+from unittest.mock import Mock
+
+from tests.common import async_test, get_mock_coro
+from tests.test_server import get_backend
+from wordbook.results import Match
+from wordbook.server import DictServer
+from wordbook.strategies import HeadwordIndex, basic_to_extended, literal_prefix, soundex
+import wordbook
+
+
+HEADWORDS = ['00-database-short', 'abide', 'abode', 'Mock', 'mock', 'mock-up', 'mockery', 'rock', 'hard rock',
+             'Robert', 'Rupert', 'smock']
+
+
+class TestHelpers(unittest.TestCase):
+
+    def test_soundex(self):
+        self.assertEqual(soundex('Robert'), 'R163')
+        self.assertEqual(soundex('Rupert'), 'R163')
+        self.assertEqual(soundex('Ashcraft'), 'A261')
+        self.assertEqual(soundex('Pfister'), 'P236')
+        self.assertEqual(soundex('123'), '')
+
+    def test_basic_to_extended(self):
+        self.assertEqual(basic_to_extended(r'^mo\(ck\)\{1,2\}$'), '^mo(ck){1,2}$')
+        self.assertEqual(basic_to_extended('a+b?(c)'), r'a\+b\?\(c\)')
+        self.assertEqual(basic_to_extended(r'[\]a'), r'[\\]a')
+
+    def test_literal_prefix(self):
+        self.assertEqual(literal_prefix('^Mock.*'), 'mock')
+        self.assertEqual(literal_prefix('^mocks?$'), 'mock')
+        self.assertEqual(literal_prefix('mock'), '')
+        self.assertEqual(literal_prefix('^mock|rock'), '')
+
+
+class TestHeadwordIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.index = HeadwordIndex('db', HEADWORDS)
+
+    def test_strategies(self):
+        match = self.index.match
+        self.assertEqual(len(self.index), 11)
+        self.assertEqual(match('exact', 'MOCK'), ['Mock', 'mock'])
+        self.assertEqual(match('prefix', 'mock'), ['Mock', 'mock', 'mockery', 'mock-up'])
+        self.assertEqual(match('prefix', 'ab'), ['abide', 'abode'])
+        self.assertEqual(match('suffix', 'ock'), ['hard rock', 'Mock', 'mock', 'rock', 'smock'])
+        self.assertEqual(match('substring', 'ocke'), ['mockery'])
+        self.assertEqual(match('substring', 'd r'), ['hard rock'])
+        self.assertEqual(match('re', '^mock.+'), ['mockery', 'mock-up'])
+        self.assertEqual(match('re', 'b.de$'), ['abide', 'abode'])
+        self.assertEqual(match('regexp', r'^ab\(i\|o\)de$'), ['abide', 'abode'])
+        self.assertEqual(match('soundex', 'Rabort'), ['Robert', 'Rupert'])
+        self.assertEqual(match('word', 'Rock'), ['hard rock', 'rock'])
+        self.assertEqual(match('exact', 'xyz'), [])
+
+    def test_unknown(self):
+        self.assertIsNone(self.index.match('lev', 'mock'))
+        self.assertIsNone(self.index.match('re', '(mock'))
+
+
+class TestMatchEngine(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = wordbook.MatchEngine()
+        self.engine.add('db1', ['mock', 'rock'])
+        self.engine.add('db2', ['mockery'])
+
+    def test_match(self):
+        ret = self.engine.match('db1', 'suffix', 'ock')
+        self.assertEqual([(match.database, match.word) for match in ret], [('db1', 'mock'), ('db1', 'rock')])
+        self.assertIsNone(self.engine.match('db3', 'exact', 'mock'))
+        self.assertIsNone(self.engine.match('db1', 'lev', 'mock'))
+        self.assertIsNone(self.engine.match('db1', '.', 'mock'))
+        # the databases of the server are unknown before update()
+        self.assertIsNone(self.engine.match('*', 'prefix', 'mock'))
+
+    def test_all_databases(self):
+        self.engine.server_databases = ['db1', 'db2']
+        ret = self.engine.match('*', 'prefix', 'mock')
+        self.assertEqual([(match.database, match.word) for match in ret], [('db1', 'mock'), ('db2', 'mockery')])
+        ret = self.engine.match('!', 'prefix', 'mock')
+        self.assertEqual([(match.database, match.word) for match in ret], [('db1', 'mock')])
+        self.engine.default_strategy = 'exact'
+        self.assertEqual(len(self.engine.match('*', '.', 'mock')), 1)
+
+    @async_test
+    def test_wordbook(self):
+        conn = wordbook.DictBase()
+        conn.match = get_mock_coro(['remote'])
+        wb = wordbook.WordBook(conn=conn, database='db1', strategy='substring', matcher=self.engine)
+
+        ret = yield from wb.match('oc')
+        self.assertEqual([match.word for match in ret], ['mock', 'rock'])
+        self.assertFalse(conn.match.called)
+
+        ret = yield from wordbook.WordBookDatabase('db3', wb).match('oc')
+        self.assertEqual(ret, ['remote'])
+        conn.match.assert_called_with('db3', 'substring', 'oc')
+
+    @async_test
+    def test_update(self):
+        server = DictServer(get_backend())
+        yield from server.start()
+        wb = wordbook.WordBook('127.0.0.1', server.port)
+        yield from wb.connect()
+        engine = wordbook.MatchEngine()
+
+        added = yield from engine.update(wb)
+        self.assertEqual(added, ['db1', 'db2'])
+        ret = engine.match('*', 'prefix', 'mocke')
+        self.assertEqual([(match.database, match.word) for match in ret], [('db1', 'mockery')])
+        # without the "re" strategy headwords outside the alphabet are unknown
+        self.assertIsNone(engine.match('*', 'suffix', 'ery'))
+        self.assertIsNone(engine.match('db1', 'exact', '\u00e9clair'))
+        added = yield from engine.update(wb)
+        self.assertEqual(added, [])
+
+        yield from wb.conn.quit()
+        yield from server.close()
+
+
+class TestMatchEngineUpdate(unittest.TestCase):
+
+    @async_test
+    def test_rest(self):
+        conn = Mock()
+        conn.show_db = get_mock_coro(['db1 "Mock db1"'])
+        conn.show_strat = get_mock_coro(['prefix "Match prefixes"', 're "POSIX 1003.2 (modern) regular expressions"'])
+        conn.match_many = get_mock_coro([[Match(b'db1 "mock"')], []])
+        conn.match = get_mock_coro([Match('db1 "\u00e9clair"'.encode('utf8'))])
+        engine = wordbook.MatchEngine()
+
+        added = yield from engine.update(wordbook.WordBook(conn=conn), alphabet='ma')
+
+        self.assertEqual(added, ['db1'])
+        conn.match_many.assert_called_once_with('db1', 'prefix', ['m', 'a'])
+        conn.match.assert_called_once_with('db1', 're', '^[^a-z0-9]')
+        ret = engine.match('*', 'suffix', 'air')
+        self.assertEqual([match.word for match in ret], ['\u00e9clair'])
@@ -0,0 +1,75 @@
+import os
+import tempfile
+import unittest
+
+from tests.common import async_test
+from tests.test_server import get_backend
+from wordbook.server import DictServer
+from wordbook.suggest import deletes, edit_distance
+import wordbook
+
+
+class TestEditDistance(unittest.TestCase):
+
+    def test_distance(self):
+        self.assertEqual(edit_distance('mock', 'mock', 2), 0)
+        self.assertEqual(edit_distance('mock', 'mokc', 2), 1)
+        self.assertEqual(edit_distance('mock', 'smock', 2), 1)
+        self.assertEqual(edit_distance('mock', 'rocky', 2), 2)
+        self.assertEqual(edit_distance('mock', 'mockery', 2), 3)
+
+    def test_deletes(self):
+        self.assertEqual(deletes('abc', 1), {'abc', 'bc', 'ac', 'ab'})
+
+
+class TestSuggestionIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.index = wordbook.SuggestionIndex()
+        for word in ('mock', 'mocker', 'rock', 'smock', 'Mockery', 'apple'):
+            self.index.add(word, 'db1')
+        self.index.add('rock', 'db2')
+
+    def test_suggest(self):
+        self.assertEqual(self.index.suggest('mokc'), [('mock', 1), ('rock', 2), ('smock', 2)])
+        self.assertEqual(self.index.suggest('rokc', limit=1), [('rock', 1)])
+        self.assertEqual(self.index.suggest('mockerey'), [('Mockery', 1), ('mocker', 2)])
+        self.assertEqual(self.index.suggest('mokc', max_distance=1), [('mock', 1)])
+        self.assertEqual(self.index.suggest('xyz'), [])
+
+    def test_ranking(self):
+        # same distance: the headword found in more databases first
+        self.assertEqual(self.index.suggest('xock')[:2], [('rock', 1), ('mock', 1)])
+
+    def test_remove_database(self):
+        self.index.remove_database('db1')
+        self.assertEqual(len(self.index), 1)
+        self.assertEqual(self.index.suggest('mokc'), [('rock', 2)])
+        self.assertEqual(self.index.databases, {'db2'})
+
+    def test_load(self):
+        with tempfile.TemporaryDirectory() as path:
+            name = os.path.join(path, 'db.index')
+            with open(name, 'w') as f:
+                f.write('00-database-short\tA\tB\nmockingbird\tB\tC\n')
+            index = wordbook.SuggestionIndex()
+            index.load(name, 'db')
+        self.assertEqual(index.suggest('mockinbird'), [('mockingbird', 1)])
+        self.assertNotIn('00-database-short', index)
+
+    @async_test
+    def test_update(self):
+        server = DictServer(get_backend())
+        yield from server.start()
+        wb = wordbook.WordBook('127.0.0.1', server.port)
+        yield from wb.connect()
+        index = wordbook.SuggestionIndex()
+
+        added = yield from index.update(wb)
+        self.assertEqual(added, ['db1', 'db2'])
+        self.assertEqual(index.suggest('mockrey'), [('mockery', 1)])
+        added = yield from index.update(wb)
+        self.assertEqual(added, [])
+
+        yield from wb.conn.quit()
+        yield from server.close()
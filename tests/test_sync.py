@@ -0,0 +1,49 @@
+import unittest
+import concurrent.futures
+
+from tests.test_server import get_backend
+from wordbook.server import DictServer
+import wordbook
+
+
+class TestSyncWordBook(unittest.TestCase):
+
+    def start(self, **kwargs):
+        server = DictServer(get_backend(), **kwargs)
+        wb = wordbook.SyncWordBook(conn_factory=wordbook.DictBase)
+        # the server runs in the loop of the facade as well
+        wb.call(server.start())
+        wb.wordbook.port = server.port
+        wb.connect()
+        return server, wb
+
+    def stop(self, server, wb):
+        wb.call(server.close())
+        wb.close()
+
+    def test_threads(self):
+        server, wb = self.start()
+
+        with concurrent.futures.ThreadPoolExecutor(8) as executor:
+            ret = list(executor.map(lambda word: wb.define(word, database='db1'), ['mock', 'mockery', 'rock'] * 20))
+
+        self.assertEqual([[d.word for d in definitions] for definitions in ret[:3]], [['mock'], ['mockery'], []])
+        self.assertEqual(len(ret), 60)
+        self.assertEqual(server.connections, 1)
+        self.stop(server, wb)
+
+    def test_commands(self):
+        server, wb = self.start()
+
+        self.assertEqual(wb.get_databases(), [['db1', '"Mock db1"'], ['db2', '"Mock db2"']])
+        self.assertEqual(wb.get_info('db1'), ['Mock database 1'])
+        self.assertEqual([m.word for m in wb.match('mock', database='db1', strategy='prefix')], ['mock', 'mockery'])
+        self.stop(server, wb)
+
+    def test_timeout(self):
+        server, wb = self.start(latency=0.5)
+
+        with self.assertRaises(wordbook.exceptions.DictTimeoutError):
+            wb.define('mock', timeout=0.05)
+        self.stop(server, wb)
+        self.assertTrue(wb.loop.is_closed())
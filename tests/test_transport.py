@@ -0,0 +1,125 @@
+import asyncio
+import os
+import socket
+import tempfile
+import unittest
+
+from tests.common import async_test
+from tests.test_server import get_backend
+from wordbook.server import DictServer
+from wordbook.transport import ChunkStream
+import wordbook
+
+
+class TestChunkStream(unittest.TestCase):
+
+    @async_test
+    def test_read(self):
+        stream = ChunkStream()
+        stream.feed_data(b'abc')
+        stream.feed_data(b'def')
+        self.assertEqual((yield from stream.read(4)), b'abc')
+        self.assertEqual((yield from stream.read(2)), b'de')
+        stream.feed_data(b'gh')
+        self.assertEqual((yield from stream.read(10)), b'fgh')
+
+        reading = asyncio.ensure_future(stream.read(10))
+        yield from asyncio.sleep(0)
+        self.assertFalse(reading.done())
+        stream.feed_eof()
+        self.assertEqual((yield from reading), b'')
+
+    @async_test
+    def test_exception(self):
+        stream = ChunkStream()
+        stream.set_exception(ConnectionResetError())
+        with self.assertRaises(ConnectionResetError):
+            yield from stream.read(10)
+
+
+class TestTransports(unittest.TestCase):
+
+    @asyncio.coroutine
+    def check(self, conn):
+        # a definition line far above the StreamReader limit
+        ret = yield from conn.define('db1', 'long')
+        self.assertEqual(len(ret[0].raw), 200002)
+        ret = yield from conn.define_many('db1', ['mock', 'mockery'])
+        self.assertEqual([definitions[0].word for definitions in ret], ['mock', 'mockery'])
+        yield from conn.quit()
+
+    def get_server(self):
+        backend = get_backend()
+        backend.databases[0]._entries['long'] = [('long', b'x' * 200000 + b'\r\n')]
+        return DictServer(backend)
+
+    @async_test
+    def test_tcp(self):
+        server = self.get_server()
+        yield from server.start()
+        transport = wordbook.TcpTransport(keepalive=True, recv_buffer=2 ** 18, limit=2 ** 12)
+        conn = wordbook.DictBase(transport=transport)
+        yield from conn.connect('127.0.0.1', server.port)
+        sock = conn.writer.get_extra_info('socket')
+        self.assertTrue(sock.getsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY))
+        self.assertTrue(sock.getsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE))
+        yield from self.check(conn)
+        yield from server.close()
+
+    @async_test
+    def test_protocol(self):
+        server = self.get_server()
+        yield from server.start()
+        conn = wordbook.DictBase(transport=wordbook.ProtocolTransport(limit=2 ** 12))
+        yield from conn.connect('127.0.0.1', server.port)
+        yield from self.check(conn)
+        yield from server.close()
+
+    @async_test
+    def test_unix(self):
+        server = self.get_server()
+        yield from server.backend.connect()
+        with tempfile.TemporaryDirectory() as path:
+            path = os.path.join(path, 'dict.sock')
+            unix_server = yield from asyncio.start_unix_server(server.handle, path)
+            for transport in (wordbook.UnixTransport(path), wordbook.ProtocolTransport(path=path)):
+                conn = wordbook.DictBase(transport=transport)
+                yield from conn.connect()
+                yield from self.check(conn)
+            unix_server.close()
+            yield from unix_server.wait_closed()
+
+    def test_endpoint(self):
+        self.assertEqual(wordbook.DictBase().endpoint, '127.0.0.1:2628')
+        unix = wordbook.DictBase(transport=wordbook.UnixTransport('/run/dict.sock'))
+        self.assertEqual(unix.endpoint, 'unix:/run/dict.sock')
+        pool = wordbook.DictPool(factory=lambda: wordbook.DictBase(transport=wordbook.ProtocolTransport()))
+        pool.host = 'dict.org'
+        self.assertEqual(pool.endpoint, 'dict.org:2628')
+        self.assertEqual(wordbook.LocalDict(['/usr/share/dictd/gcide']).endpoint, 'local:/usr/share/dictd/gcide')
+        self.assertNotEqual(get_backend().endpoint, get_backend().endpoint)
+
+    @async_test
+    def test_memory(self):
+        server = self.get_server()
+        yield from server.backend.connect()
+        transport = wordbook.MemoryTransport(server.handle)
+        conn = wordbook.DictBase(transport=transport)
+        yield from conn.connect()
+        self.assertEqual(conn.banner, 'wordbook-server')
+        yield from self.check(conn)
+        # the server side ends after QUIT
+        self.assertEqual(transport.tasks, set())
+        self.assertEqual(server.connections, 1)
+
+    @async_test
+    def test_memory_reconnect(self):
+        server = self.get_server()
+        yield from server.backend.connect()
+        server.drop_rate = 1.0
+        conn = wordbook.DictBase(transport=wordbook.MemoryTransport(server.handle),
+                                 reconnect=wordbook.ReconnectPolicy(max_attempts=2, base_delay=0))
+        yield from conn.connect()
+        with self.assertRaises(wordbook.exceptions.DictConnectionError):
+            yield from conn.define('db1', 'mock')
+        self.assertEqual(server.connections, 3)
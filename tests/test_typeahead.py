@@ -0,0 +1,80 @@
+import unittest
+from unittest.mock import Mock
+
+from tests.common import async_test, get_mock_coro
+import wordbook
+
+
+def get_matches(*raw):
+    return [wordbook.Match(line) for line in raw]
+
+
+class TestTypeaheadSession(unittest.TestCase):
+
+    def setUp(self):
+        self.conn = Mock()
+        self.conn.match = get_mock_coro(get_matches(b'db2 "apple"', b'db1 "Applet"', b'db1 "app"',
+                                                    b'db1 "apply"'))
+        self.wb = wordbook.WordBook(conn=self.conn)
+
+    @async_test
+    def test_refine(self):
+        session = wordbook.TypeaheadSession(self.wb)
+        ret = yield from session.complete('app')
+        self.assertEqual(len(ret), 4)
+
+        ret = yield from session.complete('Appl')
+        self.assertEqual([match.word for match in ret], ['apple', 'Applet', 'apply'])
+        ret = yield from session.complete('apple')
+        self.assertEqual([match.word for match in ret], ['apple', 'Applet'])
+        ret = yield from session.complete('applx')
+        self.assertEqual(ret, [])
+
+        self.conn.match.assert_called_once_with('*', 'prefix', 'app')
+        self.assertEqual((session.server_queries, session.local_queries), (1, 3))
+
+    @async_test
+    def test_punctuation(self):
+        # the prefix strategy compares dictd sort keys, which ignore punctuation
+        self.conn.match = get_mock_coro(get_matches(b'db "abide"', b'db "abode"', b'db "A-bomb"', b'db "axe"'))
+        session = wordbook.TypeaheadSession(self.wb)
+        yield from session.complete('a')
+        ret = yield from session.complete('ab')
+        self.assertEqual([match.word for match in ret], ['abide', 'abode', 'A-bomb'])
+        ret = yield from session.complete('a-bo')
+        self.assertEqual([match.word for match in ret], ['abode', 'A-bomb'])
+        self.assertEqual(session.server_queries, 1)
+
+    @async_test
+    def test_shorter_prefix(self):
+        session = wordbook.TypeaheadSession(self.wb)
+        yield from session.complete('appl')
+        yield from session.complete('app')
+        self.assertEqual(session.server_queries, 2)
+
+    @async_test
+    def test_scope_changed(self):
+        session = wordbook.TypeaheadSession(self.wb)
+        yield from session.complete('app')
+        self.wb.database = 'db1'
+        yield from session.complete('appl')
+        session.strategy = 'exact'
+        yield from session.complete('apple')
+        yield from session.complete('applet')
+
+        self.assertEqual(session.server_queries, 4)
+        self.conn.match.assert_called_with('db1', 'exact', 'applet')
+
+    @async_test
+    def test_truncated(self):
+        session = wordbook.TypeaheadSession(self.wb, max_results=4)
+        yield from session.complete('app')
+        yield from session.complete('appl')
+        self.assertEqual(session.server_queries, 2)
+
+    @async_test
+    def test_empty(self):
+        session = wordbook.TypeaheadSession(self.wb)
+        ret = yield from session.complete('  ')
+        self.assertEqual(ret, [])
+        self.conn.match.assert_not_called()
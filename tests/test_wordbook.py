@@ -36,6 +36,17 @@ class TestWordBook(unittest.TestCase):
         self.mock_dictbase.return_value.connect.assert_called_once_with('1.2.3.4', 5)
         self.mock_dictbase.return_value.client.assert_called_once_with('wordbook')
 
+    @async_test
+    def test_connect_conn(self):
+        conn = Mock()
+        conn.connect = get_mock_coro(None)
+        conn.client = get_mock_coro(None)
+        wb = wordbook.WordBook('1.2.3.4', 5, conn=conn)
+        yield from wb.connect()
+        self.mock_dictbase.assert_not_called()
+        conn.connect.assert_called_once_with('1.2.3.4', 5)
+        conn.client.assert_called_once_with('wordbook')
+
     @async_test
     def test_get_databases(self):
         wb = wordbook.WordBook()
@@ -109,6 +120,83 @@ class TestWordBookFilter(unittest.TestCase):
         self.mock_dictbase.return_value.match.assert_called_once_with('mock-db', 'mock-st', 'mock query')
 
 
+class Words:
+
+    # an async iterable which records how far it was consumed
+
+    def __init__(self, words):
+        self.words = iter(words)
+        self.taken = 0
+
+    def __aiter__(self):
+        return self
+
+    @asyncio.coroutine
+    def __anext__(self):
+        try:
+            word = next(self.words)
+        except StopIteration:
+            raise StopAsyncIteration
+        self.taken += 1
+        return word
+
+
+class TestWordBookStream(unittest.TestCase):
+
+    def setUp(self):
+        self.conn = Mock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+        @asyncio.coroutine
+        def define(*args):
+            word = args[-1]
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            yield from asyncio.sleep(0.001 * len(word))
+            self.in_flight -= 1
+            if word == 'bad':
+                raise wordbook.exceptions.InvalidDatabase(550, 'invalid database')
+            return [word.upper()]
+        self.conn.define = define
+        self.conn.match = define
+
+    @asyncio.coroutine
+    def collect(self, stream):
+        ret = []
+        while True:
+            try:
+                ret.append((yield from stream.__anext__()))
+            except StopAsyncIteration:
+                return ret
+
+    @async_test
+    def test_define_stream(self):
+        wb = wordbook.WordBook(conn=self.conn)
+        ret = yield from self.collect(wb.define_stream(['mockery', 'mock', 'bad', 'mocked'], concurrency=2))
+
+        self.assertEqual(sorted(word for word, _ in ret), ['bad', 'mock', 'mocked', 'mockery'])
+        self.assertEqual(ret[0], ('mock', ['MOCK']))
+        self.assertIsInstance(dict(ret)['bad'], wordbook.exceptions.InvalidDatabase)
+        self.assertEqual(self.max_in_flight, 2)
+
+    @async_test
+    def test_backpressure(self):
+        wb = wordbook.WordBook(conn=self.conn)
+        words = Words(['mock{}'.format(num) for num in range(100)])
+        stream = wb.match_stream(words, concurrency=3)
+
+        yield from stream.__anext__()
+        self.assertEqual(words.taken, 3)
+        yield from stream.__anext__()
+        self.assertEqual(words.taken, 4)
+        yield from stream.aclose()
+        with self.assertRaises(StopAsyncIteration):
+            yield from stream.__anext__()
+        self.assertEqual(words.taken, 4)
+        self.assertEqual(self.in_flight, 0)
+
+
 if __name__ == '__main__':
     import logging
     logging.basicConfig(level=logging.DEBUG)
@@ -1,2 +1,17 @@
+from wordbook.cache import DiskCache, MetadataCache, ResultCache
 from wordbook.dictbase import DictBase
+from wordbook.hedging import HedgingPolicy
+from wordbook.local import LocalDict, MemoryDict, MemoryDatabase
+from wordbook.metrics import Collector, MetricsCollector
+from wordbook.pool import DictPool
+from wordbook.prefetch import Prefetcher
+from wordbook.reconnect import ReconnectPolicy
+from wordbook.router import DictRouter
+from wordbook.singleflight import Singleflight
+from wordbook.strategies import HeadwordIndex, MatchEngine
+from wordbook.suggest import SuggestionIndex
+from wordbook.transport import MemoryTransport, ProtocolTransport, TcpTransport, Transport, UnixTransport
+from wordbook.results import Definition, Match
 from wordbook.wordbook import WordBook, WordBookDatabase, WordBookStrategy
+from wordbook.typeahead import TypeaheadSession
+from wordbook.sync import SyncWordBook
@@ -0,0 +1,355 @@
+import collections
+import json
+import logging
+import os
+import sqlite3
+import time
+import zlib
+
+from wordbook.results import Definition, Match
+
+
+# strategies whose queries are words rather than patterns
+FOLDED_STRATEGIES = frozenset(('exact', 'prefix', 'suffix', 'substring', 'soundex', 'word'))
+
+
+class ResultCache:
+
+    def __init__(self, max_size=10000, ttl=3600.0, negative_ttl=60.0, clock=time.monotonic):
+        if max_size < 1:
+            raise ValueError('Invalid cache size: {}'.format(max_size))
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._entries = collections.OrderedDict()
+
+    @staticmethod
+    def make_key(database, strategy, word):
+        # case and spacing do not matter to DEFINE (strategy None) and the
+        # literal strategies; patterns and unknown strategies are kept as given
+        if strategy is None or strategy in FOLDED_STRATEGIES:
+            word = ' '.join(word.split()).lower()
+        return (database, strategy, word)
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires, value = entry
+        if expires <= self.clock():
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return list(value)
+
+    def set(self, key, value):
+        # empty results are NO_MATCH replies, kept for a shorter time
+        ttl = self.ttl if value else self.negative_ttl
+        if ttl <= 0:
+            return
+        self._entries[key] = (self.clock() + ttl, list(value))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        return {
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+        }
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        entry = self._entries.get(key)
+        return entry is not None and entry[0] > self.clock()
+
+
+class MetadataCache:
+
+    # Keeps SHOW DB, SHOW STRAT and SHOW INFO replies per server endpoint
+    # (the endpoint of the connection, e.g. "host:port"), optionally in a JSON file shared by later processes, so
+    # times are wall clock times. An endpoint is forgotten when its banner
+    # changes; a changed database list drops everything else known about it.
+
+    def __init__(self, ttl=86400.0, path=None, clock=time.time):
+        self.ttl = ttl
+        self.path = path
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._endpoints = {}
+        if path is not None:
+            self.load()
+
+    @staticmethod
+    def make_key(host, port):
+        return '{}:{}'.format(host, port)
+
+    def check_banner(self, endpoint, banner, capabilities):
+        entry = self._endpoints.get(endpoint)
+        if entry is not None and entry['banner'] == [banner, capabilities]:
+            return
+        if entry is not None:
+            logging.debug('Metadata cache: banner of %s changed', endpoint)
+        self._endpoints[endpoint] = {'banner': [banner, capabilities], 'items': {}}
+        self.save()
+
+    def get_banner(self, endpoint):
+        entry = self._endpoints.get(endpoint)
+        return None if entry is None else tuple(entry['banner'])
+
+    def get(self, endpoint, name):
+        entry = self._endpoints.get(endpoint)
+        item = entry['items'].get(name) if entry is not None else None
+        if item is None or item[0] + self.ttl <= self.clock():
+            self.misses += 1
+            return None
+        self.hits += 1
+        return list(item[1])
+
+    def set(self, endpoint, name, value):
+        entry = self._endpoints.setdefault(endpoint, {'banner': [None, None], 'items': {}})
+        items = entry['items']
+        if name == 'databases' and 'databases' in items and items['databases'][1] != value:
+            logging.debug('Metadata cache: databases of %s changed', endpoint)
+            items.clear()
+        items[name] = [self.clock(), list(value)]
+        self.save()
+
+    def invalidate(self, endpoint=None):
+        if endpoint is None:
+            self._endpoints.clear()
+        else:
+            self._endpoints.pop(endpoint, None)
+        self.save()
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                self._endpoints = json.load(f)
+        except (OSError, ValueError) as exc:
+            logging.debug('Metadata cache: cannot load %s: %s', self.path, exc)
+            self._endpoints = {}
+
+    def save(self):
+        if self.path is None:
+            return
+        # written aside and renamed, so readers never see a partial file
+        tmp = '{}.{}.tmp'.format(self.path, os.getpid())
+        with open(tmp, 'w') as f:
+            json.dump(self._endpoints, f)
+        os.replace(tmp, self.path)
+
+
+class DiskCache:
+
+    # The ResultCache interface on top of an SQLite file, so the entries
+    # survive restarts and are shared by all processes using the same path.
+    # Values are stored zlib-compressed; once they take more than max_bytes,
+    # the least recently used entries are deleted. Expiry times are wall
+    # clock times, as they are compared by different processes.
+    # The calls block: WordBook makes them on the event loop, so a slow disk
+    # stalls every connection. While another process writes, a call waits at
+    # most timeout seconds for the lock, then get() counts a miss and set()
+    # stores nothing. Access times of hits are written in batches of
+    # used_batch, and before every set().
+
+    def __init__(self, path, max_bytes=64 * 1024 * 1024, ttl=3600.0, negative_ttl=60.0, level=6,
+                 clock=time.time, timeout=0.05, used_batch=100):
+        if max_bytes < 1:
+            raise ValueError('Invalid cache size: {}'.format(max_bytes))
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.level = level
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.locked = 0
+        self.used_batch = used_batch
+        # key -> access time not written yet
+        self._used = {}
+        # autocommit: every statement is a transaction of its own
+        self._db = sqlite3.connect(path, timeout=timeout, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        # the rows INSERT OR REPLACE deletes fire the delete trigger too
+        self._db.execute('PRAGMA recursive_triggers=ON')
+        self._db.execute('BEGIN IMMEDIATE')
+        try:
+            self._db.execute('CREATE TABLE IF NOT EXISTS entries ('
+                             'key TEXT PRIMARY KEY, value BLOB, size INTEGER, expires REAL, used REAL)')
+            self._db.execute('CREATE INDEX IF NOT EXISTS entries_used ON entries (used)')
+            # the total size of the entries, kept up to date by the triggers,
+            # so set() does not sum the whole table
+            self._db.execute('CREATE TABLE IF NOT EXISTS total (id INTEGER PRIMARY KEY, size INTEGER)')
+            self._db.execute('INSERT OR IGNORE INTO total (id, size) SELECT 0, COALESCE(SUM(size), 0) FROM entries')
+            self._db.execute('CREATE TRIGGER IF NOT EXISTS entries_insert AFTER INSERT ON entries BEGIN '
+                             'UPDATE total SET size = size + NEW.size WHERE id = 0; END')
+            self._db.execute('CREATE TRIGGER IF NOT EXISTS entries_delete AFTER DELETE ON entries BEGIN '
+                             'UPDATE total SET size = size - OLD.size WHERE id = 0; END')
+        except BaseException:
+            self._db.execute('ROLLBACK')
+            raise
+        self._db.execute('COMMIT')
+
+    make_key = staticmethod(ResultCache.make_key)
+
+    @staticmethod
+    def encode_key(key):
+        return json.dumps(key)
+
+    def encode(self, value):
+        items = []
+        for item in value:
+            if type(item) is Definition:
+                items.append(['d', item.header, item.raw.decode('latin1')])
+            else:
+                items.append(['m', item.raw.decode('latin1')])
+        return zlib.compress(json.dumps(items).encode('utf8'), self.level)
+
+    @staticmethod
+    def decode(data):
+        ret = []
+        for item in json.loads(zlib.decompress(data).decode('utf8')):
+            if item[0] == 'd':
+                ret.append(Definition(item[1], item[2].encode('latin1')))
+            else:
+                ret.append(Match(item[1].encode('latin1')))
+        return ret
+
+    def _locked(self, exc):
+        # whether the error is a lock held by another connection for longer
+        # than the timeout; anything else is raised
+        if 'locked' not in str(exc):
+            raise exc
+        logging.debug('Disk cache: %s is locked', self.path)
+        self.locked += 1
+
+    def get(self, key):
+        key = self.encode_key(key)
+        try:
+            row = self._db.execute('SELECT value, expires FROM entries WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            now = self.clock()
+            if row[1] <= now:
+                self._db.execute('DELETE FROM entries WHERE key = ? AND expires <= ?', (key, now))
+                self.expirations += 1
+                self.misses += 1
+                return None
+        except sqlite3.OperationalError as exc:
+            self._locked(exc)
+            self.misses += 1
+            return None
+        self._used[key] = now
+        if len(self._used) >= self.used_batch:
+            try:
+                self._flush_used()
+            except sqlite3.OperationalError as exc:
+                self._locked(exc)
+        self.hits += 1
+        return self.decode(row[0])
+
+    def _flush_used(self):
+        # writes the pending access times in a single transaction; they are
+        # dropped if it fails, as they only order the eviction
+        used, self._used = self._used, {}
+        if not used:
+            return
+        self._db.execute('BEGIN')
+        try:
+            self._db.executemany('UPDATE entries SET used = ? WHERE key = ?',
+                                 [(now, key) for key, now in used.items()])
+        except BaseException:
+            self._db.execute('ROLLBACK')
+            raise
+        self._db.execute('COMMIT')
+
+    def set(self, key, value):
+        # empty results are NO_MATCH replies, kept for a shorter time
+        ttl = self.ttl if value else self.negative_ttl
+        if ttl <= 0:
+            return
+        data = self.encode(value)
+        now = self.clock()
+        try:
+            self._flush_used()
+            self._db.execute('INSERT OR REPLACE INTO entries (key, value, size, expires, used) VALUES (?, ?, ?, ?, ?)',
+                             (self.encode_key(key), data, len(data), now + ttl, now))
+            self._evict()
+        except sqlite3.OperationalError as exc:
+            self._locked(exc)
+
+    def _evict(self):
+        excess = self.size_bytes() - self.max_bytes
+        if excess <= 0:
+            return
+        keys = []
+        for key, size in self._db.execute('SELECT key, size FROM entries ORDER BY used'):
+            keys.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        self._db.executemany('DELETE FROM entries WHERE key = ?', keys)
+        self.evictions += len(keys)
+
+    def size_bytes(self):
+        return self._db.execute('SELECT size FROM total WHERE id = 0').fetchone()[0]
+
+    def invalidate(self, key):
+        self._db.execute('DELETE FROM entries WHERE key = ?', (self.encode_key(key),))
+
+    def clear(self):
+        self._db.execute('DELETE FROM entries')
+
+    def close(self):
+        try:
+            self._flush_used()
+        except sqlite3.OperationalError as exc:
+            self._locked(exc)
+        self._db.close()
+
+    def stats(self):
+        return {
+            'size': len(self),
+            'bytes': self.size_bytes(),
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'locked': self.locked,
+        }
+
+    def __len__(self):
+        return self._db.execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+
+    def __contains__(self, key):
+        row = self._db.execute('SELECT expires FROM entries WHERE key = ?', (self.encode_key(key),)).fetchone()
+        return row is not None and row[0] > self.clock()
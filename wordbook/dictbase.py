@@ -1,9 +1,16 @@
 import asyncio
+import collections
 import re
 import enum
 import logging
+import time
 
-from wordbook.exceptions import DictError, DictConnectionError, InvalidDatabase, InvalidStrategy
+from wordbook.exceptions import DictError, DictConnectionError, DictTimeoutError, InvalidDatabase, InvalidStrategy, \
+    ParseError
+from wordbook.metrics import command_name
+from wordbook.parser import ResponseParser, Header, Text
+from wordbook.results import Definition, split_matches
+from wordbook.transport import TcpTransport
 
 
 class ResponseCodes(enum.IntEnum):
@@ -52,17 +59,41 @@ class DictBase:
 
     DEFAULT_HOST = '127.0.0.1'
     DEFAULT_PORT = 2628
-
-    def __init__(self):
+    READ_SIZE = 65536
+
+    def __init__(self, timeout=None, connect_timeout=None, reconnect=None, collector=None, transport=None):
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.reconnect = reconnect
+        self.collector = collector
+        self.transport = transport if transport is not None else TcpTransport()
+        self.reconnects = 0
         self.connected = False
         self.host = None
         self.port = None
+        self.banner = None
         self.capabilities = None
         self.msg_id = None
         self.reader = None
         self.writer = None
-
-    async def connect(self, host=None, port=None):
+        self.parser = ResponseParser()
+        self._events = collections.deque()
+        self._turn = None
+        self._inflight = collections.deque()
+        self._client_text = None
+        self._closed = False
+        # bumped by abort(): reads of commands sent before it must not
+        # reconnect, as their commands are not sent again
+        self._epoch = 0
+
+    @property
+    def endpoint(self):
+        # the server, as a key for MetadataCache
+        host = self.host if self.host is not None else self.DEFAULT_HOST
+        port = self.port if self.port is not None else self.DEFAULT_PORT
+        return self.transport.endpoint(host, port)
+
+    async def connect(self, host=None, port=None, timeout=None):
 
         if host is not None:
             self.host = host
@@ -74,24 +105,136 @@ class DictBase:
         else:
             self.port = self.DEFAULT_PORT
 
+        if timeout is None:
+            timeout = self._connect_timeout()
+
         logging.debug('Connect: %s %s', self.host, self.port)
 
-        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
-        response = await self.reader.readline()
-        logging.debug('Recv status: %s', response)
-        response = response.decode('utf8')
-        response_parse = re.search(r'^(\d+)\s+(.*?)\s+(<[^>]+>)\s+(\S+)\s*', response)
-        if response_parse:
-            code, text, self.capabilities, self.msg_id = response_parse.groups()
-            if int(code) != ResponseCodes.CONNECT_ACCEPTED:
-                raise DictConnectionError(code, text)
+        start = time.perf_counter()
+        try:
+            try:
+                self.writer = await asyncio.wait_for(self._open(), timeout)
+            except asyncio.TimeoutError:
+                self.abort()
+                raise DictTimeoutError(ResponseCodes.UNKNOWN_ERROR, 'Connect timeout after {}s'.format(timeout))
+        except Exception as exc:
+            if self.collector is not None:
+                self.collector.on_connect(time.perf_counter() - start, exc)
+            raise
+        if self.collector is not None:
+            self.collector.on_connect(time.perf_counter() - start)
+        self._inflight.clear()
+        self._closed = False
+        self.connected = True
+
+    async def _open(self):
+        # Reads the banner of a new connection and returns its writer. Until
+        # then self.writer is left alone: on reconnect, commands written in
+        # the meantime go to the old connection and are sent again.
+        reader, writer = await self.transport.open(self.host, self.port)
+        try:
+            self.reader = reader
+            self.parser = ResponseParser()
+            self._events.clear()
+            try:
+                banner = await self.read_event()
+            except ParseError as exc:
+                raise DictConnectionError(ResponseCodes.UNKNOWN_ERROR, str(exc))
+            if banner.code != ResponseCodes.CONNECT_ACCEPTED:
+                raise DictConnectionError(banner.code, banner.text)
+            response_parse = re.search(r'^(.*?)\s+(<[^>]+>)\s+(\S+)\s*', banner.text)
+            if response_parse is None:
+                raise DictConnectionError(ResponseCodes.UNKNOWN_ERROR, banner.text)
+        except BaseException:
+            writer.close()
+            raise
+        self.banner, self.capabilities, self.msg_id = response_parse.groups()
+        return writer
+
+    def _connect_timeout(self):
+        return self.connect_timeout if self.connect_timeout is not None else self.timeout
+
+    def abort(self):
+        # drops the connection, e.g. when a reply did not arrive in time
+        if self.writer is not None:
+            self.writer.close()
+        self._inflight.clear()
+        self._epoch += 1
+        self.connected = False
+
+    async def _reconnect(self):
+        # Called by the task whose turn it is to read, so nobody else reads
+        # meanwhile. The CLIENT handshake and all commands still waiting for
+        # a reply are sent on the new connection in their original order.
+        self.connected = False
+        for attempt in range(self.reconnect.max_attempts):
+            delay = self.reconnect.delay(attempt)
+            if delay:
+                await asyncio.sleep(delay)
+            logging.debug('Reconnect: %s %s, attempt %d', self.host, self.port, attempt + 1)
+            try:
+                writer = await asyncio.wait_for(self._open(), self._connect_timeout())
+            except (OSError, asyncio.TimeoutError, DictConnectionError) as exc:
+                logging.debug('Reconnect failed: %s', exc)
+                continue
+            if self.writer is not None:
+                self.writer.close()
+            self.writer = writer
+            commands = list(self._inflight)
+            if self._client_text is not None:
+                commands.insert(0, self.client_command(self._client_text))
+            writer.write(''.join(commands).encode())
+            if self._client_text is not None:
+                # a connection lost during the handshake is a failed attempt too
+                try:
+                    code, response, _ = await self.recv_response()
+                except DictConnectionError as exc:
+                    logging.debug('Reconnect failed: %s', exc)
+                    continue
+                if code != ResponseCodes.OK:
+                    logging.debug('Reconnect failed: %s %s', code, response)
+                    writer.close()
+                    continue
             self.connected = True
-        else:
-            raise DictConnectionError(ResponseCodes.UNKNOWN_ERROR, response)
+            self.reconnects += 1
+            if self.collector is not None:
+                self.collector.on_reconnect()
+            return
+        raise DictConnectionError(ResponseCodes.UNKNOWN_ERROR,
+                                  'Reconnect failed after {} attempts'.format(self.reconnect.max_attempts))
+
+    def can_reconnect(self):
+        return self.reconnect is not None and not self._closed
+
+    async def reconnecting(self, read, epoch=None):
+        # runs read() again on a new connection when the current one is lost,
+        # unless the connection was aborted after the command was sent
+        attempts = 0
+        while True:
+            try:
+                return await read()
+            except DictConnectionError:
+                if not self.can_reconnect() or attempts >= self.reconnect.max_attempts or \
+                        (epoch is not None and epoch != self._epoch):
+                    raise
+            attempts += 1
+            await self._reconnect()
+
+    def track(self, commands):
+        # commands written but not answered yet, to be sent again on reconnect
+        if self.reconnect is not None:
+            self._inflight.extend(commands)
+
+    def untrack(self, count, epoch=None):
+        if epoch is not None and epoch != self._epoch:
+            # abort() has already forgotten them
+            return
+        for _ in range(min(count, len(self._inflight))):
+            self._inflight.popleft()
 
     async def client(self, text):
-        await self.send_command('CLIENT {}\r\n'.format(text))
-        code, response, _ = await self.recv_response()
+        self._client_text = text
+        code, response, _ = await self.command(self.client_command(text))
         if code == ResponseCodes.OK:
             return
         raise DictError(code, response)
@@ -99,73 +242,101 @@ class DictBase:
     async def auth(self, username, authentication_string):
         raise NotImplementedError()
 
-    async def show_db(self):
-        await self.send_command('SHOW DB\r\n')
-        code, response, body = await self.recv_response()
+    async def show_db(self, timeout=None):
+        code, response, body = await self.command('SHOW DB\r\n', timeout)
         if code == ResponseCodes.DATABASES_PRESENT:
             return body
         elif code == ResponseCodes.NO_DATABASES_PRESENT:
             return []
         raise DictError(code, response)
 
-    async def show_info(self, database):
-        await self.send_command('SHOW INFO {}\r\n'.format(database))
-        code, response, body = await self.recv_response()
+    async def show_info(self, database, timeout=None):
+        code, response, body = await self.command('SHOW INFO {}\r\n'.format(database), timeout)
         if code == ResponseCodes.DATABASE_INFORMATION:
             return body
         elif code == ResponseCodes.INVALID_DATABASE:
             raise InvalidDatabase(code, response)
         raise DictError(code, response)
 
-    async def show_strat(self):
-        await self.send_command('SHOW STRAT\r\n')
-        code, response, body = await self.recv_response()
+    async def show_strat(self, timeout=None):
+        code, response, body = await self.command('SHOW STRAT\r\n', timeout)
         if code == ResponseCodes.STRATEGIES_AVAILABLE:
             return body
         elif code == ResponseCodes.NO_STRATEGIES_AVAILABLE:
             return []
         raise DictError(code, response)
 
-    async def show_server(self):
-        await self.send_command('SHOW SERVER\r\n')
-        code, response, body = await self.recv_response()
+    async def show_server(self, timeout=None):
+        code, response, body = await self.command('SHOW SERVER\r\n', timeout)
         if code == ResponseCodes.SERVER_INFORMATION:
             return body
         raise DictError(code, response)
 
-    async def status(self):
-        await self.send_command('STATUS\r\n')
-        code, response, _ = await self.recv_response()
+    async def status(self, timeout=None):
+        code, response, _ = await self.command('STATUS\r\n', timeout)
         if code == ResponseCodes.STATUS_INFO:
             return response
         raise DictError(code, response)
 
-    async def help(self):
-        await self.send_command('HELP\r\n')
-        code, response, body = await self.recv_response()
+    async def help(self, timeout=None):
+        code, response, body = await self.command('HELP\r\n', timeout)
         if code == ResponseCodes.HELP_TEXT:
             return body
         raise DictError(code, response)
 
     async def quit(self):
-        await self.send_command('QUIT\r\n')
-        code, response, _ = await self.recv_response()
+        code, response, _ = await self.command('QUIT\r\n')
         if code == ResponseCodes.CONECTION_CLOSING:
             self.writer.close()
+            self._closed = True
             self.connected = False
             return
         raise DictError(code, response)
 
     async def option_mime(self):
-        await self.send_command('OPTION MIME\r\n')
-        code, response, _ = await self.recv_response()
+        code, response, _ = await self.command('OPTION MIME\r\n')
         if code == ResponseCodes.OK:
             return response
         raise DictError(code, response)
 
-    async def define(self, database, word):
-        await self.send_command('DEFINE {} "{}"\r\n'.format(database, word))
-        code, response, body = await self.recv_response()
+    async def define(self, database, word, timeout=None):
+        code, response, body = await self.command(self.define_command(database, word), timeout)
+        return self.define_result(code, response, body)
+
+    async def match(self, database, strategy, word, timeout=None):
+        code, response, body = await self.command(self.match_command(database, strategy, word), timeout)
+        return self.match_result(code, response, body)
+
+    async def define_many(self, database, words, return_exceptions=False, timeout=None):
+        commands = [self.define_command(database, word) for word in words]
+        responses = await self.pipeline(commands, timeout)
+        return self.map_results(self.define_result, responses, return_exceptions)
+
+    async def match_many(self, database, strategy, words, return_exceptions=False, timeout=None):
+        commands = [self.match_command(database, strategy, word) for word in words]
+        responses = await self.pipeline(commands, timeout)
+        return self.map_results(self.match_result, responses, return_exceptions)
+
+    def iter_define(self, database, word):
+        return DefinitionStream(self, self.define_command(database, word))
+
+    def iter_match(self, database, strategy, word):
+        return MatchStream(self, self.match_command(database, strategy, word))
+
+    @staticmethod
+    def client_command(text):
+        return 'CLIENT {}\r\n'.format(text)
+
+    @staticmethod
+    def define_command(database, word):
+        return 'DEFINE {} "{}"\r\n'.format(database, word)
+
+    @staticmethod
+    def match_command(database, strategy, word):
+        return 'MATCH {} {} "{}"\r\n'.format(database, strategy, word)
+
+    @staticmethod
+    def define_result(code, response, body):
         if code == ResponseCodes.NO_MATCH:
             return []
         elif code == ResponseCodes.DEFINITIONS_RETRIEVED:
@@ -174,9 +345,8 @@ class DictBase:
             raise InvalidDatabase(code, response)
         raise DictError(code, response)
 
-    async def match(self, database, strategy, word):
-        await self.send_command('MATCH {} {} "{}"\r\n'.format(database, strategy, word))
-        code, response, body = await self.recv_response()
+    @staticmethod
+    def match_result(code, response, body):
         if code == ResponseCodes.NO_MATCH:
             return []
         elif code == ResponseCodes.MATCHES_FOUND:
@@ -187,47 +357,358 @@ class DictBase:
             raise InvalidStrategy(code, response)
         raise DictError(code, response)
 
+    @staticmethod
+    def map_results(result, responses, return_exceptions):
+        ret = []
+        for code, response, body in responses:
+            try:
+                ret.append(result(code, response, body))
+            except DictError as exc:
+                if not return_exceptions:
+                    raise
+                ret.append(exc)
+        return ret
+
+    async def command(self, command, timeout=None):
+        responses = await self.pipeline([command], timeout)
+        return responses[0]
+
+    async def pipeline(self, commands, timeout=None):
+        # Commands are written in one go; replies are read back in FIFO order.
+        # Every call waits for the reads of the calls issued before it, so
+        # several tasks can safely share one connection.
+        start = time.perf_counter() if self.collector is not None else None
+        turn, done = self.reserve_turn()
+        epoch = self._epoch
+        self.track(commands)
+        try:
+            await self.send_command(''.join(commands))
+        except asyncio.CancelledError:
+            # the commands are already buffered, their replies still have to be read
+            reads = asyncio.ensure_future(self._recv_responses(turn, done, commands, start, epoch))
+            reads.add_done_callback(_discard_result)
+            raise
+        except DictConnectionError:
+            # the commands are sent again once the reads reconnect
+            if not self.can_reconnect():
+                self.untrack(len(commands), epoch)
+                self.release_turn(turn, done)
+                raise
+        except BaseException:
+            self.untrack(len(commands), epoch)
+            self.release_turn(turn, done)
+            raise
+        # the reads are shielded, so a cancelled caller never leaves its
+        # replies in the stream for the next one
+        reads = asyncio.ensure_future(self._recv_responses(turn, done, commands, start, epoch))
+        if timeout is None:
+            timeout = self.timeout
+        try:
+            return await asyncio.wait_for(asyncio.shield(reads), timeout)
+        except asyncio.TimeoutError:
+            # a late reply would desynchronize the connection, so drop it
+            reads.add_done_callback(_discard_result)
+            self.abort()
+            raise DictTimeoutError(ResponseCodes.UNKNOWN_ERROR, 'No reply after {}s'.format(timeout))
+        except asyncio.CancelledError:
+            reads.add_done_callback(_discard_result)
+            raise
+
+    async def _recv_responses(self, turn, done, commands, start, epoch):
+        responses = []
+        try:
+            if turn is not None:
+                await turn
+            for command in commands:
+                response = await self.reconnecting(self.recv_response, epoch)
+                self.untrack(1, epoch)
+                if self.collector is not None:
+                    self.record(command, response[0], start, response_lines(response))
+                responses.append(response)
+            return responses
+        except BaseException:
+            # replies which are never going to be read must not be asked for again
+            self.untrack(len(commands) - len(responses), epoch)
+            raise
+        finally:
+            done.set_result(None)
+
+    def record(self, command, code, start, lines):
+        self.collector.on_command(command_name(command), code, time.perf_counter() - start, lines)
+
+    def idle(self):
+        # whether no command is waiting for its reply
+        return self._turn is None or self._turn.done()
+
+    def reserve_turn(self):
+        turn = self._turn
+        done = self._turn = asyncio.Future()
+        return turn, done
+
+    def release_turn(self, turn, done):
+        if turn is None or turn.done():
+            done.set_result(None)
+        else:
+            turn.add_done_callback(lambda _: done.set_result(None))
+
     async def send_command(self, command):
         logging.debug('Send command: %s', command)
-        self.writer.write(command.encode())
-        await self.writer.drain()
+        data = command.encode()
+        self.writer.write(data)
+        if self.collector is not None:
+            self.collector.on_send(len(data))
+        try:
+            await self.writer.drain()
+        except ConnectionError as exc:
+            self.connected = False
+            raise DictConnectionError(ResponseCodes.UNKNOWN_ERROR, 'Connection lost: {}'.format(exc))
+
+    async def read_event(self):
+        while not self._events:
+            try:
+                data = await self.reader.read(self.READ_SIZE)
+            except ConnectionError as exc:
+                self.connected = False
+                raise DictConnectionError(ResponseCodes.UNKNOWN_ERROR, 'Connection lost: {}'.format(exc))
+            if not data:
+                self.connected = False
+                raise DictConnectionError(ResponseCodes.UNKNOWN_ERROR, 'Connection closed by server')
+            if self.collector is not None:
+                self.collector.on_receive(len(data))
+            try:
+                self._events.extend(self.parser.feed(data))
+            except ParseError:
+                # the rest of the stream cannot be parsed; the connection
+                # is dropped, so a pool discards it and reconnect starts over
+                # (while connecting, _open() closes it itself)
+                if self.connected:
+                    self.abort()
+                raise
+        event = self._events.popleft()
+        if type(event) is not Text:
+            logging.debug('Recv status: %s', event)
+        return event
+
+    async def read_text(self):
+        chunks = []
+        while True:
+            event = await self.read_event()
+            chunks.append(event.data)
+            if event.last:
+                return b''.join(chunks)
 
     async def recv_response(self):
 
-        # read status
-        status_line = await self.reader.readline()
-        code, response = status_line.decode('utf8').rstrip().split(' ', 1)
-
-        logging.debug('Recv status: %s', status_line)
+        status = await self.read_event()
+        code, response = status.code, status.text
 
-        if code[0] == '1':
+        if code == ResponseCodes.DEFINITIONS_RETRIEVED:
             body = []
-            next_status = True
             while True:
-                line = await self.reader.readline()
-                logging.debug('Recv line: %s', line)
-
-                line = line.decode('utf8').rstrip()
-                if line == '.':
-                    next_status = True
-                    continue
-
-                if next_status:
-                    rcode = re.search(r'^(\d{3}) (.*)', line)
-                    if rcode is not None:
-                        fin_code, fin_response = rcode.groups()
-                        fin_code = int(fin_code)
-                        if fin_code == ResponseCodes.OK:
-                            break
-                        elif fin_code in (ResponseCodes.DEFINITIONS_RETRIEVED, ResponseCodes.WORD_DATABASE):
-                            body.append('[{}]'.format(fin_response))
-                            continue
+                event = await self.read_event()
+                if type(event) is not Header:
+                    break
+                body.append(Definition(event.text, await self.read_text()))
+        elif code == ResponseCodes.MATCHES_FOUND:
+            body = split_matches(await self.read_text())
+            await self.read_event()
+        elif code < 200:
+            body = []
+            while True:
+                event = await self.read_event()
+                if type(event) is not Text:
+                    break
+                body.extend(event.lines)
+        else:
+            body = None
 
-                    next_status = False
+        return code, response, body
+
+
+def response_lines(response):
+    # text lines of a reply, for the metrics
+    code, _, body = response
+    if not body:
+        return 0
+    if code == ResponseCodes.DEFINITIONS_RETRIEVED:
+        return sum(definition.raw.count(b'\n') for definition in body)
+    return len(body)
+
+
+def _discard_result(future):
+    if not future.cancelled():
+        future.exception()
+
+
+class ResponseStream:
+
+    # Iterates over a DEFINE or MATCH reply as it arrives. Leaving the loop
+    # early requires aclose() (or "async with") to drain the rest of the
+    # reply, otherwise the connection is blocked for the following commands.
+
+    expected_code = None
+
+    def __init__(self, conn, command):
+        self.conn = conn
+        self.command = command
+        self._turn = None
+        self._done = None
+        self._started = False
+        self._finished = False
+        self._tracked = False
+        self._start_time = None
+        self._epoch = None
+        self._code = None
+        # text lines of the reply, for the metrics
+        self._line_count = 0
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._finished:
+            raise StopAsyncIteration
+        try:
+            if self._done is None:
+                await self._start()
+            item = None
+            if not self._finished:
+                item = await self.read_item()
+        except asyncio.CancelledError:
+            asyncio.ensure_future(self.aclose())
+            raise
+        except BaseException:
+            self._finish()
+            raise
+        if item is None:
+            self._finish()
+            raise StopAsyncIteration
+        self._line_count += self.item_lines(item)
+        return item
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
+
+    async def aclose(self):
+        if self._finished:
+            return
+        if self._done is None:
+            self._finished = True
+            return
+        try:
+            if self._turn is not None:
+                # shielded: the turn is the done future of the command before
+                await asyncio.shield(self._turn)
+                self._turn = None
+            if not self._started:
+                await self._read_status()
+            while not self._finished:
+                item = await self.read_item()
+                if item is None:
+                    break
+                self._line_count += self.item_lines(item)
+        finally:
+            self._finish()
+
+    async def read_item(self):
+        raise NotImplementedError()
 
-                body.append(line)
+    @staticmethod
+    def item_lines(item):
+        return 1
 
-        else:
-            body = None
+    def map_error(self, code, response):
+        raise NotImplementedError()
 
-        return int(code), response, body
+    async def _start(self):
+        if self.conn.collector is not None:
+            self._start_time = time.perf_counter()
+        self._turn, self._done = self.conn.reserve_turn()
+        self._epoch = self.conn._epoch
+        self.conn.track([self.command])
+        self._tracked = self.conn.reconnect is not None
+        try:
+            await self.conn.send_command(self.command)
+        except asyncio.CancelledError:
+            raise
+        except BaseException as exc:
+            if not (isinstance(exc, DictConnectionError) and self.conn.can_reconnect()):
+                if self._tracked:
+                    self.conn.untrack(1, self._epoch)
+                    self._tracked = False
+                self.conn.release_turn(self._turn, self._done)
+                self._finished = True
+                raise
+        if self._turn is not None:
+            await asyncio.shield(self._turn)
+            self._turn = None
+        await self._read_status()
+
+    async def _read_status(self):
+        # the command is sent again if the connection is lost before its
+        # reply starts; once items were yielded it can only fail
+        status = await self.conn.reconnecting(self.conn.read_event, self._epoch)
+        code, response = status.code, status.text
+        self._started = True
+        self._code = code
+        if code != self.expected_code:
+            self._finish()
+            self.map_error(code, response)
+
+    def _finish(self):
+        if self._start_time is not None and self._code is not None:
+            self.conn.record(self.command, self._code, self._start_time, self._line_count)
+            self._start_time = None
+        if self._tracked:
+            self.conn.untrack(1, self._epoch)
+            self._tracked = False
+        if self._done is not None and not self._done.done():
+            self._done.set_result(None)
+        self._finished = True
+
+
+class DefinitionStream(ResponseStream):
+
+    expected_code = ResponseCodes.DEFINITIONS_RETRIEVED
+
+    async def read_item(self):
+        event = await self.conn.read_event()
+        if type(event) is Header:
+            return Definition(event.text, await self.conn.read_text())
+        elif event.code == ResponseCodes.OK:
+            return None
+        raise DictError(event.code, event.text)
+
+    @staticmethod
+    def item_lines(item):
+        # counted like response_lines() does for define()
+        return item.raw.count(b'\n')
+
+    def map_error(self, code, response):
+        DictBase.define_result(code, response, [])
+
+
+class MatchStream(ResponseStream):
+
+    expected_code = ResponseCodes.MATCHES_FOUND
+
+    def __init__(self, conn, command):
+        super().__init__(conn, command)
+        self._lines = collections.deque()
+
+    async def read_item(self):
+        while not self._lines:
+            event = await self.conn.read_event()
+            if type(event) is Text:
+                self._lines.extend(split_matches(event.data))
+            elif event.code == ResponseCodes.OK:
+                return None
+            else:
+                raise DictError(event.code, event.text)
+        return self._lines.popleft()
+
+    def map_error(self, code, response):
+        DictBase.match_result(code, response, [])
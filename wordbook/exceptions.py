@@ -10,6 +10,10 @@ class DictConnectionError(DictError):
     pass
 
 
+class DictTimeoutError(DictConnectionError):
+    pass
+
+
 class InvalidDatabase(DictError):
     pass
 
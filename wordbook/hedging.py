@@ -0,0 +1,37 @@
+import bisect
+import collections
+
+
+class HedgingPolicy:
+
+    # Decides how long to wait for a reply before the same command is sent on
+    # a second connection: the given percentile of the recently observed
+    # latencies, kept within min_delay and max_delay. Until enough samples
+    # are collected, initial_delay is used.
+
+    def __init__(self, percentile=95.0, min_delay=0.005, max_delay=2.0, initial_delay=0.1,
+                 window=1000, min_samples=20):
+        if not 0 < percentile <= 100:
+            raise ValueError('Invalid percentile: {}'.format(percentile))
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.initial_delay = initial_delay
+        self.min_samples = min_samples
+        self.hedged = 0
+        self.hedge_wins = 0
+        self._samples = collections.deque(maxlen=window)
+        self._sorted = []
+
+    def record(self, latency):
+        if len(self._samples) == self._samples.maxlen:
+            old = self._samples[0]
+            del self._sorted[bisect.bisect_left(self._sorted, old)]
+        self._samples.append(latency)
+        bisect.insort(self._sorted, latency)
+
+    def delay(self):
+        if len(self._sorted) < self.min_samples:
+            return self.initial_delay
+        pos = min(len(self._sorted) - 1, int(len(self._sorted) * self.percentile / 100.0))
+        return min(self.max_delay, max(self.min_delay, self._sorted[pos]))
@@ -0,0 +1,448 @@
+import bisect
+import collections
+import logging
+import mmap
+import os
+import struct
+import zlib
+
+from wordbook.dictbase import ResponseCodes
+from wordbook.exceptions import DictError, InvalidDatabase, InvalidStrategy
+from wordbook.results import Definition, Match
+
+
+B64_DIGITS = 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/'
+B64_VALUES = {c: i for i, c in enumerate(B64_DIGITS)}
+
+# gzip header flags
+FHCRC = 0x02
+FEXTRA = 0x04
+FNAME = 0x08
+FCOMMENT = 0x10
+
+
+def b64_decode(text):
+    # dictd encodes offsets and lengths as plain base-64 numbers
+    value = 0
+    for char in text:
+        value = value * 64 + B64_VALUES[char]
+    return value
+
+
+def b64_encode(value):
+    digits = []
+    while True:
+        value, rest = divmod(value, 64)
+        digits.append(B64_DIGITS[rest])
+        if value == 0:
+            return ''.join(reversed(digits))
+
+
+# the first characters MATCH prefix lists headwords by, e.g. to copy all
+# headwords of a database; the others are listed with REST_PATTERN and the
+# "re" strategy, when the server has it
+ALPHABET = 'abcdefghijklmnopqrstuvwxyz0123456789'
+REST_PATTERN = '^[^a-z0-9]'
+
+
+def sort_key(word, allchars=False):
+    # the order used by dictfmt: case folded and, unless the database was
+    # built with --allchars, ignoring everything except letters, digits and spaces
+    word = word.lower()
+    if allchars:
+        return word
+    return ''.join(c for c in word if c.isalnum() or c.isspace())
+
+
+class DictFile:
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def read(self, offset, length):
+        return self._map[offset:offset + length]
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+
+class DictzipFile:
+
+    # Random access to a dictzip (.dz) file: a gzip file whose "RA" extra
+    # field lists the compressed size of each fixed size chunk, so only the
+    # chunks covering the requested range need to be inflated.
+
+    def __init__(self, path, cache_size=16):
+        self.path = path
+        self.cache_size = cache_size
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._cache = collections.OrderedDict()
+        self._parse_header()
+
+    def _parse_header(self):
+        header = self._map[:10]
+        if len(header) < 10 or header[:3] != b'\x1f\x8b\x08':
+            raise DictError(ResponseCodes.UNKNOWN_ERROR, 'Not a gzip file: {}'.format(self.path))
+        flags = header[3]
+        pos = 10
+        self.chunk_length = None
+        offsets = []
+        if flags & FEXTRA:
+            xlen, = struct.unpack('<H', self._map[pos:pos + 2])
+            pos += 2
+            extra_end = pos + xlen
+            while pos + 4 <= extra_end:
+                sub_id = self._map[pos:pos + 2]
+                sub_len, = struct.unpack('<H', self._map[pos + 2:pos + 4])
+                if sub_id == b'RA':
+                    _, self.chunk_length, count = struct.unpack('<HHH', self._map[pos + 4:pos + 10])
+                    offsets = struct.unpack('<{}H'.format(count), self._map[pos + 10:pos + 10 + 2 * count])
+                pos += 4 + sub_len
+            pos = extra_end
+        if flags & FNAME:
+            pos = self._map.find(b'\x00', pos) + 1
+        if flags & FCOMMENT:
+            pos = self._map.find(b'\x00', pos) + 1
+        if flags & FHCRC:
+            pos += 2
+
+        if self.chunk_length is None:
+            # a plain gzip file, there is no choice but to inflate all of it
+            logging.debug('No dictzip chunk table in %s', self.path)
+            self._data = zlib.decompressobj(-zlib.MAX_WBITS).decompress(self._map[pos:])
+            return
+        self._data = None
+        self._chunks = []
+        for size in offsets:
+            self._chunks.append((pos, size))
+            pos += size
+
+    def read(self, offset, length):
+        if self._data is not None:
+            return self._data[offset:offset + length]
+        first = offset // self.chunk_length
+        last = (offset + length - 1) // self.chunk_length
+        data = b''.join(self._chunk(index) for index in range(first, min(last + 1, len(self._chunks))))
+        start = offset - first * self.chunk_length
+        return data[start:start + length]
+
+    def _chunk(self, index):
+        data = self._cache.get(index)
+        if data is not None:
+            self._cache.move_to_end(index)
+            return data
+        pos, size = self._chunks[index]
+        data = zlib.decompressobj(-zlib.MAX_WBITS).decompress(self._map[pos:pos + size])
+        self._cache[index] = data
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return data
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+
+class LocalDatabase:
+
+    def __init__(self, name, index_path, dict_path):
+        self.name = name
+        self.index_path = index_path
+        self.dict_path = dict_path
+        self._index_file = open(index_path, 'rb')
+        self._index = mmap.mmap(self._index_file.fileno(), 0, access=mmap.ACCESS_READ)
+        if dict_path.endswith('.dz'):
+            self._dict = DictzipFile(dict_path)
+        else:
+            self._dict = DictFile(dict_path)
+        self.allchars = bool(self.lookup('00-database-allchars', False) or self.lookup('00-database-allchars', True))
+        self.description = self._info('00-database-short', '00databaseshort') or name
+
+    def close(self):
+        self._index.close()
+        self._index_file.close()
+        self._dict.close()
+
+    def define(self, word):
+        ret = []
+        for entry in self.lookup(word):
+            header = '"{}" {} "{}"'.format(entry[0], self.name, self.description)
+            ret.append(Definition(header, self._read(entry)))
+        return ret
+
+    def match(self, word, prefix=False):
+        ret = []
+        seen = set()
+        for headword, _, _ in self.lookup(word, prefix=prefix):
+            if headword.startswith(('00-database-', '00database')) or headword in seen:
+                continue
+            seen.add(headword)
+            ret.append(headword)
+        return ret
+
+    def info(self):
+        return self._info('00-database-info', '00databaseinfo')
+
+    def _info(self, *headwords):
+        for headword in headwords:
+            entries = self.lookup(headword)
+            if entries:
+                text = self._read(entries[0]).decode('utf8')
+                lines = text.splitlines()
+                # the first line of a metadata entry repeats the headword
+                if lines and lines[0].strip() == headword:
+                    lines = lines[1:]
+                return '\n'.join(line.strip() for line in lines).strip()
+        return None
+
+    def _read(self, entry):
+        _, offset, length = entry
+        data = self._dict.read(offset, length)
+        if not data.endswith(b'\n'):
+            data += b'\n'
+        return data
+
+    def lookup(self, word, allchars=None, prefix=False):
+        if allchars is None:
+            allchars = self.allchars
+        target = sort_key(word, allchars)
+        index = self._index
+        pos = self._bisect(target, allchars)
+        ret = []
+        size = len(index)
+        while pos < size:
+            end = index.find(b'\n', pos)
+            if end < 0:
+                end = size
+            headword, offset, length = index[pos:end].decode('utf8').split('\t')[:3]
+            key = sort_key(headword, allchars)
+            if not key.startswith(target) or (not prefix and key != target):
+                break
+            ret.append((headword, b64_decode(offset), b64_decode(length.rstrip())))
+            pos = end + 1
+        return ret
+
+    def _bisect(self, target, allchars):
+        # finds the first index line whose headword sorts at or after the target
+        index = self._index
+        lo, hi = 0, len(index)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start = index.rfind(b'\n', lo, mid)
+            start = lo if start < 0 else start + 1
+            end = index.find(b'\n', start)
+            if end < 0:
+                end = len(index)
+            headword = index[start:end].split(b'\t', 1)[0].decode('utf8')
+            if sort_key(headword, allchars) < target:
+                lo = end + 1
+            else:
+                hi = start
+        return lo
+
+
+class MemoryDatabase:
+
+    def __init__(self, name, entries, description=None, info=None):
+        self.name = name
+        self.description = description or name
+        self._info = info
+        self._entries = collections.defaultdict(list)
+        for headword, text in entries.items():
+            if not text.endswith('\n'):
+                text += '\n'
+            self._entries[sort_key(headword)].append((headword, text.encode('utf8')))
+        self._keys = sorted(self._entries)
+
+    def close(self):
+        pass
+
+    def define(self, word):
+        ret = []
+        for headword, raw in self._entries.get(sort_key(word), ()):
+            ret.append(Definition('"{}" {} "{}"'.format(headword, self.name, self.description), raw))
+        return ret
+
+    def match(self, word, prefix=False):
+        target = sort_key(word)
+        if not prefix:
+            return [headword for headword, _ in self._entries.get(target, ())]
+        ret = []
+        for pos in range(bisect.bisect_left(self._keys, target), len(self._keys)):
+            key = self._keys[pos]
+            if not key.startswith(target):
+                break
+            ret.extend(headword for headword, _ in self._entries[key])
+        return ret
+
+    def info(self):
+        return self._info
+
+
+class LocalDict:
+
+    # Serves dictd database files (.index with .dict or .dict.dz) from the
+    # local disk with the same command surface as DictBase.
+
+    STRATEGIES = ('exact "Match headwords exactly"', 'prefix "Match prefixes"')
+
+    def __init__(self, databases, default_strategy='exact'):
+        self.databases = databases
+        self.default_strategy = default_strategy
+        self.connected = False
+        self.banner = 'wordbook local'
+        self.capabilities = '<local>'
+        self.msg_id = None
+        self._databases = collections.OrderedDict()
+
+    @property
+    def endpoint(self):
+        return 'local:' + ','.join(os.path.abspath(database) for database in self.databases)
+
+    @classmethod
+    def from_directory(cls, path, **kwargs):
+        databases = []
+        for name in sorted(os.listdir(path)):
+            if name.endswith('.index'):
+                databases.append(os.path.join(path, name[:-len('.index')]))
+        return cls(databases, **kwargs)
+
+    async def connect(self, host=None, port=None):
+        for database in self.databases:
+            database = self.open_database(database)
+            self._databases[database.name] = database
+        self.connected = True
+
+    def open_database(self, base):
+        dict_path = base + '.dict.dz'
+        if not os.path.exists(dict_path):
+            dict_path = base + '.dict'
+        return LocalDatabase(os.path.basename(base), base + '.index', dict_path)
+
+    async def client(self, text):
+        pass
+
+    async def quit(self):
+        for database in self._databases.values():
+            database.close()
+        self._databases.clear()
+        self.connected = False
+
+    async def status(self):
+        return 'status [local: {} databases]'.format(len(self._databases))
+
+    async def show_db(self):
+        return ['{} "{}"'.format(name, db.description) for name, db in self._databases.items()]
+
+    async def show_strat(self):
+        return list(self.STRATEGIES)
+
+    async def show_info(self, database):
+        info = self._get_databases(database)[0].info()
+        if info is None:
+            return ['No information available for {}'.format(database)]
+        return info.split('\n')
+
+    async def show_server(self):
+        return ['wordbook local dictionary']
+
+    async def define(self, database, word):
+        ret = []
+        for db in self._get_databases(database):
+            ret.extend(db.define(word))
+            if ret and database == '!':
+                break
+        return ret
+
+    async def match(self, database, strategy, word):
+        if strategy == '.':
+            strategy = self.default_strategy
+        if strategy not in ('exact', 'prefix'):
+            raise InvalidStrategy(ResponseCodes.INVALID_STRATEGY, 'Invalid strategy')
+        ret = []
+        for db in self._get_databases(database):
+            for headword in db.match(word, prefix=strategy == 'prefix'):
+                ret.append(Match('{} "{}"'.format(db.name, headword).encode('utf8')))
+            if ret and database == '!':
+                break
+        return ret
+
+    async def define_many(self, database, words, return_exceptions=False):
+        return await self._many(self.define, (database,), words, return_exceptions)
+
+    async def match_many(self, database, strategy, words, return_exceptions=False):
+        return await self._many(self.match, (database, strategy), words, return_exceptions)
+
+    def iter_define(self, database, word):
+        return ListStream(self.define(database, word))
+
+    def iter_match(self, database, strategy, word):
+        return ListStream(self.match(database, strategy, word))
+
+    @staticmethod
+    async def _many(method, args, words, return_exceptions):
+        ret = []
+        for word in words:
+            try:
+                ret.append(await method(*(args + (word,))))
+            except DictError as exc:
+                if not return_exceptions:
+                    raise
+                ret.append(exc)
+        return ret
+
+    def _get_databases(self, database):
+        if database in ('*', '!'):
+            return list(self._databases.values())
+        try:
+            return [self._databases[database]]
+        except KeyError:
+            raise InvalidDatabase(ResponseCodes.INVALID_DATABASE, 'Invalid database')
+
+
+class ListStream:
+
+    # Async iterator over an already computed result, matching the interface
+    # of the DictBase response streams.
+
+    def __init__(self, result):
+        self._result = result
+        self._items = None
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._items is None:
+            self._items = iter(await self._result)
+        try:
+            return next(self._items)
+        except StopIteration:
+            raise StopAsyncIteration
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
+
+    async def aclose(self):
+        if self._items is None:
+            self._result.close()
+        self._items = iter(())
+
+
+class MemoryDict(LocalDict):
+
+    # LocalDict over MemoryDatabase objects, handy for tests and benchmarks.
+
+    @property
+    def endpoint(self):
+        return 'memory:{:x}'.format(id(self))
+
+    def open_database(self, database):
+        return database
@@ -0,0 +1,159 @@
+import bisect
+import collections
+
+
+# seconds
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def command_name(command):
+    # "DEFINE wn "mock"\r\n" -> "DEFINE", "SHOW DB\r\n" -> "SHOW DB"
+    words = command.split(None, 2)
+    if not words:
+        return ''
+    name = words[0].upper()
+    if name in ('SHOW', 'OPTION') and len(words) > 1:
+        name = '{} {}'.format(name, words[1].upper())
+    return name
+
+
+class Collector:
+
+    # The interface DictBase reports to; every hook does nothing, so a
+    # collector only overrides what it needs. DictBase checks for a
+    # collector before measuring anything, so none attached costs nothing.
+
+    def on_connect(self, seconds, error=None):
+        pass
+
+    def on_reconnect(self):
+        pass
+
+    def on_send(self, size):
+        pass
+
+    def on_receive(self, size):
+        pass
+
+    def on_command(self, name, code, seconds, lines):
+        pass
+
+
+class Histogram:
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        # (upper bound, observations at or below it), the last bound is +Inf
+        ret = []
+        total = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            ret.append((bound, total))
+        return ret
+
+    def snapshot(self):
+        return {'count': self.count, 'sum': self.sum, 'buckets': self.cumulative()}
+
+
+class MetricsCollector(Collector):
+
+    # Aggregates what a DictBase (or all connections of a pool sharing it)
+    # reports: latency histograms and reply codes per command, lines per
+    # reply, bytes sent and received, connect times and errors.
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.latency = {}
+        self.codes = collections.Counter()
+        self.lines = collections.defaultdict(lambda: [0, 0])
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.connect_latency = Histogram(buckets)
+        self.connect_errors = 0
+        self.reconnects = 0
+
+    def on_connect(self, seconds, error=None):
+        if error is not None:
+            self.connect_errors += 1
+        else:
+            self.connect_latency.observe(seconds)
+
+    def on_reconnect(self):
+        self.reconnects += 1
+
+    def on_send(self, size):
+        self.bytes_sent += size
+
+    def on_receive(self, size):
+        self.bytes_received += size
+
+    def on_command(self, name, code, seconds, lines):
+        histogram = self.latency.get(name)
+        if histogram is None:
+            histogram = self.latency[name] = Histogram(self.buckets)
+        histogram.observe(seconds)
+        self.codes[(name, code)] += 1
+        stats = self.lines[name]
+        stats[0] += 1
+        stats[1] += lines
+
+    def snapshot(self):
+        return {
+            'commands': {name: histogram.snapshot() for name, histogram in sorted(self.latency.items())},
+            'codes': {'{} {}'.format(name, code): count for (name, code), count in sorted(self.codes.items())},
+            'lines': {name: {'count': count, 'sum': total} for name, (count, total) in sorted(self.lines.items())},
+            'bytes_sent': self.bytes_sent,
+            'bytes_received': self.bytes_received,
+            'connect': self.connect_latency.snapshot(),
+            'connect_errors': self.connect_errors,
+            'reconnects': self.reconnects,
+        }
+
+    def prometheus(self, prefix='wordbook'):
+        # the text exposition format
+        out = []
+
+        def histogram(name, value, labels=''):
+            sep = ',' if labels else ''
+            for bound, count in value.cumulative():
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                out.append('{}_bucket{{{}{}le="{}"}} {}'.format(name, labels, sep, le, count))
+            suffix = '{{{}}}'.format(labels) if labels else ''
+            out.append('{}_sum{} {}'.format(name, suffix, repr(value.sum)))
+            out.append('{}_count{} {}'.format(name, suffix, value.count))
+
+        name = prefix + '_command_seconds'
+        out.append('# TYPE {} histogram'.format(name))
+        for command, value in sorted(self.latency.items()):
+            histogram(name, value, 'command="{}"'.format(command))
+
+        name = prefix + '_responses_total'
+        out.append('# TYPE {} counter'.format(name))
+        for (command, code), count in sorted(self.codes.items()):
+            out.append('{}{{command="{}",code="{}"}} {}'.format(name, command, code, count))
+
+        name = prefix + '_response_lines'
+        out.append('# TYPE {} summary'.format(name))
+        for command, (count, total) in sorted(self.lines.items()):
+            out.append('{}_sum{{command="{}"}} {}'.format(name, command, total))
+            out.append('{}_count{{command="{}"}} {}'.format(name, command, count))
+
+        for name, value in (('bytes_sent_total', self.bytes_sent), ('bytes_received_total', self.bytes_received),
+                            ('connect_errors_total', self.connect_errors), ('reconnects_total', self.reconnects)):
+            out.append('# TYPE {}_{} counter'.format(prefix, name))
+            out.append('{}_{} {}'.format(prefix, name, value))
+
+        name = prefix + '_connect_seconds'
+        out.append('# TYPE {} histogram'.format(name))
+        histogram(name, self.connect_latency)
+        return '\n'.join(out) + '\n'
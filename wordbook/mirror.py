@@ -0,0 +1,268 @@
+import argparse
+import asyncio
+import collections
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+
+from wordbook.exceptions import DictError
+from wordbook.local import ALPHABET, REST_PATTERN, b64_encode, sort_key
+from wordbook.pool import DictPool
+
+
+# headwords outside of the alphabet, listed with the "re" strategy when the
+# server has it
+REST = '!re'
+
+
+class Mirror:
+
+    # Copies a database of a DICT server into dictd files (NAME.index and
+    # NAME.dict) readable by LocalDict.
+    #
+    # Headwords are listed with MATCH prefix over the alphabet; a prefix with
+    # split_threshold or more headwords is split into longer prefixes. The
+    # definitions are then fetched with pipelined DEFINE commands by several
+    # workers. Listings and definitions are kept in NAME.mirror.sqlite, which
+    # is the checkpoint: a stopped crawl resumes with what is still missing.
+    #
+    # A later run lists the prefixes again and fetches only the ranges whose
+    # headword count changed. When the SHOW INFO text changed, all
+    # definitions are fetched again.
+
+    def __init__(self, conn, database, directory, name=None, alphabet=ALPHABET, split_threshold=1000,
+                 max_depth=8, batch=20, workers=4):
+        self.conn = conn
+        self.database = database
+        self.directory = directory
+        self.name = name or database
+        self.alphabet = alphabet
+        self.split_threshold = split_threshold
+        self.max_depth = max_depth
+        self.batch = batch
+        self.workers = workers
+        self.listed = 0
+        self.fetched = 0
+        self.failed = 0
+        self.has_regex = False
+        self.run_id = None
+        self._db = sqlite3.connect(os.path.join(directory, self.name + '.mirror.sqlite'))
+        self._db.executescript('''
+            CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS prefixes (prefix TEXT PRIMARY KEY, count INTEGER, split INTEGER,
+                                                 run INTEGER);
+            CREATE TABLE IF NOT EXISTS keys (key TEXT PRIMARY KEY, prefix TEXT, word TEXT);
+            CREATE INDEX IF NOT EXISTS keys_prefix ON keys (prefix);
+            CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, data TEXT);
+        ''')
+
+    async def run(self):
+        await self.start()
+        await self.list_headwords()
+        await self.fetch_definitions()
+        self.set_meta('complete', '1')
+        self._db.commit()
+        self.build()
+
+    def close(self):
+        self._db.close()
+
+    async def start(self):
+        info = '\n'.join(await self.conn.show_info(self.database))
+        digest = hashlib.sha1(info.encode('utf8')).hexdigest()
+        description = self.database
+        for line in await self.conn.show_db():
+            name, _, text = line.partition(' ')
+            if name == self.database:
+                description = text.strip().strip('"')
+        strategies = [line.split(' ', 1)[0] for line in await self.conn.show_strat()]
+        self.has_regex = 're' in strategies
+
+        run = int(self.get_meta('run', '0'))
+        if self.get_meta('complete', '1') == '1':
+            # the previous run finished, this one is a resync
+            run += 1
+            self.set_meta('run', str(run))
+            self.set_meta('complete', '0')
+        else:
+            logging.info('Mirror: resuming run %d', run)
+        if self.get_meta('digest') not in (None, digest):
+            logging.info('Mirror: SHOW INFO of %s changed, fetching all definitions again', self.database)
+            self._db.execute('DELETE FROM entries')
+        self.set_meta('digest', digest)
+        self.set_meta('info', info)
+        self.set_meta('description', description)
+        self._db.commit()
+        self.run_id = run
+
+    async def list_headwords(self):
+        queue = collections.deque(self.alphabet)
+        if self.has_regex:
+            queue.append(REST)
+        running = set()
+        try:
+            while queue or running:
+                while queue and len(running) < self.workers:
+                    running.add(asyncio.ensure_future(self.list_prefix(queue.popleft())))
+                done, running = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    queue.extend(task.result())
+        finally:
+            for task in running:
+                task.cancel()
+
+    async def list_prefix(self, prefix):
+        # returns the prefixes to be listed next
+        row = self._db.execute('SELECT count, split, run FROM prefixes WHERE prefix = ?', (prefix,)).fetchone()
+        if row is not None and row[2] == self.run_id:
+            # listed before the crawl was stopped
+            return self.children(prefix) if row[1] else []
+        if prefix == REST:
+            matches = await self.conn.match(self.database, 're', REST_PATTERN)
+        else:
+            matches = await self.conn.match(self.database, 'prefix', prefix)
+        self.listed += 1
+        count = len(matches)
+        if row is not None and row[0] == count:
+            # unchanged range, neither the prefix nor its subtree is fetched again
+            self._db.execute('UPDATE prefixes SET run = ? WHERE prefix = ? OR substr(prefix, 1, ?) = ?',
+                             (self.run_id, prefix, len(prefix), prefix))
+            self._db.commit()
+            return []
+
+        split = count >= self.split_threshold and len(prefix) < self.max_depth and prefix != REST
+        children = self.children(prefix) if split else []
+        keys = {}
+        for match in matches:
+            key = sort_key(match.word)
+            if not any(key.startswith(child) for child in children):
+                keys.setdefault(key, match.word)
+
+        # the old listing of the range and everything below it is replaced
+        self._drop(prefix, subtree=not split)
+        self._db.executemany('INSERT OR REPLACE INTO keys (key, prefix, word) VALUES (?, ?, ?)',
+                             [(key, prefix, word) for key, word in keys.items()])
+        self._db.execute('INSERT OR REPLACE INTO prefixes (prefix, count, split, run) VALUES (?, ?, ?, ?)',
+                         (prefix, count, int(split), self.run_id))
+        self._db.commit()
+        logging.debug('Mirror: prefix %s, %d headwords', prefix, count)
+        return children
+
+    def children(self, prefix):
+        return [prefix + char for char in self.alphabet]
+
+    def _drop(self, prefix, subtree):
+        if subtree and prefix != REST:
+            where, args = 'prefix = ? OR substr(prefix, 1, ?) = ?', (prefix, len(prefix), prefix)
+        else:
+            where, args = 'prefix = ?', (prefix,)
+        self._db.execute('DELETE FROM entries WHERE key IN (SELECT key FROM keys WHERE {})'.format(where), args)
+        self._db.execute('DELETE FROM keys WHERE {}'.format(where), args)
+        if subtree:
+            self._db.execute('DELETE FROM prefixes WHERE {}'.format(where), args)
+
+    async def fetch_definitions(self):
+        rows = self._db.execute('SELECT key, word FROM keys WHERE key NOT IN (SELECT key FROM entries) '
+                                'ORDER BY key').fetchall()
+        logging.info('Mirror: %d headwords to fetch', len(rows))
+        batches = collections.deque(rows[pos:pos + self.batch] for pos in range(0, len(rows), self.batch))
+        await asyncio.gather(*[self._fetch_worker(batches) for _ in range(self.workers)])
+
+    async def _fetch_worker(self, batches):
+        while batches:
+            rows = batches.popleft()
+            results = await self.conn.define_many(self.database, [word for _, word in rows],
+                                                  return_exceptions=True)
+            entries = []
+            for (key, word), result in zip(rows, results):
+                if isinstance(result, DictError):
+                    # left out, so a later run asks for it again
+                    logging.debug('Mirror: cannot fetch %s: %s', word, result)
+                    self.failed += 1
+                    continue
+                data = [[definition.word, definition.raw.decode('latin1')] for definition in result]
+                entries.append((key, json.dumps(data)))
+            self._db.executemany('INSERT OR REPLACE INTO entries (key, data) VALUES (?, ?)', entries)
+            self._db.commit()
+            self.fetched += len(entries)
+
+    def build(self):
+        # Writes NAME.index and NAME.dict next to each other; both are
+        # written aside and renamed so LocalDict never sees half a file.
+        data = []
+        index = []
+        size = 0
+
+        def add(headword, raw):
+            nonlocal size
+            data.append(raw)
+            index.append((sort_key(headword), headword, size, len(raw)))
+            size += len(raw)
+
+        add('00-database-short', '00-database-short\n{}\n'.format(self.get_meta('description')).encode('utf8'))
+        add('00-database-info', '00-database-info\n{}\n'.format(self.get_meta('info')).encode('utf8'))
+        for (text,) in self._db.execute('SELECT data FROM entries ORDER BY key'):
+            for headword, raw in json.loads(text):
+                add(headword, raw.encode('latin1'))
+        index.sort()
+
+        base = os.path.join(self.directory, self.name)
+        with open(base + '.dict.tmp', 'wb') as f:
+            f.writelines(data)
+        with open(base + '.index.tmp', 'w') as f:
+            for _, headword, offset, length in index:
+                f.write('{}\t{}\t{}\n'.format(headword, b64_encode(offset), b64_encode(length)))
+        os.replace(base + '.dict.tmp', base + '.dict')
+        os.replace(base + '.index.tmp', base + '.index')
+        logging.info('Mirror: %s written, %d definitions', base, len(index) - 2)
+
+    def get_meta(self, name, default=None):
+        row = self._db.execute('SELECT value FROM meta WHERE name = ?', (name,)).fetchone()
+        return default if row is None else row[0]
+
+    def set_meta(self, name, value):
+        self._db.execute('INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)', (name, value))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Mirror a database of a DICT server into dictd files')
+    parser.add_argument('database')
+    parser.add_argument('directory', help='directory for the dictd files and the checkpoint')
+    parser.add_argument('-c', '--host')
+    parser.add_argument('-p', '--port', type=int)
+    parser.add_argument('-w', '--workers', type=int, default=4, help='concurrent connections')
+    parser.add_argument('-b', '--batch', type=int, default=20, help='words pipelined in a single request')
+    parser.add_argument('--split-threshold', type=int, default=1000)
+    parser.add_argument('--alphabet', default=ALPHABET)
+    parser.add_argument('--debug', action='store_true')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    logging.basicConfig(level=logging.DEBUG if args.debug else logging.INFO)
+
+    async def run():
+        conn = DictPool(min_size=1, max_size=args.workers)
+        await conn.connect(args.host, args.port)
+        await conn.client('wordbook/mirror')
+        mirror = Mirror(conn, args.database, args.directory, alphabet=args.alphabet,
+                        split_threshold=args.split_threshold, batch=args.batch, workers=args.workers)
+        try:
+            await mirror.run()
+        finally:
+            mirror.close()
+            await conn.quit()
+        logging.info('Mirror: %d prefixes listed, %d headwords fetched, %d failed',
+                     mirror.listed, mirror.fetched, mirror.failed)
+
+    loop = asyncio.get_event_loop()
+    loop.run_until_complete(run())
+    loop.close()
+
+
+if __name__ == "__main__":
+    main()
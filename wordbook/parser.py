@@ -0,0 +1,160 @@
+import re
+
+from wordbook.exceptions import ParseError
+
+
+# status codes followed by a text block terminated with a single "."
+TEXT_CODES = frozenset((110, 111, 112, 113, 114, 151, 152))
+
+DEFINITIONS_RETRIEVED = 150
+WORD_DATABASE = 151
+
+_TEXT_END = re.compile(rb'\n\.\r?\n')
+
+
+class Status:
+
+    __slots__ = ('code', 'text')
+
+    def __init__(self, code, text):
+        self.code = code
+        self.text = text
+
+    def __eq__(self, other):
+        return type(self) is type(other) and (self.code, self.text) == (other.code, other.text)
+
+    def __repr__(self):
+        return '{}({!r}, {!r})'.format(type(self).__name__, self.code, self.text)
+
+
+class Header(Status):
+
+    __slots__ = ()
+
+
+class End(Status):
+
+    __slots__ = ()
+
+
+class Text:
+
+    __slots__ = ('data', 'last')
+
+    def __init__(self, data, last):
+        self.data = data
+        self.last = last
+
+    @property
+    def lines(self):
+        return [line.rstrip() for line in self.data.decode('utf8').split('\n')[:-1]]
+
+    def __eq__(self, other):
+        return type(self) is type(other) and (self.data, self.last) == (other.data, other.last)
+
+    def __repr__(self):
+        return 'Text({!r}, {!r})'.format(self.data, self.last)
+
+
+class ResponseParser:
+
+    # Incremental, IO-free parser of DICT server replies. Raw bytes go in via
+    # feed(), parsed events come out:
+    #
+    #   Status  first status line of a reply; the reply is complete here
+    #           unless the code is a preliminary 1yz one
+    #   Header  a 151 line opening a single definition
+    #   Text    complete lines of a text block as dot-unstuffed bytes, decoded
+    #           on demand; last is set on the chunk ending with the
+    #           terminating "." line
+    #   End     status line completing a preliminary reply
+
+    STATUS = 0
+    TEXT = 1
+    DEFINITION = 2
+    END = 3
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._state = self.STATUS
+        self._after_text = self.END
+
+    def feed(self, data):
+        self._buffer += data
+        events = []
+        pos = 0
+        buffer = self._buffer
+        while True:
+            if self._state == self.TEXT:
+                pos = self._parse_text(buffer, pos, events)
+                if self._state == self.TEXT:
+                    break
+                continue
+
+            end = buffer.find(b'\n', pos)
+            if end < 0:
+                break
+            code, text = self._parse_status(buffer[pos:end])
+            pos = end + 1
+
+            if self._state == self.STATUS:
+                events.append(Status(code, text))
+                if code < 200:
+                    if code in TEXT_CODES:
+                        self._state = self.TEXT
+                        self._after_text = self.END
+                    elif code == DEFINITIONS_RETRIEVED:
+                        self._state = self.DEFINITION
+                    else:
+                        self._state = self.END
+            elif self._state == self.DEFINITION and code == WORD_DATABASE:
+                events.append(Header(code, text))
+                self._state = self.TEXT
+                self._after_text = self.DEFINITION
+            else:
+                events.append(End(code, text))
+                self._state = self.STATUS
+
+        del buffer[:pos]
+        return events
+
+    @property
+    def idle(self):
+        return self._state == self.STATUS and not self._buffer
+
+    def _parse_text(self, buffer, pos, events):
+        if buffer.startswith(b'.\n', pos) or buffer.startswith(b'.\r\n', pos):
+            events.append(Text(b'', True))
+            self._state = self._after_text
+            return buffer.index(b'\n', pos) + 1
+
+        found = _TEXT_END.search(buffer, pos)
+        if found is not None:
+            events.append(Text(self._unstuff(buffer[pos:found.start() + 1]), True))
+            self._state = self._after_text
+            return found.end()
+
+        # no terminator yet, pass on the complete lines received so far
+        end = buffer.rfind(b'\n', pos) + 1
+        if end > pos:
+            events.append(Text(self._unstuff(buffer[pos:end]), False))
+            return end
+        return pos
+
+    @staticmethod
+    def _unstuff(data):
+        data = bytes(data)
+        if data.startswith(b'..'):
+            data = data[1:]
+        return data.replace(b'\n..', b'\n.')
+
+    @staticmethod
+    def _parse_status(line):
+        try:
+            line = line.decode('utf8').rstrip()
+            code = int(line[:3])
+        except ValueError:
+            raise ParseError(599, 'Invalid status line: {!r}'.format(line))
+        if len(line) > 3 and line[3] != ' ':
+            raise ParseError(599, 'Invalid status line: {!r}'.format(line))
+        return code, line[4:]
@@ -0,0 +1,294 @@
+import asyncio
+import collections
+import logging
+
+from wordbook.dictbase import DictBase
+from wordbook.exceptions import DictError, DictConnectionError
+
+
+class DictPool:
+
+    # commands which are safe to send twice when hedging
+    HEDGED = frozenset(('show_db', 'show_info', 'show_strat', 'show_server', 'status',
+                        'define', 'match', 'define_many', 'match_many'))
+
+    def __init__(self, min_size=1, max_size=10, idle_timeout=60.0, health_check_interval=30.0,
+                 factory=DictBase, hedging=None):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError('Invalid pool size: min_size={} max_size={}'.format(min_size, max_size))
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.health_check_interval = health_check_interval
+        self.factory = factory
+        self.hedging = hedging
+        self.connected = False
+        self.host = None
+        self.port = None
+        self.banner = None
+        self.capabilities = None
+        self.client_text = None
+        self.size = 0
+        self._endpoint = None
+        self._evictor = None
+        self._idle = collections.deque()
+        self._slots = asyncio.Semaphore(max_size)
+
+    @property
+    def endpoint(self):
+        # that of the connections, which all go to the same server
+        if self._endpoint is None:
+            conn = self.factory()
+            conn.host = self.host
+            conn.port = self.port
+            self._endpoint = conn.endpoint
+        return self._endpoint
+
+    async def connect(self, host=None, port=None):
+        self.host = host
+        self.port = port
+        self._endpoint = None
+        conns = []
+        for _ in range(self.min_size):
+            conns.append(await self._open())
+        for conn in conns:
+            self._idle.append((conn, self._now()))
+        self.connected = True
+        if self._evictor is None:
+            self._evictor = asyncio.ensure_future(self._evict_periodically())
+
+    async def client(self, text):
+        self.client_text = text
+        for conn, _ in list(self._idle):
+            await conn.client(text)
+
+    async def quit(self):
+        if self._evictor is not None:
+            self._evictor.cancel()
+            self._evictor = None
+        while self._idle:
+            conn, _ = self._idle.popleft()
+            await self._close(conn)
+        self.connected = False
+
+    async def acquire(self):
+        await self._slots.acquire()
+        try:
+            self._evict_idle()
+            while self._idle:
+                conn, released = self._idle.pop()
+                if self._now() - released < self.health_check_interval or await self._is_alive(conn):
+                    return conn
+                self._drop(conn)
+            return await self._open()
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def idle(self):
+        # whether a command would get a connection without waiting
+        return bool(self._idle)
+
+    def release(self, conn, discard=False):
+        if discard or not conn.connected:
+            self._drop(conn)
+        else:
+            self._idle.append((conn, self._now()))
+        self._slots.release()
+
+    async def show_db(self, timeout=None):
+        return await self._call('show_db', timeout=timeout)
+
+    async def show_info(self, database, timeout=None):
+        return await self._call('show_info', database, timeout=timeout)
+
+    async def show_strat(self, timeout=None):
+        return await self._call('show_strat', timeout=timeout)
+
+    async def show_server(self, timeout=None):
+        return await self._call('show_server', timeout=timeout)
+
+    async def status(self, timeout=None):
+        return await self._call('status', timeout=timeout)
+
+    async def help(self, timeout=None):
+        return await self._call('help', timeout=timeout)
+
+    async def define(self, database, word, timeout=None):
+        return await self._call('define', database, word, timeout=timeout)
+
+    async def match(self, database, strategy, word, timeout=None):
+        return await self._call('match', database, strategy, word, timeout=timeout)
+
+    async def define_many(self, database, words, return_exceptions=False, timeout=None):
+        return await self._call('define_many', database, words, return_exceptions, timeout=timeout)
+
+    async def match_many(self, database, strategy, words, return_exceptions=False, timeout=None):
+        return await self._call('match_many', database, strategy, words, return_exceptions, timeout=timeout)
+
+    def iter_define(self, database, word):
+        return PooledStream(self, 'iter_define', database, word)
+
+    def iter_match(self, database, strategy, word):
+        return PooledStream(self, 'iter_match', database, strategy, word)
+
+    async def _call(self, method, *args, timeout=None):
+        kwargs = {} if timeout is None else {'timeout': timeout}
+        if self.hedging is None or method not in self.HEDGED:
+            return await self._call_once(method, args, kwargs)
+        return await self._call_hedged(method, args, kwargs)
+
+    async def _call_once(self, method, args, kwargs):
+        conn = await self.acquire()
+        try:
+            ret = await getattr(conn, method)(*args, **kwargs)
+        except DictError:
+            self.release(conn)
+            raise
+        except BaseException:
+            # the connection state is unknown after a transport error
+            self.release(conn, discard=True)
+            raise
+        self.release(conn)
+        return ret
+
+    async def _call_hedged(self, method, args, kwargs):
+        # When the reply is late, the same command goes out on a second
+        # connection. The first usable reply wins; the other call is
+        # cancelled, which discards its connection.
+        start = self._now()
+        tasks = [asyncio.ensure_future(self._call_once(method, args, kwargs))]
+        try:
+            done, pending = await asyncio.wait(tasks, timeout=self.hedging.delay())
+            if not done:
+                self.hedging.hedged += 1
+                tasks.append(asyncio.ensure_future(self._call_once(method, args, kwargs)))
+                pending = tasks
+            while True:
+                if pending:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in sorted(done, key=lambda task: task.exception() is not None):
+                    exc = task.exception()
+                    # transport errors are worth waiting for the other call
+                    if exc is None or not pending or not isinstance(exc, DictConnectionError):
+                        if task is not tasks[0]:
+                            self.hedging.hedge_wins += 1
+                        if exc is None:
+                            self.hedging.record(self._now() - start)
+                        return task.result()
+        finally:
+            losers = [task for task in tasks if not task.done()]
+            for task in losers:
+                task.cancel()
+            if losers:
+                # let the cancelled calls give their connections back
+                await asyncio.wait(losers)
+            for task in tasks:
+                if not task.cancelled():
+                    task.exception()
+
+    async def _open(self):
+        self.size += 1
+        try:
+            conn = self.factory()
+            await conn.connect(self.host, self.port)
+            if self.client_text is not None:
+                await conn.client(self.client_text)
+        except BaseException:
+            self.size -= 1
+            raise
+        self.banner = conn.banner
+        self.capabilities = conn.capabilities
+        logging.debug('Pool open connection: %s/%s', self.size, self.max_size)
+        return conn
+
+    async def _close(self, conn):
+        self.size -= 1
+        try:
+            await conn.quit()
+        except Exception as exc:
+            logging.debug('Pool close connection failed: %s', exc)
+
+    def _drop(self, conn):
+        self.size -= 1
+        writer = getattr(conn, 'writer', None)
+        if writer is not None:
+            writer.close()
+        conn.connected = False
+
+    async def _is_alive(self, conn):
+        try:
+            await conn.status()
+        except Exception as exc:
+            logging.debug('Pool health check failed: %s', exc)
+            return False
+        return True
+
+    def _evict_idle(self):
+        # the connections are dropped without QUIT, nobody waits for them
+        deadline = self._now() - self.idle_timeout
+        while self._idle and self.size > self.min_size and self._idle[0][1] < deadline:
+            conn, _ = self._idle.popleft()
+            logging.debug('Pool evict idle connection')
+            self._drop(conn)
+
+    async def _evict_periodically(self):
+        # a quiet pool closes its idle connections too
+        while True:
+            await asyncio.sleep(self.idle_timeout / 2)
+            self._evict_idle()
+
+    @staticmethod
+    def _now():
+        return asyncio.get_event_loop().time()
+
+
+class PooledStream:
+
+    # Holds a pooled connection for the lifetime of a DictBase response stream.
+
+    def __init__(self, pool, method, *args):
+        self.pool = pool
+        self.method = method
+        self.args = args
+        self._conn = None
+        self._stream = None
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._stream is None:
+            if self._conn is not None:
+                raise StopAsyncIteration
+            self._conn = await self.pool.acquire()
+            self._stream = getattr(self._conn, self.method)(*self.args)
+        try:
+            return await self._stream.__anext__()
+        except (StopAsyncIteration, DictError):
+            self._release()
+            raise
+        except BaseException:
+            self._release(discard=True)
+            raise
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
+
+    async def aclose(self):
+        if self._stream is None:
+            return
+        try:
+            await self._stream.aclose()
+        except BaseException:
+            self._release(discard=True)
+            raise
+        self._release()
+
+    def _release(self, discard=False):
+        if self._stream is not None:
+            self._stream = None
+            self.pool.release(self._conn, discard)
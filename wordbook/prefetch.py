@@ -0,0 +1,128 @@
+import asyncio
+import collections
+import logging
+
+from wordbook.exceptions import DictError
+
+
+def references(definitions, limit=None):
+    # the {braced} cross-references of the definitions, in order and without
+    # repeats; a reference may be broken over lines
+    ret = []
+    seen = set()
+    for definition in definitions:
+        raw = definition.raw
+        pos = raw.find(b'{')
+        while pos >= 0:
+            end = raw.find(b'}', pos + 1)
+            if end < 0:
+                break
+            # an unclosed brace before the reference is ignored
+            start = raw.rfind(b'{', pos, end)
+            word = b' '.join(raw[start + 1:end].split()).decode('utf8', 'replace')
+            if word and word.lower() not in seen:
+                seen.add(word.lower())
+                ret.append(word)
+                if limit is not None and len(ret) >= limit:
+                    return ret
+            pos = raw.find(b'{', end + 1)
+    return ret
+
+
+class Prefetcher:
+
+    # Fetches the cross-references of defined words into the result cache
+    # of the WordBook, so following one of them is a cache hit. A single
+    # background task works through the queue, batch words at a time
+    # pipelined together, and sleeps after each batch for as long as its
+    # bytes take at max_bytes_per_second, leaving the connection to the
+    # commands of the application. A batch is only sent when the connection
+    # has no command waiting for a reply, or a pool has an idle connection;
+    # until then the connection is checked every idle_interval seconds.
+    # References of prefetched definitions are followed up to max_depth, at
+    # most max_fanout per definition list.
+
+    def __init__(self, max_depth=1, max_fanout=10, max_bytes_per_second=64 * 1024, batch=5, max_queue=1000,
+                 idle_interval=0.01):
+        self.max_depth = max_depth
+        self.max_fanout = max_fanout
+        self.max_bytes_per_second = max_bytes_per_second
+        self.batch = batch
+        self.max_queue = max_queue
+        self.idle_interval = idle_interval
+        self.scheduled = 0
+        self.fetched = 0
+        self.failed = 0
+        self.dropped = 0
+        self.bytes = 0
+        self._queue = collections.deque()
+        self._queued = set()
+        self._task = None
+
+    def schedule(self, wordbook, database, definitions, depth=0):
+        # queues the references of definitions returned for the database
+        if wordbook.cache is None or depth >= self.max_depth:
+            return
+        for word in references(definitions, self.max_fanout):
+            key = wordbook.cache.make_key(database, None, word)
+            if key in self._queued or key in wordbook.cache:
+                continue
+            if len(self._queue) >= self.max_queue:
+                self.dropped += 1
+                continue
+            self._queue.append((wordbook, database, word, depth + 1))
+            self._queued.add(key)
+            self.scheduled += 1
+        if self._queue and self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def _run(self):
+        try:
+            while self._queue:
+                while not self._idle(self._queue[0][0].conn):
+                    await asyncio.sleep(self.idle_interval)
+                items = [self._queue.popleft() for _ in range(min(self.batch, len(self._queue)))]
+                results = await asyncio.gather(*[self._fetch(*item) for item in items])
+                size = sum(results)
+                self.bytes += size
+                if self.max_bytes_per_second:
+                    await asyncio.sleep(size / self.max_bytes_per_second)
+        finally:
+            self._task = None
+
+    @staticmethod
+    def _idle(conn):
+        # backends without a connection to share, like LocalDict, are always idle
+        idle = getattr(conn, 'idle', None)
+        return idle is None or idle()
+
+    async def _fetch(self, wordbook, database, word, depth):
+        # returns the number of bytes fetched
+        try:
+            # through lookup, so a define of the same word shares the call
+            ret = await wordbook.lookup(database, None, word, wordbook.conn.define, database, word)
+        except DictError as exc:
+            logging.debug('Prefetch of %s failed: %s', word, exc)
+            self.failed += 1
+            return 0
+        finally:
+            self._queued.discard(wordbook.cache.make_key(database, None, word))
+        self.fetched += 1
+        self.schedule(wordbook, database, ret, depth)
+        return sum(len(definition.raw) for definition in ret)
+
+    async def join(self):
+        # waits until the queue is empty
+        while self._task is not None:
+            await asyncio.shield(self._task)
+
+    async def close(self):
+        self._queue.clear()
+        self._queued.clear()
+        task = self._task
+        if task is not None:
+            task.cancel()
+            await asyncio.wait([task])
+
+    def __len__(self):
+        return len(self._queue)
@@ -0,0 +1,24 @@
+import random
+
+
+class ReconnectPolicy:
+
+    # How a dropped connection is opened again: the first attempt is made at
+    # once, before each next one a random time between zero and
+    # min(max_delay, base_delay * factor ** attempt) is waited ("full jitter"),
+    # so clients dropped together by a restarting server do not all come back
+    # at the same moment.
+
+    def __init__(self, max_attempts=5, base_delay=0.1, max_delay=10.0, factor=2.0, random=random.random):
+        if max_attempts < 1:
+            raise ValueError('Invalid max_attempts: {}'.format(max_attempts))
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.factor = factor
+        self.random = random
+
+    def delay(self, attempt):
+        if attempt == 0:
+            return 0.0
+        return self.random() * min(self.max_delay, self.base_delay * self.factor ** (attempt - 1))
@@ -0,0 +1,99 @@
+import re
+
+
+_HEADER = re.compile(r'\s*("[^"]*"|\S+)\s+(\S+)\s*(.*?)\s*$')
+
+
+def _unquote(text):
+    if text.startswith('"'):
+        text = text[1:]
+    if text.endswith('"'):
+        text = text[:-1]
+    return text
+
+
+class Definition:
+
+    # A single definition from a 150 reply. The 151 header and the raw,
+    # dot-unstuffed text are kept as received and split or decoded only
+    # when a field is accessed.
+
+    __slots__ = ('header', 'raw', '_fields')
+
+    def __init__(self, header, raw):
+        self.header = header
+        self.raw = raw
+        self._fields = None
+
+    @property
+    def word(self):
+        return self._parse()[0]
+
+    @property
+    def database(self):
+        return self._parse()[1]
+
+    @property
+    def description(self):
+        return self._parse()[2]
+
+    @property
+    def text(self):
+        return '\n'.join(self.lines)
+
+    @property
+    def lines(self):
+        return [line.rstrip() for line in self.raw.decode('utf8').split('\n')[:-1]]
+
+    def _parse(self):
+        if self._fields is None:
+            fields = _HEADER.match(self.header)
+            if fields is None:
+                self._fields = (self.header, '', '')
+            else:
+                word, database, description = fields.groups()
+                self._fields = (_unquote(word), database, _unquote(description))
+        return self._fields
+
+    def __eq__(self, other):
+        return type(self) is type(other) and (self.header, self.raw) == (other.header, other.raw)
+
+    def __hash__(self):
+        return hash((self.header, self.raw))
+
+    def __repr__(self):
+        return 'Definition({!r}, {!r})'.format(self.header, self.raw)
+
+
+class Match:
+
+    # A single 'database "word"' line from a 152 reply, decoded on access.
+
+    __slots__ = ('raw',)
+
+    def __init__(self, raw):
+        self.raw = raw
+
+    @property
+    def database(self):
+        return self.raw.split(None, 1)[0].decode('utf8')
+
+    @property
+    def word(self):
+        parts = self.raw.split(None, 1)
+        if len(parts) < 2:
+            return ''
+        return _unquote(parts[1].rstrip().decode('utf8'))
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.raw.rstrip() == other.raw.rstrip()
+
+    def __hash__(self):
+        return hash(self.raw.rstrip())
+
+    def __repr__(self):
+        return 'Match({!r}, {!r})'.format(self.database, self.word)
+
+
+def split_matches(data):
+    return [Match(line) for line in data.split(b'\n')[:-1]]
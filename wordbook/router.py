@@ -0,0 +1,167 @@
+import asyncio
+import collections
+import logging
+
+from wordbook.dictbase import DictBase, ResponseCodes
+from wordbook.exceptions import InvalidDatabase
+from wordbook.local import ListStream
+
+
+class DictRouter:
+
+    # Spreads commands over several DICT servers. After connecting, SHOW DB of
+    # every server builds a database -> server map; commands for a single
+    # database go to its server only, "*" and "!" are sent to all servers at
+    # once and their results merged in the order of the merged database list.
+    # A database served by several servers is routed to the first of them.
+
+    def __init__(self, servers, factory=DictBase):
+        self.servers = list(servers)
+        self.factory = factory
+        self.conns = []
+        self.routes = collections.OrderedDict()
+        self._order = {}
+        self.connected = False
+        self.banner = None
+        self.capabilities = None
+        self.msg_id = None
+
+    @property
+    def endpoint(self):
+        return 'router:' + ','.join(conn.endpoint for conn in self.conns)
+
+    async def connect(self, host=None, port=None):
+        self.conns = [self.factory() for _ in self.servers]
+        await asyncio.gather(*[conn.connect(*server) for conn, server in zip(self.conns, self.servers)])
+        if self.conns:
+            self.banner = self.conns[0].banner
+            self.capabilities = self.conns[0].capabilities
+        await self.refresh()
+        self.connected = True
+
+    async def refresh(self):
+        dbs = await asyncio.gather(*[conn.show_db() for conn in self.conns])
+        routes = collections.OrderedDict()
+        for conn, lines in zip(self.conns, dbs):
+            for line in lines:
+                name = line.split(' ', 1)[0]
+                if name in routes:
+                    logging.debug('Database %s is served by several servers, using the first one', name)
+                    continue
+                routes[name] = (conn, line)
+        self.routes = routes
+        self._order = {name: pos for pos, name in enumerate(routes)}
+
+    async def client(self, text):
+        await asyncio.gather(*[conn.client(text) for conn in self.conns])
+
+    async def quit(self):
+        await asyncio.gather(*[conn.quit() for conn in self.conns])
+        self.connected = False
+
+    async def show_db(self):
+        return [line for _, line in self.routes.values()]
+
+    async def show_strat(self):
+        strats = await asyncio.gather(*[conn.show_strat() for conn in self.conns])
+        ret = collections.OrderedDict()
+        for lines in strats:
+            for line in lines:
+                ret.setdefault(line.split(' ', 1)[0], line)
+        return list(ret.values())
+
+    async def show_info(self, database):
+        return await self._route(database).show_info(database)
+
+    async def show_server(self):
+        ret = []
+        for lines in await asyncio.gather(*[conn.show_server() for conn in self.conns]):
+            ret.extend(lines)
+        return ret
+
+    async def status(self):
+        return '; '.join(await asyncio.gather(*[conn.status() for conn in self.conns]))
+
+    async def define(self, database, word):
+        if database not in ('*', '!'):
+            return await self._route(database).define(database, word)
+        results = await self._gather([conn.define('*', word) for conn in self.conns])
+        return self._merge(database, results)
+
+    async def match(self, database, strategy, word):
+        if database not in ('*', '!'):
+            return await self._route(database).match(database, strategy, word)
+        results = await self._gather([conn.match('*', strategy, word) for conn in self.conns])
+        return self._merge(database, results)
+
+    async def define_many(self, database, words, return_exceptions=False):
+        if database not in ('*', '!'):
+            return await self._route(database).define_many(database, words, return_exceptions)
+        results = await self._gather([conn.define_many('*', words, return_exceptions) for conn in self.conns])
+        return self._merge_many(database, words, results, return_exceptions)
+
+    async def match_many(self, database, strategy, words, return_exceptions=False):
+        if database not in ('*', '!'):
+            return await self._route(database).match_many(database, strategy, words, return_exceptions)
+        results = await self._gather([conn.match_many('*', strategy, words, return_exceptions)
+                                      for conn in self.conns])
+        return self._merge_many(database, words, results, return_exceptions)
+
+    def iter_define(self, database, word):
+        if database not in ('*', '!'):
+            return self._route(database).iter_define(database, word)
+        return ListStream(self.define(database, word))
+
+    def iter_match(self, database, strategy, word):
+        if database not in ('*', '!'):
+            return self._route(database).iter_match(database, strategy, word)
+        return ListStream(self.match(database, strategy, word))
+
+    def _route(self, database):
+        try:
+            return self.routes[database][0]
+        except KeyError:
+            raise InvalidDatabase(ResponseCodes.INVALID_DATABASE, 'Invalid database: {}'.format(database))
+
+    @staticmethod
+    async def _gather(calls):
+        # the results of all servers, with the exceptions of those which
+        # failed; raises only when every server failed
+        results = await asyncio.gather(*calls, return_exceptions=True)
+        errors = [result for result in results if isinstance(result, Exception)]
+        if errors and len(errors) == len(results):
+            raise errors[0]
+        for error in errors:
+            logging.debug('Router: a server failed: %r', error)
+        return results
+
+    def _merge(self, database, results):
+        # "!" is sent as "*" too, as only the merged order tells which
+        # database is the first one with a result
+        ret = []
+        for conn, result in zip(self.conns, results):
+            if isinstance(result, Exception):
+                continue
+            # skip databases shadowed by a server earlier on the list
+            ret.extend(item for item in result if self.routes.get(item.database, (conn,))[0] is conn)
+        last = len(self._order)
+        ret.sort(key=lambda item: self._order.get(item.database, last))
+        if database == '!' and ret:
+            # only the first database with a result counts
+            first = ret[0].database
+            ret = [item for item in ret if item.database == first]
+        return ret
+
+    def _merge_many(self, database, words, results, return_exceptions):
+        # a server which failed as a whole failed for every word
+        results = [[result] * len(words) if isinstance(result, Exception) else result for result in results]
+        ret = []
+        for per_word in zip(*results):
+            errors = [result for result in per_word if isinstance(result, Exception)]
+            if errors and len(errors) == len(per_word):
+                if not return_exceptions:
+                    raise errors[0]
+                ret.append(errors[0])
+            else:
+                ret.append(self._merge(database, per_word))
+        return ret
@@ -0,0 +1,229 @@
+import argparse
+import asyncio
+import inspect
+import logging
+import os
+import random
+import re
+
+from wordbook.dictbase import ResponseCodes
+from wordbook.exceptions import InvalidDatabase, InvalidStrategy
+from wordbook.local import LocalDict
+
+
+_TOKENS = re.compile(r'"([^"]*)"|\'([^\']*)\'|(\S+)')
+
+
+def split_command(line):
+    ret = []
+    for quoted, single_quoted, word in _TOKENS.findall(line):
+        ret.append(quoted or single_quoted or word)
+    return ret
+
+
+def stuff(raw):
+    # CRLF line endings and doubled leading dots, as required on the wire
+    raw = raw.replace(b'\r\n', b'\n')
+    if raw.startswith(b'.'):
+        raw = b'.' + raw
+    return raw.replace(b'\n.', b'\n..').replace(b'\n', b'\r\n')
+
+
+def status_line(code, text):
+    return '{} {}\r\n'.format(int(code), text).encode('utf8')
+
+
+def text_reply(code, text, lines):
+    body = '\n'.join(lines).encode('utf8') + b'\n' if lines else b''
+    return status_line(code, text) + stuff(body) + b'.\r\n' + status_line(ResponseCodes.OK, 'ok')
+
+
+class DictServer:
+
+    # A small DICT server on top of any DictBase-compatible backend (LocalDict,
+    # MemoryDict, ...), meant for benchmarks and integration tests. Commands
+    # are answered in order, so clients may pipeline them. Faults can be
+    # injected: a fixed latency before every reply, "420" replies and dropped
+    # connections, each with a given probability.
+
+    def __init__(self, backend, host='127.0.0.1', port=0, latency=0.0, busy_rate=0.0, drop_rate=0.0,
+                 seed=None):
+        self.backend = backend
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.busy_rate = busy_rate
+        self.drop_rate = drop_rate
+        self.random = random.Random(seed)
+        self.server = None
+        self.connections = 0
+        self.commands = 0
+        self._msg_id = 0
+
+    async def start(self):
+        if not self.backend.connected:
+            await self.backend.connect()
+        self.server = await asyncio.start_server(self.handle, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        logging.debug('Server listening: %s %s', self.host, self.port)
+
+    async def close(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+        self._msg_id += 1
+        writer.write('220 wordbook-server <mime> <{}.{}@wordbook>\r\n'.format(os.getpid(), self._msg_id).encode())
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                self.commands += 1
+                if self.latency:
+                    await asyncio.sleep(self.latency)
+                if self.drop_rate and self.random.random() < self.drop_rate:
+                    logging.debug('Server drop connection')
+                    break
+                if self.busy_rate and self.random.random() < self.busy_rate:
+                    writer.write(b'420 Server temporarily unavailable\r\n')
+                    continue
+                command = split_command(line.decode('utf8'))
+                writer.write(await self.execute(command))
+                if command and command[0].upper() == 'QUIT':
+                    break
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def execute(self, command):
+        if not command:
+            return status_line(ResponseCodes.SYNTAX_ERROR_COMMAND, 'unknown command')
+        name, args = command[0].upper(), command[1:]
+        if name in ('SHOW', 'OPTION') and args:
+            name, args = '{} {}'.format(name, args[0].upper()), args[1:]
+        handler = self.HANDLERS.get(name)
+        if handler is None:
+            return status_line(ResponseCodes.SYNTAX_ERROR_COMMAND, 'unknown command')
+        try:
+            inspect.signature(handler).bind(self, *args)
+        except TypeError:
+            return status_line(ResponseCodes.SYNTAX_ERROR_PARAMETERS, 'syntax error, illegal parameters')
+        try:
+            return await handler(self, *args)
+        except InvalidDatabase:
+            return status_line(ResponseCodes.INVALID_DATABASE, 'invalid database, use "SHOW DB" for list of databases')
+        except InvalidStrategy:
+            return status_line(ResponseCodes.INVALID_STRATEGY, 'invalid strategy, use "SHOW STRAT" for a list of strategies')
+
+    async def do_client(self, *text):
+        return status_line(ResponseCodes.OK, 'ok')
+
+    async def do_status(self):
+        return status_line(ResponseCodes.STATUS_INFO, 'status [d/m/c = 0/0/{}]'.format(self.commands))
+
+    async def do_show_db(self):
+        dbs = await self.backend.show_db()
+        if not dbs:
+            return status_line(ResponseCodes.NO_DATABASES_PRESENT, 'no databases present')
+        return text_reply(ResponseCodes.DATABASES_PRESENT, '{} databases present'.format(len(dbs)), dbs)
+
+    async def do_show_strat(self):
+        strats = await self.backend.show_strat()
+        if not strats:
+            return status_line(ResponseCodes.NO_STRATEGIES_AVAILABLE, 'no strategies available')
+        return text_reply(ResponseCodes.STRATEGIES_AVAILABLE, '{} strategies available'.format(len(strats)), strats)
+
+    async def do_show_info(self, database):
+        info = await self.backend.show_info(database)
+        return text_reply(ResponseCodes.DATABASE_INFORMATION, 'information for {}'.format(database), info)
+
+    async def do_show_server(self):
+        info = await self.backend.show_server()
+        return text_reply(ResponseCodes.SERVER_INFORMATION, 'server information', info)
+
+    async def do_help(self):
+        return text_reply(ResponseCodes.HELP_TEXT, 'help text follows', sorted(self.HANDLERS))
+
+    async def do_option_mime(self):
+        return status_line(ResponseCodes.OK, 'ok - using MIME headers')
+
+    async def do_quit(self):
+        return status_line(ResponseCodes.CONECTION_CLOSING, 'bye')
+
+    async def do_define(self, database, word):
+        definitions = await self.backend.define(database, word)
+        if not definitions:
+            return status_line(ResponseCodes.NO_MATCH, 'no match')
+        ret = [status_line(ResponseCodes.DEFINITIONS_RETRIEVED,
+                           '{} definitions retrieved'.format(len(definitions)))]
+        for definition in definitions:
+            ret.append(status_line(ResponseCodes.WORD_DATABASE, definition.header))
+            ret.append(stuff(definition.raw))
+            ret.append(b'.\r\n')
+        ret.append(status_line(ResponseCodes.OK, 'ok'))
+        return b''.join(ret)
+
+    async def do_match(self, database, strategy, word):
+        matches = await self.backend.match(database, strategy, word)
+        if not matches:
+            return status_line(ResponseCodes.NO_MATCH, 'no match')
+        return b''.join([status_line(ResponseCodes.MATCHES_FOUND, '{} matches found'.format(len(matches))),
+                         stuff(b'\n'.join(match.raw.rstrip() for match in matches) + b'\n'),
+                         b'.\r\n',
+                         status_line(ResponseCodes.OK, 'ok')])
+
+    HANDLERS = {
+        'CLIENT': do_client,
+        'STATUS': do_status,
+        'SHOW DB': do_show_db,
+        'SHOW DATABASES': do_show_db,
+        'SHOW STRAT': do_show_strat,
+        'SHOW STRATEGIES': do_show_strat,
+        'SHOW INFO': do_show_info,
+        'SHOW SERVER': do_show_server,
+        'HELP': do_help,
+        'OPTION MIME': do_option_mime,
+        'QUIT': do_quit,
+        'DEFINE': do_define,
+        'D': do_define,
+        'MATCH': do_match,
+        'M': do_match,
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='DICT server for tests and benchmarks')
+    parser.add_argument('directory', help='directory with dictd .index and .dict(.dz) files')
+    parser.add_argument('-c', '--host', default='127.0.0.1')
+    parser.add_argument('-p', '--port', type=int, default=2628)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--busy-rate', type=float, default=0.0)
+    parser.add_argument('--drop-rate', type=float, default=0.0)
+    parser.add_argument('--debug', action='store_true')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    if args.debug:
+        logging.basicConfig(level=logging.DEBUG)
+
+    server = DictServer(LocalDict.from_directory(args.directory), args.host, args.port,
+                        latency=args.latency, busy_rate=args.busy_rate, drop_rate=args.drop_rate)
+    loop = asyncio.get_event_loop()
+    loop.run_until_complete(server.start())
+    try:
+        loop.run_forever()
+    except KeyboardInterrupt:
+        pass
+    loop.run_until_complete(server.close())
+    loop.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+import asyncio
+
+
+class Singleflight:
+
+    # Concurrent calls with the same key share a single call: the first one
+    # starts it, the others wait for its result (or exception). Each caller
+    # gets its own copy of the result list. The shared call is shielded, so
+    # a caller which is cancelled does not cancel it for the others.
+
+    def __init__(self):
+        self.calls = 0
+        self.deduplicated = 0
+        self._inflight = {}
+
+    async def run(self, key, func, *args):
+        self.calls += 1
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(func(*args))
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._forget(key, future))
+        else:
+            self.deduplicated += 1
+        return list(await asyncio.shield(future))
+
+    def _forget(self, key, future):
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
+        # nobody may be waiting any more
+        if not future.cancelled():
+            future.exception()
+
+    def stats(self):
+        return {
+            'calls': self.calls,
+            'deduplicated': self.deduplicated,
+            'inflight': len(self._inflight),
+        }
+
+    def __len__(self):
+        return len(self._inflight)
@@ -0,0 +1,307 @@
+import array
+import asyncio
+import bisect
+import collections
+import re
+
+from wordbook.local import ALPHABET, REST_PATTERN, sort_key
+from wordbook.results import Match
+
+
+SOUNDEX_DIGITS = {char: digit for digit, chars in (('1', 'bfpv'), ('2', 'cgjkqsxz'), ('3', 'dt'), ('4', 'l'),
+                                                   ('5', 'mn'), ('6', 'r')) for char in chars}
+
+
+def soundex(word):
+    letters = [char for char in word.lower() if 'a' <= char <= 'z']
+    if not letters:
+        return ''
+    code = letters[0].upper()
+    last = SOUNDEX_DIGITS.get(letters[0])
+    for char in letters[1:]:
+        digit = SOUNDEX_DIGITS.get(char)
+        if digit is not None and digit != last:
+            code += digit
+        # h and w do not separate letters with the same digit
+        if char not in 'hw':
+            last = digit
+    return (code + '000')[:4]
+
+
+def basic_to_extended(pattern):
+    # POSIX basic regular expression (the "regexp" strategy) -> Python syntax:
+    # \( \) \{ \} \| \+ \? are operators, the bare characters are literals
+    ret = []
+    pos = 0
+    while pos < len(pattern):
+        char = pattern[pos]
+        if char == '\\' and pos + 1 < len(pattern):
+            char = pattern[pos + 1]
+            ret.append(char if char in '(){}|+?' else '\\' + char)
+            pos += 2
+            continue
+        if char == '[':
+            end = pos + 1
+            if pattern[end:end + 1] == '^':
+                end += 1
+            if pattern[end:end + 1] == ']':
+                end += 1
+            end = pattern.find(']', end)
+            if end >= 0:
+                # a backslash in a bracket expression is a literal
+                ret.append(pattern[pos:end + 1].replace('\\', '\\\\'))
+                pos = end + 1
+                continue
+        ret.append('\\' + char if char in '(){}|+?' else char)
+        pos += 1
+    return ''.join(ret)
+
+
+def literal_prefix(pattern):
+    # the letters and digits every match of an anchored pattern starts with
+    if not pattern.startswith('^') or '|' in pattern:
+        return ''
+    ret = ''
+    for char in pattern[1:]:
+        if not char.isalnum():
+            if char in '*?{':
+                # the last literal is optional or repeated
+                ret = ret[:-1]
+            break
+        ret += char
+    return ret.lower()
+
+
+class HeadwordIndex:
+
+    # Headwords of a database kept sorted by their dictd sort key. Keys and
+    # headwords are each joined into a single string, every entry ended by a
+    # newline, with arrays of start offsets. Suffix and substring queries use
+    # a suffix array over the keys. All tables are built by the constructor,
+    # which takes a while for a large database; MatchEngine.update() runs it
+    # in an executor.
+
+    def __init__(self, name, headwords):
+        self.name = name
+        # sorted in buckets by the first character, like the suffixes below
+        groups = collections.defaultdict(set)
+        for word in headwords:
+            key = sort_key(word)
+            if key and not word.startswith(('00-database-', '00database')):
+                groups[key[0]].add((key, word))
+        pairs = []
+        for char in sorted(groups):
+            pairs.extend(sorted(groups.pop(char)))
+        self._text, self._starts = self._join(key for key, _ in pairs)
+        self._headwords, self._headword_starts = self._join(word for _, word in pairs)
+        self._suffixes = self._build_suffixes()
+        self._soundex = collections.defaultdict(lambda: array.array('I'))
+        self._words = collections.defaultdict(lambda: array.array('I'))
+        for pos, (_, headword) in enumerate(pairs):
+            self._soundex[soundex(headword)].append(pos)
+            for item in set(re.findall(r'\w+', headword.lower())):
+                self._words[item].append(pos)
+
+    @staticmethod
+    def _join(items):
+        starts = array.array('I')
+        parts = []
+        pos = 0
+        for item in items:
+            starts.append(pos)
+            parts.append(item)
+            pos += len(item) + 1
+        parts.append('')
+        return '\n'.join(parts), starts
+
+    def _build_suffixes(self):
+        # Suffixes are sorted in buckets by their first character, so only
+        # the suffix strings of one bucket exist at a time, and a thread
+        # building the index gives up the GIL between the buckets.
+        text = self._text
+        buckets = collections.defaultdict(lambda: array.array('I'))
+        for start in self._starts:
+            for pos in range(start, text.index('\n', start)):
+                buckets[text[pos]].append(pos)
+        ret = array.array('I')
+        for char in sorted(buckets):
+            offsets = buckets.pop(char)
+            suffixes = [text[pos:text.index('\n', pos)] for pos in offsets]
+            ret.extend(offsets[i] for i in sorted(range(len(offsets)), key=suffixes.__getitem__))
+        return ret
+
+    def __len__(self):
+        return len(self._starts)
+
+    def headword(self, pos):
+        start = self._headword_starts[pos]
+        return self._headwords[start:self._headwords.index('\n', start)]
+
+    def match(self, strategy, word):
+        # matching headwords in index order, None for an unknown strategy
+        # or an invalid pattern
+        method = getattr(self, 'match_' + strategy, None)
+        if method is None:
+            return None
+        found = method(word)
+        if found is None:
+            return None
+        return [self.headword(pos) for pos in sorted(found)]
+
+    def match_exact(self, word):
+        return range(*self._range(self._starts, sort_key(word), prefix=False))
+
+    def match_prefix(self, word):
+        return range(*self._range(self._starts, sort_key(word), prefix=True))
+
+    def match_suffix(self, word):
+        return self._owners(self._range(self._suffixes, sort_key(word), prefix=False))
+
+    def match_substring(self, word):
+        return self._owners(self._range(self._suffixes, sort_key(word), prefix=True))
+
+    def match_re(self, word):
+        return self._search(word)
+
+    def match_regexp(self, word):
+        return self._search(basic_to_extended(word))
+
+    def match_soundex(self, word):
+        code = soundex(word)
+        return self._soundex.get(code, []) if code else []
+
+    def match_word(self, word):
+        return self._words.get(word.strip().lower(), [])
+
+    def _search(self, pattern):
+        try:
+            regex = re.compile(pattern, re.IGNORECASE)
+        except re.error:
+            return None
+        # an anchored pattern only needs the headwords with its literal prefix
+        candidates = range(*self._range(self._starts, literal_prefix(pattern), prefix=True))
+        return [pos for pos in candidates if regex.search(self.headword(pos))]
+
+    def _at(self, pos):
+        # the key, or the end of the key, starting at the offset
+        return self._text[pos:self._text.index('\n', pos)]
+
+    def _range(self, offsets, target, prefix):
+        # (lo, hi) of the offsets whose text equals, or starts with, the target
+        size = len(target)
+        lo, hi = 0, len(offsets)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._at(offsets[mid])[:size] < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        start, hi = lo, len(offsets)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            value = self._at(offsets[mid])
+            if (value[:size] if prefix else value) <= target:
+                lo = mid + 1
+            else:
+                hi = mid
+        return start, lo
+
+    def _owners(self, bounds):
+        # the headwords the suffixes in the range belong to
+        starts = self._starts
+        return {bisect.bisect_right(starts, offset) - 1 for offset in self._suffixes[bounds[0]:bounds[1]]}
+
+
+class MatchEngine:
+
+    # Runs MATCH locally over headword lists of the databases of a server.
+    # match() returns None when it cannot answer: a database or strategy it
+    # does not know, or "*" and "!" before update() has loaded every
+    # database SHOW DB lists. WordBook then asks the server.
+    #
+    # A database update() listed without the "re" strategy lacks the
+    # headwords starting with characters outside the alphabet, so only
+    # exact and prefix queries starting with one of the others are answered
+    # for it.
+
+    STRATEGIES = ('exact', 'prefix', 'suffix', 'substring', 're', 'regexp', 'soundex', 'word')
+
+    def __init__(self, default_strategy=None):
+        # the strategy "." stands for, None leaves "." to the server
+        self.default_strategy = default_strategy
+        self.indexes = collections.OrderedDict()
+        self.server_databases = None
+        # database -> the alphabet it was listed by, for incomplete indexes
+        self.partial = {}
+
+    def add(self, database, headwords):
+        # builds the index right away, blocking for a large database
+        self.indexes[database] = HeadwordIndex(database, headwords)
+        self.partial.pop(database, None)
+
+    def load(self, database, path):
+        # a list of headwords, one per line, or a dictd .index file
+        with open(path, encoding='utf8') as f:
+            self.add(database, [line.split('\t', 1)[0].strip() for line in f])
+
+    def remove(self, database):
+        self.indexes.pop(database, None)
+        self.partial.pop(database, None)
+
+    async def update(self, wordbook, alphabet=ALPHABET):
+        # Loads the headwords of the databases SHOW DB lists and the engine
+        # does not have yet, and drops those which disappeared. Headwords
+        # are listed with MATCH prefix over the alphabet and, when the
+        # server has the "re" strategy, the rest with a regular expression,
+        # like Mirror does. Returns the names added.
+        names = [db.get_database()[0] for db in await wordbook.get_databases()]
+        for name in set(self.indexes) - set(names):
+            self.remove(name)
+        added = [name for name in names if name not in self.indexes]
+        has_regex = 're' in [strat.get_strategy()[0] for strat in await wordbook.get_strategies()]
+        loop = asyncio.get_event_loop()
+        for name in added:
+            results = await wordbook.conn.match_many(name, 'prefix', list(alphabet))
+            if has_regex:
+                results.append(await wordbook.conn.match(name, 're', REST_PATTERN))
+            headwords = [match.word for matches in results for match in matches]
+            self.indexes[name] = await loop.run_in_executor(None, HeadwordIndex, name, headwords)
+            if has_regex:
+                self.partial.pop(name, None)
+            else:
+                self.partial[name] = alphabet
+        self.server_databases = names
+        return added
+
+    def match(self, database, strategy, word):
+        if strategy == '.':
+            strategy = self.default_strategy
+        if strategy not in self.STRATEGIES:
+            return None
+        if database in ('*', '!'):
+            if self.server_databases is None or any(name not in self.indexes for name in self.server_databases):
+                return None
+            names = self.server_databases
+        elif database in self.indexes:
+            names = [database]
+        else:
+            return None
+        if any(not self._complete(name, strategy, word) for name in names):
+            return None
+        ret = []
+        for name in names:
+            headwords = self.indexes[name].match(strategy, word)
+            if headwords is None:
+                return None
+            ret.extend(Match('{} "{}"'.format(name, headword).encode('utf8')) for headword in headwords)
+            if ret and database == '!':
+                break
+        return ret
+
+    def _complete(self, database, strategy, word):
+        # whether the index has every headword the query may match
+        alphabet = self.partial.get(database)
+        if alphabet is None:
+            return True
+        key = sort_key(word)
+        return strategy in ('exact', 'prefix') and key[:1] != '' and key[0] in alphabet
@@ -0,0 +1,135 @@
+import asyncio
+import collections
+
+from wordbook.local import ALPHABET
+from wordbook.wordbook import WordBookDatabase, WordBookStrategy
+
+
+def fold(word):
+    return ' '.join(word.split()).lower()
+
+
+def deletes(word, distance):
+    # the word and every string made of it by removing up to `distance` characters
+    ret = {word}
+    edge = {word}
+    for _ in range(distance):
+        edge = {item[:pos] + item[pos + 1:] for item in edge for pos in range(len(item))}
+        ret |= edge
+    return ret
+
+
+def edit_distance(first, second, limit):
+    # Levenshtein distance counting a transposition of two adjacent characters
+    # as one edit (optimal string alignment); above limit, limit + 1 is returned
+    if abs(len(first) - len(second)) > limit:
+        return limit + 1
+    before = None
+    previous = list(range(len(second) + 1))
+    for i in range(1, len(first) + 1):
+        current = [i] + [0] * len(second)
+        for j in range(1, len(second) + 1):
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (first[i - 1] != second[j - 1]))
+            if i > 1 and j > 1 and first[i - 1] == second[j - 2] and first[i - 2] == second[j - 1]:
+                value = min(value, before[j - 2] + 1)
+            current[j] = value
+        if min(current) > limit:
+            return limit + 1
+        before, previous = previous, current
+    return min(previous[-1], limit + 1)
+
+
+class SuggestionIndex:
+
+    # "Did you mean" suggestions from a local list of headwords, using the
+    # symmetric delete method: every headword is indexed under all strings
+    # made of its first prefix_length characters by up to max_distance
+    # deletions, so a lookup only generates the deletions of the query and
+    # checks the few headwords found under them. Suggestions are ranked by
+    # edit distance, then by the number of databases having the headword.
+
+    def __init__(self, max_distance=2, prefix_length=7):
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        self.databases = set()
+        # folded headword -> [headword, databases]
+        self._entries = {}
+        self._deletes = collections.defaultdict(set)
+
+    def add(self, word, database=None):
+        key = fold(word)
+        if not key:
+            return
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._entries[key] = [word, set()]
+            for delete in deletes(key[:self.prefix_length], self.max_distance):
+                self._deletes[delete].add(key)
+        if database is not None:
+            entry[1].add(database)
+            self.databases.add(database)
+
+    def add_matches(self, matches):
+        for match in matches:
+            self.add(match.word, match.database)
+
+    def remove_database(self, database):
+        self.databases.discard(database)
+        for key, (_, databases) in list(self._entries.items()):
+            if database in databases:
+                databases.discard(database)
+                if not databases:
+                    self._remove(key)
+
+    def _remove(self, key):
+        del self._entries[key]
+        for delete in deletes(key[:self.prefix_length], self.max_distance):
+            keys = self._deletes[delete]
+            keys.discard(key)
+            if not keys:
+                del self._deletes[delete]
+
+    def load(self, path, database=None):
+        # a list of headwords, one per line, or a dictd .index file
+        with open(path, encoding='utf8') as f:
+            for line in f:
+                word = line.split('\t', 1)[0].strip()
+                if not word.startswith(('00-database-', '00database')):
+                    self.add(word, database)
+
+    async def update(self, wordbook, alphabet=ALPHABET):
+        # Indexes the databases which SHOW DB lists but the index does not
+        # have yet and drops those which disappeared. Returns the names of
+        # the databases added.
+        names = [db.get_database()[0] for db in await wordbook.get_databases()]
+        for name in self.databases - set(names):
+            self.remove_database(name)
+        added = [name for name in names if name not in self.databases]
+        for name in added:
+            view = WordBookStrategy('prefix', WordBookDatabase(name, wordbook))
+            for matches in await asyncio.gather(*[view.match(char) for char in alphabet]):
+                self.add_matches(matches)
+            self.databases.add(name)
+        return added
+
+    def suggest(self, word, limit=5, max_distance=None):
+        # [(headword, distance), ...], the closest first
+        distance = self.max_distance if max_distance is None else min(max_distance, self.max_distance)
+        key = fold(word)
+        candidates = set()
+        for delete in deletes(key[:self.prefix_length], distance):
+            candidates.update(self._deletes.get(delete, ()))
+        ranked = []
+        for candidate in candidates:
+            found = edit_distance(key, candidate, distance)
+            if found <= distance:
+                headword, databases = self._entries[candidate]
+                ranked.append((found, -len(databases), headword))
+        ranked.sort()
+        return [(headword, found) for found, _, headword in ranked[:limit]]
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, word):
+        return fold(word) in self._entries
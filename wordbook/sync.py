@@ -0,0 +1,89 @@
+import asyncio
+import concurrent.futures
+import threading
+
+from wordbook.dictbase import DictBase, ResponseCodes
+from wordbook.exceptions import DictTimeoutError
+from wordbook.wordbook import WordBook, WordBookDatabase, WordBookStrategy
+
+
+class SyncWordBook:
+
+    # Blocking facade of WordBook for threaded programs. A single background
+    # thread runs an event loop which owns the WordBook and its connections;
+    # calls from any thread are handed to it with run_coroutine_threadsafe,
+    # so all threads share the same (pooled or pipelined) connections. The
+    # connection is made by conn_factory inside the loop thread.
+
+    def __init__(self, host=None, port=None, database=None, strategy=None, conn_factory=DictBase,
+                 cache=None, metadata=None, timeout=None):
+        self.timeout = timeout
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, name='wordbook-loop', daemon=True)
+        self._thread.start()
+        self.wordbook = self.call(self._create(host, port, database, strategy, conn_factory, cache, metadata))
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    @staticmethod
+    async def _create(host, port, database, strategy, conn_factory, cache, metadata):
+        return WordBook(host, port, database, strategy, conn=conn_factory(), cache=cache, metadata=metadata)
+
+    def call(self, coro, timeout=None):
+        if threading.current_thread() is self._thread:
+            coro.close()
+            raise RuntimeError('SyncWordBook cannot be called from its own event loop')
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        if timeout is None:
+            timeout = self.timeout
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise DictTimeoutError(ResponseCodes.UNKNOWN_ERROR, 'No reply after {}s'.format(timeout))
+
+    def connect(self):
+        self.call(self.wordbook.connect())
+
+    def close(self):
+        if self.loop.is_closed():
+            return
+        try:
+            if self.wordbook.conn.connected:
+                self.call(self.wordbook.conn.quit())
+        finally:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._thread.join()
+            self.loop.close()
+
+    def __enter__(self):
+        self.connect()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def get_databases(self):
+        return [db.get_database() for db in self.call(self.wordbook.get_databases())]
+
+    def get_strategies(self):
+        return [strat.get_strategy() for strat in self.call(self.wordbook.get_strategies())]
+
+    def get_info(self, database=None, timeout=None):
+        return self.call(self._view(database, None).get_info(), timeout)
+
+    def define(self, word, database=None, timeout=None):
+        return self.call(self._view(database, None).define(word), timeout)
+
+    def match(self, query, database=None, strategy=None, timeout=None):
+        return self.call(self._view(database, strategy).match(query), timeout)
+
+    def _view(self, database, strategy):
+        wb = self.wordbook
+        if database is not None:
+            wb = WordBookDatabase(database, wb)
+        if strategy is not None:
+            wb = WordBookStrategy(strategy, wb)
+        return wb
@@ -0,0 +1,274 @@
+import asyncio
+import collections
+import socket
+
+
+# the StreamReader default
+STREAM_LIMIT = 2 ** 16
+
+
+def set_socket_options(sock, nodelay=True, keepalive=False, recv_buffer=None):
+    if sock is None:
+        return
+    if sock.family in (socket.AF_INET, socket.AF_INET6):
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, int(nodelay))
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, int(keepalive))
+    if recv_buffer is not None:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, recv_buffer)
+
+
+class Transport:
+
+    # Opens the byte stream DictBase talks over. open() returns a reader,
+    # whose read(n) returns what has arrived (b'' at the end of the stream),
+    # and a writer with write(), drain() and close(), like asyncio streams.
+    # endpoint() names the server open() connects to, e.g. for
+    # MetadataCache.
+
+    async def open(self, host, port):
+        raise NotImplementedError()
+
+    def endpoint(self, host, port):
+        return '{}:{}'.format(host, port)
+
+
+class TcpTransport(Transport):
+
+    # asyncio streams over TCP. limit is the StreamReader buffer size above
+    # which reading is paused; replies are read in chunks, so it does not
+    # limit the length of a line.
+
+    def __init__(self, nodelay=True, keepalive=False, recv_buffer=None, limit=STREAM_LIMIT):
+        self.nodelay = nodelay
+        self.keepalive = keepalive
+        self.recv_buffer = recv_buffer
+        self.limit = limit
+
+    async def open(self, host, port):
+        reader, writer = await asyncio.open_connection(host, port, limit=self.limit)
+        set_socket_options(writer.get_extra_info('socket'), self.nodelay, self.keepalive, self.recv_buffer)
+        return reader, writer
+
+
+class UnixTransport(Transport):
+
+    # asyncio streams over a Unix domain socket; the host and port given to
+    # connect() are ignored.
+
+    def __init__(self, path, recv_buffer=None, limit=STREAM_LIMIT):
+        self.path = path
+        self.recv_buffer = recv_buffer
+        self.limit = limit
+
+    def endpoint(self, host, port):
+        return 'unix:{}'.format(self.path)
+
+    async def open(self, host, port):
+        reader, writer = await asyncio.open_unix_connection(self.path, limit=self.limit)
+        set_socket_options(writer.get_extra_info('socket'), recv_buffer=self.recv_buffer)
+        return reader, writer
+
+
+class ChunkStream:
+
+    # Received data kept as the chunks it arrived in; read() hands them over
+    # without copying them into a single buffer first.
+
+    def __init__(self):
+        self._chunks = collections.deque()
+        self._size = 0
+        self._eof = False
+        self._exception = None
+        self._waiter = None
+
+    def feed_data(self, data):
+        self._chunks.append(data)
+        self._size += len(data)
+        self._wake()
+
+    def feed_eof(self):
+        self._eof = True
+        self._wake()
+
+    def set_exception(self, exc):
+        self._exception = exc
+        self._wake()
+
+    def _wake(self):
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+
+    async def read(self, n=-1):
+        while not self._chunks:
+            if self._exception is not None:
+                raise self._exception
+            if self._eof:
+                return b''
+            self._waiter = asyncio.get_event_loop().create_future()
+            try:
+                await self._waiter
+            finally:
+                self._waiter = None
+        if n < 0 or self._size <= n:
+            data = b''.join(self._chunks) if len(self._chunks) > 1 else self._chunks[0]
+            self._chunks.clear()
+        else:
+            parts = []
+            size = 0
+            while self._chunks and size + len(self._chunks[0]) <= n:
+                parts.append(self._chunks.popleft())
+                size += len(parts[-1])
+            if not parts:
+                # the first chunk alone is larger than n
+                chunk = self._chunks.popleft()
+                parts.append(chunk[:n])
+                self._chunks.appendleft(chunk[n:])
+            data = b''.join(parts)
+        self._size -= len(data)
+        return data
+
+
+class StreamProtocol(asyncio.Protocol, ChunkStream):
+
+    # Reader and writer in one object, driven by data_received() without the
+    # StreamReader layer. Reading is paused while more than limit bytes wait
+    # to be read.
+
+    def __init__(self, limit=STREAM_LIMIT):
+        ChunkStream.__init__(self)
+        self.limit = limit
+        self.transport = None
+        self._paused = False
+        self._drain_waiter = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def data_received(self, data):
+        self.feed_data(data)
+        if not self._paused and self._size > self.limit:
+            self.transport.pause_reading()
+            self._paused = True
+
+    def eof_received(self):
+        self.feed_eof()
+
+    def connection_lost(self, exc):
+        if exc is None:
+            self.feed_eof()
+        else:
+            self.set_exception(ConnectionResetError(str(exc)))
+        self.resume_writing()
+
+    def pause_writing(self):
+        if self._drain_waiter is None:
+            self._drain_waiter = asyncio.get_event_loop().create_future()
+
+    def resume_writing(self):
+        waiter, self._drain_waiter = self._drain_waiter, None
+        if waiter is not None and not waiter.done():
+            waiter.set_result(None)
+
+    async def read(self, n=-1):
+        data = await ChunkStream.read(self, n)
+        if self._paused and self._size <= self.limit:
+            self._paused = False
+            self.transport.resume_reading()
+        return data
+
+    def write(self, data):
+        self.transport.write(data)
+
+    async def drain(self):
+        if self.transport.is_closing():
+            raise ConnectionResetError('Connection closed')
+        if self._drain_waiter is not None:
+            await asyncio.shield(self._drain_waiter)
+
+    def close(self):
+        self.transport.close()
+
+    def get_extra_info(self, name, default=None):
+        return self.transport.get_extra_info(name, default)
+
+
+class ProtocolTransport(Transport):
+
+    # TCP, or a Unix domain socket when path is given, through StreamProtocol.
+
+    def __init__(self, path=None, nodelay=True, keepalive=False, recv_buffer=None, limit=STREAM_LIMIT):
+        self.path = path
+        self.nodelay = nodelay
+        self.keepalive = keepalive
+        self.recv_buffer = recv_buffer
+        self.limit = limit
+
+    def endpoint(self, host, port):
+        if self.path is not None:
+            return 'unix:{}'.format(self.path)
+        return Transport.endpoint(self, host, port)
+
+    async def open(self, host, port):
+        loop = asyncio.get_event_loop()
+        if self.path is not None:
+            _, protocol = await loop.create_unix_connection(lambda: StreamProtocol(self.limit), self.path)
+        else:
+            _, protocol = await loop.create_connection(lambda: StreamProtocol(self.limit), host, port)
+        set_socket_options(protocol.get_extra_info('socket'), self.nodelay, self.keepalive, self.recv_buffer)
+        return protocol, protocol
+
+
+class MemoryWriter:
+
+    # The writing half of one end of an in-process pipe. Closing either end
+    # ends the stream for both, like a closed socket.
+
+    def __init__(self, incoming, outgoing):
+        # incoming is read by this end, outgoing by the other one
+        self.incoming = incoming
+        self.outgoing = outgoing
+        self.peer = None
+        self.closed = False
+
+    def write(self, data):
+        if not self.closed:
+            self.outgoing.feed_data(data)
+
+    async def drain(self):
+        if self.closed:
+            raise ConnectionResetError('Connection closed')
+
+    def close(self):
+        for end in (self, self.peer):
+            if not end.closed:
+                end.closed = True
+                end.incoming.feed_eof()
+
+    def get_extra_info(self, name, default=None):
+        return default
+
+
+class MemoryTransport(Transport):
+
+    # Connects to handle(reader, writer), e.g. DictServer.handle, within the
+    # process, for benchmarks without the network. The server end reads
+    # through a StreamReader, so the handler may use readline().
+
+    def __init__(self, handle):
+        self.handle = handle
+        self.tasks = set()
+
+    def endpoint(self, host, port):
+        return 'memory:{:x}'.format(id(self))
+
+    async def open(self, host, port):
+        client_reader = ChunkStream()
+        server_reader = asyncio.StreamReader()
+        client = MemoryWriter(client_reader, server_reader)
+        server = MemoryWriter(server_reader, client_reader)
+        client.peer = server
+        server.peer = client
+        task = asyncio.ensure_future(self.handle(server_reader, server))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return client_reader, client
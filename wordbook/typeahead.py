@@ -0,0 +1,63 @@
+import bisect
+
+from wordbook.local import sort_key
+from wordbook.wordbook import WordBookStrategy
+
+
+class TypeaheadSession:
+
+    # Answers prefix matches for an autocomplete box. The last reply of the
+    # server is kept sorted by the dictd sort key of the word, which the
+    # prefix strategy compares (ignoring case and punctuation), so a longer
+    # prefix is only a range lookup in it. The server is asked again when
+    # the prefix is not an extension of the last one, the database or
+    # strategy changed, or the last reply may have been cut at max_results
+    # by the server.
+
+    REFINABLE = ('prefix',)
+
+    def __init__(self, wordbook, strategy='prefix', max_results=None):
+        self.wordbook = wordbook
+        self.strategy = strategy
+        self.max_results = max_results
+        self.server_queries = 0
+        self.local_queries = 0
+        self.reset()
+
+    def reset(self):
+        self._scope = None
+        self._prefix = None
+        self._truncated = False
+        self._keys = []
+        self._matches = []
+
+    async def complete(self, prefix):
+        folded = sort_key(prefix)
+        if not folded.strip():
+            return []
+        scope = (self.wordbook.get_database()[0], self.strategy)
+        if self._can_refine(scope, folded):
+            self.local_queries += 1
+            return self._refine(folded)
+        matches = await WordBookStrategy(self.strategy, self.wordbook).match(prefix)
+        self.server_queries += 1
+        self._scope = scope
+        self._prefix = folded
+        self._truncated = self.max_results is not None and len(matches) >= self.max_results
+        # (sort key, position in the reply), the reply order is kept
+        self._keys = sorted((sort_key(match.word), pos) for pos, match in enumerate(matches))
+        self._matches = matches
+        return list(matches)
+
+    def _can_refine(self, scope, folded):
+        return (scope == self._scope and self.strategy in self.REFINABLE and not self._truncated
+                and folded.startswith(self._prefix))
+
+    def _refine(self, folded):
+        positions = []
+        for key, pos in self._keys[bisect.bisect_left(self._keys, (folded,)):]:
+            if not key.startswith(folded):
+                break
+            positions.append(pos)
+        positions.sort()
+        return [self._matches[pos] for pos in positions]
@@ -1,14 +1,23 @@
 import asyncio
+import collections
 
 from wordbook import DictBase
+from wordbook.exceptions import DictError
 
 
 class WordBook:
 
-    def __init__(self, host=None, port=None, database=None, strategy=None):
+    def __init__(self, host=None, port=None, database=None, strategy=None, conn=None, cache=None,
+                 metadata=None, singleflight=None, matcher=None,
+                 prefetcher=None):
         self.host = host
         self.port = port
-        self.conn = DictBase()
+        self.conn = conn if conn is not None else DictBase()
+        self.cache = cache
+        self.metadata = metadata
+        self.singleflight = singleflight
+        self.matcher = matcher
+        self.prefetcher = prefetcher
         self.database = database
         self.strategy = strategy
 
@@ -16,38 +25,103 @@ class WordBook:
         self.host = source.host
         self.port = source.port
         self.conn = source.conn
+        self.cache = source.cache
+        self.metadata = source.metadata
+        self.singleflight = source.singleflight
+        self.matcher = source.matcher
+        self.prefetcher = source.prefetcher
         self.database = source.database
         self.strategy = source.strategy
 
     async def connect(self):
         await self.conn.connect(self.host, self.port)
         await self.conn.client('wordbook')
+        if self.metadata is not None:
+            self.metadata.check_banner(self.get_endpoint(), self.conn.banner, self.conn.capabilities)
 
     async def get_databases(self):
-        dbs = await self.conn.show_db()
+        dbs = await self.get_metadata('databases', self.conn.show_db)
         ret = []
         for dbn in dbs:
             ret.append(WordBookDatabase(dbn, self))
         return ret
 
     async def get_strategies(self):
-        strats = await self.conn.show_strat()
+        strats = await self.get_metadata('strategies', self.conn.show_strat)
         ret = []
         for strat in strats:
             ret.append(WordBookStrategy(strat, self))
         return ret
 
+    async def get_info(self):
+        database = self.get_database()[0]
+        return await self.get_metadata('info:{}'.format(database), self.conn.show_info, database)
+
+    async def get_metadata(self, name, command, *args):
+        if self.metadata is None:
+            return await command(*args)
+        endpoint = self.get_endpoint()
+        ret = self.metadata.get(endpoint, name)
+        if ret is None:
+            ret = await command(*args)
+            self.metadata.set(endpoint, name, ret)
+        return ret
+
+    def get_endpoint(self):
+        # each backend names its server, so connections to different ones
+        # never share the entries of the metadata cache
+        return self.conn.endpoint
+
     async def match(self, query):
         database = self.get_database()[0]
         strategy = self.get_strategy()[0]
-        ret = await self.conn.match(database, strategy, query)
-        return ret
+        if self.matcher is not None:
+            ret = self.matcher.match(database, strategy, query)
+            if ret is not None:
+                return ret
+        return await self.lookup(database, strategy, query, self.conn.match, database, strategy, query)
 
     async def define(self, word):
         database = self.get_database()[0]
-        ret = await self.conn.define(database, word)
+        # definitions are cached under the strategy None
+        ret = await self.lookup(database, None, word, self.conn.define, database, word)
+        if self.prefetcher is not None:
+            self.prefetcher.schedule(self, database, ret)
         return ret
 
+    async def lookup(self, database, strategy, word, command, *args):
+        key = None
+        if self.cache is not None:
+            key = self.cache.make_key(database, strategy, word)
+            ret = self.cache.get(key)
+            if ret is not None:
+                return ret
+
+        async def fetch():
+            ret = await command(*args)
+            if key is not None:
+                self.cache.set(key, ret)
+            return ret
+
+        if self.singleflight is None:
+            return await fetch()
+        return await self.singleflight.run((database, strategy, word), fetch)
+
+    def iter_match(self, query):
+        database = self.get_database()[0]
+        strategy = self.get_strategy()[0]
+        return self.conn.iter_match(database, strategy, query)
+
+    def iter_define(self, word):
+        database = self.get_database()[0]
+        return self.conn.iter_define(database, word)
+
+    def define_stream(self, words, concurrency=10):
+        return LookupStream(self.define, words, concurrency)
+
+    def match_stream(self, queries, concurrency=10):
+        return LookupStream(self.match, queries, concurrency)
+
     def get_database(self):
         if self.database is not None:
             return self.database.split(' ', 1)
@@ -77,3 +151,86 @@ class WordBookStrategy(WordBook):
         else:
             self.init_copy(base)
         self.strategy = strategy
+
+
+class LookupStream:
+
+    # Looks up the words of a sync or async iterable with at most
+    # `concurrency` lookups in flight and yields (word, result) pairs as
+    # they complete; a DictError is yielded in place of the result. A word
+    # is taken from the input only when a finished pair has been yielded,
+    # so memory does not grow with the input.
+
+    def __init__(self, lookup, words, concurrency):
+        if concurrency < 1:
+            raise ValueError('Invalid concurrency: {}'.format(concurrency))
+        self.lookup = lookup
+        self.words = words
+        self.concurrency = concurrency
+        self._iter = None
+        self._exhausted = False
+        self._pending = {}
+        self._done = collections.deque()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            await self._fill()
+            while not self._done:
+                if not self._pending:
+                    raise StopAsyncIteration
+                done, _ = await asyncio.wait(list(self._pending), return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    self._done.append((self._pending.pop(task), task))
+        except StopAsyncIteration:
+            raise
+        except BaseException:
+            await self.aclose()
+            raise
+        word, task = self._done.popleft()
+        exc = task.exception()
+        if exc is None:
+            return word, task.result()
+        if isinstance(exc, DictError):
+            return word, exc
+        await self.aclose()
+        raise exc
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
+
+    async def aclose(self):
+        self._exhausted = True
+        tasks = list(self._pending)
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.wait(tasks)
+        tasks.extend(task for _, task in self._done)
+        self._pending.clear()
+        self._done.clear()
+        for task in tasks:
+            if not task.cancelled():
+                task.exception()
+
+    async def _fill(self):
+        if self._iter is None:
+            if hasattr(self.words, '__aiter__'):
+                self._iter = self.words.__aiter__()
+            else:
+                self._iter = iter(self.words)
+        while not self._exhausted and len(self._pending) + len(self._done) < self.concurrency:
+            try:
+                if hasattr(self._iter, '__anext__'):
+                    word = await self._iter.__anext__()
+                else:
+                    word = next(self._iter)
+            except (StopIteration, StopAsyncIteration):
+                self._exhausted = True
+                break
+            self._pending[asyncio.ensure_future(self.lookup(word))] = word